@@ -14,38 +14,130 @@
 #    under the License.
 
 import time
+from urllib import parse as urlparse
+
+from oslo_log import log as logging
+from oslo_serialization import jsonutils as json
 
 from tempest.common import custom_matchers
 from tempest import config
+from tempest.lib.common import polling
 from tempest.lib.common.utils import data_utils
 from tempest.lib import exceptions as lib_exc
 import tempest.test
 
 CONF = config.CONF
+LOG = logging.getLogger(__name__)
+
+
+# NOTE: The default max_deletes_per_request of the Swift bulk middleware
+BULK_DELETE_MAX_OBJECTS = 10000
+LISTING_LIMIT = 9999
+
+
+def _list_objects(container_client, container):
+    """List the names of all the objects of a container, page by page"""
+    params = {'limit': LISTING_LIMIT, 'format': 'json'}
+    names = []
+    while True:
+        _, objlist = container_client.list_container_objects(container,
+                                                             params)
+        names.extend(obj['name'] for obj in objlist)
+        if len(objlist) < LISTING_LIMIT:
+            return names
+        params = dict(params, marker=objlist[-1]['name'])
 
 
-def delete_containers(containers, container_client, object_client):
+def _bulk_delete_objects(bulk_client, container, names):
+    """Delete objects with the bulk middleware
+
+    :return: The names of the objects which failed to be deleted
+    """
+    failed = []
+    prefix = '/%s/' % container
+    for start in range(0, len(names), BULK_DELETE_MAX_OBJECTS):
+        batch = names[start:start + BULK_DELETE_MAX_OBJECTS]
+        data = '\n'.join(urlparse.quote(prefix + name) for name in batch)
+        resp = bulk_client.delete_bulk_data(
+            data=data, headers={'Accept': 'application/json',
+                                'Content-Type': 'text/plain'})
+        try:
+            errors = json.loads(resp.data)['Errors']
+        except (TypeError, ValueError, KeyError):
+            # NOTE: Without a report, all the objects are deleted again one
+            # by one, the ones already deleted are not found
+            failed.extend(batch)
+            continue
+        for path, status in errors:
+            LOG.debug('Bulk deletion of %s failed: %s', path, status)
+            path = urlparse.unquote(path)
+            if path.startswith(prefix):
+                failed.append(path[len(prefix):])
+    return failed
+
+
+def _delete_objects(object_client, container, names):
+    """Delete objects concurrently, ignoring the ones not found"""
+    results = object_client.map_requests(
+        [('DELETE', '%s/%s' % (container, name)) for name in names],
+        return_exceptions=True)
+    for result in results:
+        if (isinstance(result, Exception) and
+                not isinstance(result, lib_exc.NotFound)):
+            raise result
+
+
+def _wait_for_empty_container(container_client, container):
+    """Wait for the listing of a container to be empty
+
+    Swift updates the container listings asynchronously, so objects
+    which were deleted can still be listed for a while.
+    """
+    poller = polling.start_polling(container_client)
+    while True:
+        names = _list_objects(container_client, container)
+        if not names:
+            return
+        if poller.expired:
+            raise lib_exc.TimeoutException(
+                'Container %s still lists %d objects after deleting them '
+                'within the required time (%s s).' %
+                (container, len(names), container_client.build_timeout))
+        poller.sleep()
+
+
+def delete_containers(containers, container_client, object_client,
+                      bulk_client=None):
     """Remove containers and all objects in them.
 
     The containers should be visible from the container_client given.
     Will not throw any error if the containers don't exist.
 
+    The objects are deleted with the bulk middleware when a bulk client is
+    given, and concurrently one by one otherwise, or when the bulk deletion
+    of some objects failed. The listing of the container is then checked
+    once the objects are deleted, instead of checking each object.
+
     :param containers: List of containers(or string of a container)
                        to be deleted
     :param container_client: Client to be used to delete containers
     :param object_client: Client to be used to delete objects
+    :param bulk_client: Client of the bulk middleware of the same account,
+                        to be used to delete objects if the middleware is
+                        available
     """
     if isinstance(containers, str):
         containers = [containers]
 
     for cont in containers:
         try:
-            params = {'limit': 9999, 'format': 'json'}
-            _, objlist = container_client.list_container_objects(cont, params)
-            # delete every object in the container
-            for obj in objlist:
-                object_client.delete_object(cont, obj['name'])
-                object_client.wait_for_resource_deletion(obj['name'], cont)
+            names = _list_objects(container_client, cont)
+            if names:
+                if bulk_client is not None:
+                    names = _bulk_delete_objects(bulk_client, cont, names)
+                if names:
+                    _delete_objects(object_client, cont, names)
+                _wait_for_empty_container(container_client, cont)
             # Verify resource deletion
             container_client.delete_container(cont)
             container_client.wait_for_resource_deletion(cont)
@@ -56,6 +148,8 @@ def delete_containers(containers, container_client, object_client):
 class BaseObjectTest(tempest.test.BaseTestCase):
 
     credentials = [['operator', CONF.object_storage.operator_role]]
+    # Whether the bulk middleware is advertised in /info
+    bulk_delete = False
 
     @classmethod
     def skip_checks(cls):
@@ -96,6 +190,7 @@ class BaseObjectTest(tempest.test.BaseTestCase):
 
             if 'swift' in body and 'policies' in body['swift']:
                 cls.policies = body['swift']['policies']
+            cls.bulk_delete = 'bulk_delete' in body
 
         cls.containers = []
 
@@ -133,11 +228,18 @@ class BaseObjectTest(tempest.test.BaseTestCase):
 
     @classmethod
     def delete_containers(cls, container_client=None, object_client=None):
+        bulk_client = None
+        if container_client is None and object_client is None:
+            # NOTE: The bulk client deletes the objects of the account of
+            # the default clients only
+            if cls.bulk_delete:
+                bulk_client = cls.bulk_client
         if container_client is None:
             container_client = cls.container_client
         if object_client is None:
             object_client = cls.object_client
-        delete_containers(cls.containers, container_client, object_client)
+        delete_containers(cls.containers, container_client, object_client,
+                          bulk_client)
 
     def assertHeaders(self, resp, target, method):
         """Check the existence and the format of response headers"""
@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
+from oslo_concurrency import lockutils
+
 from tempest import config
 from tempest.lib import auth
 from tempest.lib import exceptions as lib_exc
@@ -34,7 +38,8 @@ class Manager(clients.ServiceClients):
         _, identity_uri = get_auth_provider_class(credentials)
         super(Manager, self).__init__(
             credentials=credentials, identity_uri=identity_uri, scope=scope,
-            region=CONF.identity.region)
+            region=CONF.identity.region, token_cache=get_token_cache(),
+            background_token_refresh=CONF.auth.background_token_refresh)
         # TODO(andreaf) When clients are initialised without the right
         # parameters available, the calls below will trigger a KeyError.
         # We should catch that and raise a better error.
@@ -349,6 +354,14 @@ def get_auth_provider_class(credentials):
         return auth.KeystoneV2AuthProvider, CONF.identity.uri
 
 
+def get_token_cache():
+    """Token cache shared by the test processes, if enabled"""
+    if not CONF.auth.shared_token_cache:
+        return None
+    return auth.FileTokenCache(
+        os.path.join(lockutils.get_lock_path(CONF), 'tokens'))
+
+
 def get_auth_provider(credentials, pre_auth=False, scope='project'):
     # kwargs for auth provider match the common ones used by service clients
     default_params = config.service_client_config()
@@ -357,9 +370,10 @@ def get_auth_provider(credentials, pre_auth=False, scope='project'):
             'Credentials must be specified')
     auth_provider_class, auth_url = get_auth_provider_class(
         credentials)
-    _auth_provider = auth_provider_class(credentials, auth_url,
-                                         scope=scope,
-                                         **default_params)
+    _auth_provider = auth_provider_class(
+        credentials, auth_url, scope=scope, token_cache=get_token_cache(),
+        background_refresh=CONF.auth.background_token_refresh,
+        **default_params)
     if pre_auth:
         _auth_provider.set_auth()
     return _auth_provider
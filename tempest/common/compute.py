@@ -209,7 +209,8 @@ def create_test_server(clients, validatable=False, validation_resources=None,
 
     def _setup_validation_fip():
         if CONF.service_available.neutron:
-            ifaces = clients.interfaces_client.list_interfaces(server['id'])
+            ifaces = clients.interfaces_client.list_interfaces(
+                servers[0]['id'])
             validation_port = None
             for iface in ifaces['interfaceAttachments']:
                 if iface['net_id'] == tenant_network['id']:
@@ -217,7 +218,7 @@ def create_test_server(clients, validatable=False, validation_resources=None,
                     break
             if not validation_port:
                 # NOTE(artom) This will get caught by the catch-all clause in
-                # the wait_until loop below
+                # the wait_until block below
                 raise ValueError('Unable to setup floating IP for validation: '
                                  'port not found on tenant network')
             clients.floating_ips_client.update_floatingip(
@@ -233,40 +234,49 @@ def create_test_server(clients, validatable=False, validation_resources=None,
             servers[0], validation_resources['floating_ip'])
 
     if wait_until:
-        for server in servers:
-            try:
+        try:
+            if multiple_create_request:
+                # Wait for all the servers at once, listing them instead of
+                # showing each of them
+                # The servers are listed by reservation id if the request
+                # returned it
+                waiters.wait_for_many(
+                    [(clients.servers_client, server['id'], wait_until)
+                     for server in servers], request_id=request_id,
+                    reservation_id=body.get('reservation_id'))
+            else:
                 waiters.wait_for_server_status(
-                    clients.servers_client, server['id'], wait_until,
+                    clients.servers_client, servers[0]['id'], wait_until,
                     request_id=request_id)
 
-                # Multiple validatable servers are not supported for now. Their
-                # creation will fail with the condition above.
-                if CONF.validation.run_validation and validatable:
-                    if CONF.validation.connect_method == 'floating':
-                        _setup_validation_fip()
-
-            except Exception:
-                with excutils.save_and_reraise_exception():
-                    for server in servers:
-                        try:
-                            clients.servers_client.delete_server(
-                                server['id'])
-                        except Exception:
-                            LOG.exception('Deleting server %s failed',
-                                          server['id'])
-                    for server in servers:
-                        # NOTE(artom) If the servers were booted with volumes
-                        # and with delete_on_termination=False we need to wait
-                        # for the servers to go away before proceeding with
-                        # cleanup, otherwise we'll attempt to delete the
-                        # volumes while they're still attached to servers that
-                        # are in the process of being deleted.
-                        try:
-                            waiters.wait_for_server_termination(
-                                clients.servers_client, server['id'])
-                        except Exception:
-                            LOG.exception('Server %s failed to delete in time',
-                                          server['id'])
+            # Multiple validatable servers are not supported for now. Their
+            # creation will fail with the condition above.
+            if CONF.validation.run_validation and validatable:
+                if CONF.validation.connect_method == 'floating':
+                    _setup_validation_fip()
+
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for server in servers:
+                    try:
+                        clients.servers_client.delete_server(
+                            server['id'])
+                    except Exception:
+                        LOG.exception('Deleting server %s failed',
+                                      server['id'])
+                for server in servers:
+                    # NOTE(artom) If the servers were booted with volumes
+                    # and with delete_on_termination=False we need to wait
+                    # for the servers to go away before proceeding with
+                    # cleanup, otherwise we'll attempt to delete the
+                    # volumes while they're still attached to servers that
+                    # are in the process of being deleted.
+                    try:
+                        waiters.wait_for_server_termination(
+                            clients.servers_client, server['id'])
+                    except Exception:
+                        LOG.exception('Server %s failed to delete in time',
+                                      server['id'])
 
     return body, servers
 
@@ -11,11 +11,14 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import atexit
+
 from oslo_concurrency import lockutils
 
 from tempest import clients
 from tempest import config
 from tempest.lib import auth
+from tempest.lib.common import cidr_allocator
 from tempest.lib.common import dynamic_creds
 from tempest.lib.common import preprov_creds
 from tempest.lib import exceptions
@@ -37,6 +40,45 @@ to avoid circular dependencies."""
 
 # === Credential Providers
 
+# Dynamic credentials pool of the process, see get_dynamic_credentials_pool
+_dynamic_credentials_pool = None
+
+
+def get_dynamic_credentials_pool():
+    """Dynamic credentials pool of the process, if enabled in configuration
+
+    The credentials left in the pool are deleted when the process exits.
+
+    :return: A `DynamicCredentialsPool`, or None
+    """
+    global _dynamic_credentials_pool
+    if CONF.auth.dynamic_credentials_pool_size <= 0:
+        return None
+    if _dynamic_credentials_pool is None:
+        _dynamic_credentials_pool = dynamic_creds.DynamicCredentialsPool(
+            CONF.auth.dynamic_credentials_pool_size)
+        atexit.register(_dynamic_credentials_pool.clear)
+    return _dynamic_credentials_pool
+
+
+def get_project_cidr_allocator(ip_version=4):
+    """Allocator of the configured project network CIDRs
+
+    The allocator is shared, through the lock path, with the other processes
+    of the test run.
+
+    :param ip_version: 4 or 6
+    :return: A `CIDRAllocator`
+    """
+    if ip_version == 6:
+        cidr = CONF.network.project_network_v6_cidr
+        mask_bits = CONF.network.project_network_v6_mask_bits
+    else:
+        cidr = CONF.network.project_network_cidr
+        mask_bits = CONF.network.project_network_mask_bits
+    return cidr_allocator.CIDRAllocator(lockutils.get_lock_path(CONF), cidr,
+                                        mask_bits)
+
 
 # Subset of the parameters of credential providers that depend on configuration
 def _get_common_provider_params(identity_version):
@@ -83,6 +125,7 @@ def get_dynamic_provider_params(identity_version, admin_creds=None):
         ('neutron_available', CONF.service_available.neutron),
         ('project_network_cidr', CONF.network.project_network_cidr),
         ('project_network_mask_bits', CONF.network.project_network_mask_bits),
+        ('cidr_allocator', get_project_cidr_allocator()),
         ('public_network_id', CONF.network.public_network_id),
         ('create_networks', (CONF.auth.create_isolated_networks and not
                              CONF.network.shared_physical_network)),
@@ -135,9 +178,13 @@ def get_credentials_provider(name, network_resources=None,
     # the test should be skipped else it would fail.
     identity_version = identity_version or CONF.identity.auth_version
     if CONF.auth.use_dynamic_credentials or force_tenant_isolation:
+        # A test forcing isolation gets credentials created for it
+        credentials_pool = (None if force_tenant_isolation else
+                            get_dynamic_credentials_pool())
         return dynamic_creds.DynamicCredentialProvider(
             name=name,
             network_resources=network_resources,
+            credentials_pool=credentials_pool,
             **get_dynamic_provider_params(identity_version))
     else:
         if CONF.auth.test_accounts_file:
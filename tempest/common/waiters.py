@@ -10,6 +10,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextvars
+import functools
+import inspect
 import re
 import time
 
@@ -18,6 +21,9 @@ from oslo_log import log as logging
 from tempest.common import image as common_image
 from tempest import config
 from tempest import exceptions
+from tempest.lib.common import polling
+from tempest.lib.common import request_log
+from tempest.lib.common import server_events
 from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions as lib_exc
 from tempest.lib.services.image.v1 import images_client as images_v1_client
@@ -26,23 +32,154 @@ CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
 
+# The timeline of the resource the running waiter waits for, when
+# [debug] waiter_timeline_file is set
+_current_timeline = contextvars.ContextVar('tempest_waiter_timeline',
+                                           default=None)
+
+
 def _get_task_state(body):
     return body.get('OS-EXT-STS:task_state', None)
 
 
+class _Timeline(object):
+    """Polls, response bytes and transitions of a waited resource"""
+
+    def __init__(self, waiter, resource_id, target):
+        self.record = {
+            'test': test_utils.find_test_caller(),
+            'waiter': waiter,
+            'resource_id': resource_id,
+            'target': target,
+            'start': time.time(),
+            'polls': 0,
+            'bytes': 0,
+            'transitions': [],
+        }
+        self.start_time = time.monotonic()
+        self.state = None
+
+    def poll(self, resp, status, task_state=None):
+        self.record['polls'] += 1
+        headers = getattr(resp, 'response', None) or {}
+        try:
+            self.record['bytes'] += int(headers.get('content-length', 0))
+        except (TypeError, ValueError):
+            pass
+        if (status, task_state) != self.state:
+            self.state = (status, task_state)
+            self.record['transitions'].append({
+                'time': round(time.monotonic() - self.start_time, 3),
+                'status': status,
+                'task_state': task_state,
+            })
+
+    def finish(self, outcome):
+        self.record['outcome'] = outcome
+        self.record['duration'] = round(time.monotonic() - self.start_time,
+                                        3)
+        request_log.get_sink(CONF.debug.waiter_timeline_file).write(
+            self.record)
+
+
+def _record_timeline(resource_arg, target_arg=None):
+    """Record the timeline of the resource a waiter waits for
+
+    When `[debug] waiter_timeline_file` is set, the timeline is appended to
+    the file when the waiter returns or raises. The waiter reports its polls
+    with `_record_poll`.
+
+    :param resource_arg: Name of the argument of the waiter with the ID of
+                         the resource
+    :param target_arg: Name of the argument of the waiter with the awaited
+                       status, if any
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CONF.debug.waiter_timeline_file:
+                return func(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs).arguments
+            timeline = _Timeline(func.__name__, arguments[resource_arg],
+                                 arguments.get(target_arg))
+            token = _current_timeline.set(timeline)
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'reached'
+                return result
+            except lib_exc.TimeoutException:
+                outcome = 'timeout'
+                raise
+            finally:
+                _current_timeline.reset(token)
+                # NOTE: Failing to record the timeline must not change the
+                # result of the waiter
+                try:
+                    timeline.finish(outcome)
+                except Exception:
+                    LOG.warning('Failed to record the timeline of %s',
+                                timeline.record['resource_id'], exc_info=True)
+        return wrapper
+    return decorator
+
+
+def _record_poll(resp, status, task_state=None):
+    timeline = _current_timeline.get()
+    if timeline is not None:
+        timeline.poll(resp, status, task_state)
+
+
+def get_server_event_source():
+    """Source of the server events configured for the waiters
+
+    :return: A `ServerEventSource`, or None when the waiters poll the
+             servers
+    """
+    if CONF.compute.server_events_file:
+        return server_events.FileServerEventSource(
+            CONF.compute.server_events_file)
+    return None
+
+
 # NOTE(afazekas): This function needs to know a token and a subject.
+@_record_timeline('server_id', 'status')
 def wait_for_server_status(client, server_id, status, ready_wait=True,
                            extra_timeout=0, raise_on_error=True,
-                           request_id=None):
-    """Waits for a server to reach a given status."""
+                           request_id=None, event_source=None):
+    """Waits for a server to reach a given status.
 
+    With an event source, the server is shown when an event about it
+    arrives, or after `[compute] server_events_timeout` seconds without any,
+    instead of every build interval. The event source defaults to the one
+    configured for the waiters.
+    """
+    if event_source is None:
+        event_source = get_server_event_source()
+    watcher = event_source.watch(server_id) if event_source else None
+    try:
+        return _wait_for_server_status(client, server_id, status, ready_wait,
+                                       extra_timeout, raise_on_error,
+                                       request_id, watcher)
+    finally:
+        if watcher:
+            watcher.close()
+
+
+def _wait_for_server_status(client, server_id, status, ready_wait,
+                            extra_timeout, raise_on_error, request_id,
+                            watcher):
     # NOTE(afazekas): UNKNOWN status possible on ERROR
     # or in a very early stage.
-    body = client.show_server(server_id)['server']
+    resp = client.show_server(server_id)
+    body = resp['server']
     old_status = server_status = body['status']
     old_task_state = task_state = _get_task_state(body)
-    start_time = int(time.time())
+    _record_poll(resp, server_status, task_state)
     timeout = client.build_timeout + extra_timeout
+    poller = polling.start_polling(client, timeout)
     while True:
         # NOTE(afazekas): Now the BUILD status only reached
         # between the UNKNOWN->ACTIVE transition.
@@ -62,15 +199,21 @@ def wait_for_server_status(client, server_id, status, ready_wait=True,
             else:
                 return
 
-        time.sleep(client.build_interval)
-        body = client.show_server(server_id)['server']
+        if watcher:
+            watcher.wait(min(CONF.compute.server_events_timeout,
+                             poller.remaining))
+        else:
+            poller.sleep()
+        resp = client.show_server(server_id)
+        body = resp['server']
         server_status = body['status']
         task_state = _get_task_state(body)
+        _record_poll(resp, server_status, task_state)
         if (server_status != old_status) or (task_state != old_task_state):
             LOG.info('State transition "%s" ==> "%s" after %d second wait',
                      '/'.join((old_status, str(old_task_state))),
                      '/'.join((server_status, str(task_state))),
-                     time.time() - start_time)
+                     poller.elapsed)
         if (server_status == 'ERROR') and raise_on_error:
             details = ''
             if 'fault' in body:
@@ -79,7 +222,7 @@ def wait_for_server_status(client, server_id, status, ready_wait=True,
                 details += ' Server boot request ID: %s.' % request_id
             raise exceptions.BuildErrorException(details, server_id=server_id)
 
-        timed_out = int(time.time()) - start_time >= timeout
+        timed_out = poller.expired
 
         if timed_out:
             expected_task_state = 'None' if ready_wait else 'n/a'
@@ -102,28 +245,33 @@ def wait_for_server_status(client, server_id, status, ready_wait=True,
         old_task_state = task_state
 
 
+@_record_timeline('server_id')
 def wait_for_server_termination(client, server_id, ignore_error=False):
     """Waits for server to reach termination."""
     try:
-        body = client.show_server(server_id)['server']
+        resp = client.show_server(server_id)
     except lib_exc.NotFound:
         return
+    body = resp['server']
     old_status = body['status']
     old_task_state = _get_task_state(body)
-    start_time = int(time.time())
+    _record_poll(resp, old_status, old_task_state)
+    poller = polling.start_polling(client)
     while True:
-        time.sleep(client.build_interval)
+        poller.sleep()
         try:
-            body = client.show_server(server_id)['server']
+            resp = client.show_server(server_id)
         except lib_exc.NotFound:
             return
+        body = resp['server']
         server_status = body['status']
         task_state = _get_task_state(body)
+        _record_poll(resp, server_status, task_state)
         if (server_status != old_status) or (task_state != old_task_state):
             LOG.info('State transition "%s" ==> "%s" after %d second wait',
                      '/'.join((old_status, str(old_task_state))),
                      '/'.join((server_status, str(task_state))),
-                     time.time() - start_time)
+                     poller.elapsed)
         if server_status == 'ERROR' and not ignore_error:
             raise lib_exc.DeleteErrorException(
                 "Server %s failed to delete and is in ERROR status" %
@@ -141,12 +289,13 @@ def wait_for_server_termination(client, server_id, ignore_error=False):
                 # NotFound exception
                 return
 
-        if int(time.time()) - start_time >= client.build_timeout:
+        if poller.expired:
             raise lib_exc.TimeoutException
         old_status = server_status
         old_task_state = task_state
 
 
+@_record_timeline('image_id', 'status')
 def wait_for_image_status(client, image_id, status):
     """Waits for an image to reach a given status.
 
@@ -166,15 +315,16 @@ def wait_for_image_status(client, image_id, status):
         show_image = client.show_image
 
     current_status = 'An unknown status'
-    start = int(time.time())
-    while int(time.time()) - start < client.build_timeout:
-        image = show_image(image_id)
+    poller = polling.start_polling(client)
+    while not poller.expired:
+        resp = image = show_image(image_id)
         # Compute image client returns response wrapped in 'image' element
         # which is not the case with Glance image client.
         if 'image' in image:
             image = image['image']
 
         current_status = image['status']
+        _record_poll(resp, current_status)
         if current_status == status:
             return
         if current_status.lower() == 'killed':
@@ -183,7 +333,7 @@ def wait_for_image_status(client, image_id, status):
         if current_status.lower() == 'error':
             raise exceptions.AddImageException(image_id=image_id)
 
-        time.sleep(client.build_interval)
+        poller.sleep()
 
     message = ('Image %(image_id)s failed to reach %(status)s state '
                '(current state %(current_status)s) within the required '
@@ -200,14 +350,14 @@ def wait_for_image_status(client, image_id, status):
 def wait_for_image_tasks_status(client, image_id, status):
     """Waits for an image tasks to reach a given status."""
     pending_tasks = []
-    start = int(time.time())
-    while int(time.time()) - start < client.build_timeout:
+    poller = polling.start_polling(client)
+    while not poller.expired:
         tasks = client.show_image_tasks(image_id)['tasks']
 
         pending_tasks = [task for task in tasks if task['status'] != status]
         if not pending_tasks:
             return tasks
-        time.sleep(client.build_interval)
+        poller.sleep()
 
     message = ('Image %(image_id)s tasks: %(pending_tasks)s '
                'failed to reach %(status)s state within the required '
@@ -231,8 +381,8 @@ def wait_for_image_imported_to_stores(client, image_id, stores=None):
     """
 
     exc_cls = lib_exc.TimeoutException
-    start = int(time.time())
-    while int(time.time()) - start < client.build_timeout:
+    poller = polling.start_polling(client)
+    while not poller.expired:
         image = client.show_image(image_id)
         if image['status'] == 'active' and (stores is None or
                                             image['stores'] == stores):
@@ -241,7 +391,7 @@ def wait_for_image_imported_to_stores(client, image_id, stores=None):
             exc_cls = lib_exc.OtherRestClientException
             break
 
-        time.sleep(client.build_interval)
+        poller.sleep()
 
     message = ('Image %s failed to import on stores: %s' %
                (image_id, str(image.get('os_glance_failed_import'))))
@@ -258,9 +408,9 @@ def wait_for_image_copied_to_stores(client, image_id):
     This return the list of stores where copy is failed.
     """
 
-    start = int(time.time())
+    poller = polling.start_polling(client)
     store_left = []
-    while int(time.time()) - start < client.build_timeout:
+    while not poller.expired:
         image = client.show_image(image_id)
         store_left = image.get('os_glance_importing_to_stores')
         # NOTE(danms): If os_glance_importing_to_stores is None, then
@@ -272,7 +422,7 @@ def wait_for_image_copied_to_stores(client, image_id):
             raise exceptions.ImageKilledException(image_id=image_id,
                                                   status=image['status'])
 
-        time.sleep(client.build_interval)
+        poller.sleep()
 
     message = ('Image %s failed to finish the copy operation '
                'on stores: %s' % (image_id, str(store_left)))
@@ -282,6 +432,7 @@ def wait_for_image_copied_to_stores(client, image_id):
     raise lib_exc.TimeoutException(message)
 
 
+@_record_timeline('resource_id', 'status')
 def wait_for_volume_resource_status(client, resource_id, status):
     """Waits for a volume resource to reach a given status.
 
@@ -293,13 +444,16 @@ def wait_for_volume_resource_status(client, resource_id, status):
         r'(volume|group-snapshot|snapshot|backup|group)',
         client.resource_type)[-1].replace('-', '_')
     show_resource = getattr(client, 'show_' + resource_name)
-    resource_status = show_resource(resource_id)[resource_name]['status']
-    start = int(time.time())
+    resp = show_resource(resource_id)
+    resource_status = resp[resource_name]['status']
+    _record_poll(resp, resource_status)
+    poller = polling.start_polling(client)
 
     while resource_status != status:
-        time.sleep(client.build_interval)
-        resource_status = show_resource(resource_id)[
-            '{}'.format(resource_name)]['status']
+        poller.sleep()
+        resp = show_resource(resource_id)
+        resource_status = resp['{}'.format(resource_name)]['status']
+        _record_poll(resp, resource_status)
         if resource_status == 'error' and resource_status != status:
             raise exceptions.VolumeResourceBuildErrorException(
                 resource_name=resource_name, resource_id=resource_id)
@@ -308,29 +462,248 @@ def wait_for_volume_resource_status(client, resource_id, status):
         if resource_status == 'error_extending' and resource_status != status:
             raise exceptions.VolumeExtendErrorException(volume_id=resource_id)
 
-        if int(time.time()) - start >= client.build_timeout:
+        if poller.expired:
             message = ('%s %s failed to reach %s status (current %s) '
                        'within the required time (%s s).' %
                        (resource_name, resource_id, status, resource_status,
                         client.build_timeout))
             raise lib_exc.TimeoutException(message)
     LOG.info('%s %s reached %s after waiting for %f seconds',
-             resource_name, resource_id, status, time.time() - start)
+             resource_name, resource_id, status, poller.elapsed)
+
+
+def _check_server_status(server, status, ready_wait, request_id):
+    # NOTE(afazekas): The instance is in "ready for action state" when no
+    # task in progress
+    if status == 'BUILD' and server['status'] != 'UNKNOWN':
+        return True
+    if server['status'] == status:
+        return not ready_wait or _get_task_state(server) is None
+    if server['status'] == 'ERROR':
+        details = ''
+        if 'fault' in server:
+            details += 'Fault: %s.' % server['fault']
+        if request_id:
+            details += ' Server boot request ID: %s.' % request_id
+        raise exceptions.BuildErrorException(details,
+                                             server_id=server['id'])
+    return False
+
+
+def _check_image_status(image, status):
+    if image['status'] == status:
+        return True
+    if image['status'].lower() == 'killed':
+        raise exceptions.ImageKilledException(image_id=image['id'],
+                                              status=status)
+    if image['status'].lower() == 'error':
+        raise exceptions.AddImageException(image_id=image['id'])
+    return False
+
+
+def _check_volume_resource_status(resource_name, resource, status):
+    resource_status = resource['status']
+    if resource_status == status:
+        return True
+    if resource_status == 'error':
+        raise exceptions.VolumeResourceBuildErrorException(
+            resource_name=resource_name, resource_id=resource['id'])
+    if resource_name == 'volume' and resource_status == 'error_restoring':
+        raise exceptions.VolumeRestoreErrorException(volume_id=resource['id'])
+    if resource_status == 'error_extending':
+        raise exceptions.VolumeExtendErrorException(volume_id=resource['id'])
+    return False
+
+
+def _get_many_waiter(client, ready_wait, request_id, reservation_id):
+    """Returns the functions used by wait_for_many for a client
+
+    Only the Glance v2 images are listed by id. The servers are listed by
+    reservation id when one is given, and the other resources are listed
+    without filter, so the listing functions return the given resources
+    among others.
+
+    :returns: The name of the resources of the client, a function listing
+              the resources with the given ids, a function showing a
+              resource, and a function checking if a resource is in the
+              given status.
+    """
+    if hasattr(client, 'show_server'):
+        params = {}
+        if reservation_id:
+            params['reservation_id'] = reservation_id
+        return (
+            'server',
+            lambda ids: client.list_servers(detail=True, **params)['servers'],
+            lambda server_id: client.show_server(server_id)['server'],
+            lambda server, status: _check_server_status(
+                server, status, ready_wait, request_id))
+    if isinstance(client, images_v1_client.ImagesClient):
+        # NOTE: The images are shown one by one, with the details from the
+        # headers of a HEAD request, see wait_for_image_status
+        def _show_image_v1(image_id):
+            resp = client.check_image(image_id)
+            return dict(common_image.get_image_meta_from_headers(resp),
+                        id=image_id)
+
+        return 'image', None, _show_image_v1, _check_image_status
+    if hasattr(client, 'show_image'):
+        if client.resource_type == 'image':
+            def _list_images(ids):
+                return client.list_images(
+                    params={'id': 'in:' + ','.join(ids)})['images']
+        else:
+            # Compute image client returns response wrapped in 'image'
+            # element which is not the case with Glance image client.
+            def _list_images(ids):
+                return client.list_images(detail=True)['images']
+
+        def _show_image(image_id):
+            image = client.show_image(image_id)
+            return image.get('image', image)
+
+        return 'image', _list_images, _show_image, _check_image_status
+    resource_name = re.findall(
+        r'(volume|group-snapshot|snapshot|backup|group)',
+        client.resource_type)[-1].replace('-', '_')
+    list_resources = getattr(client, 'list_%ss' % resource_name)
+    show_resource = getattr(client, 'show_' + resource_name)
+    return (
+        resource_name,
+        lambda ids: list_resources(detail=True)[resource_name + 's'],
+        lambda resource_id: show_resource(resource_id)[resource_name],
+        lambda resource, status: _check_volume_resource_status(
+            resource_name, resource, status))
+
+
+def wait_for_many(resources, ready_wait=True, raise_on_error=True,
+                  request_id=None, reservation_id=None):
+    """Waits for several resources to reach their given status.
+
+    Instead of showing each resource in turn, the resources of a client are
+    listed with a single request per build interval. The resources missing
+    from the list are shown one by one. The Glance v2 images are listed by
+    id, and the servers by reservation id if given. The compute images and
+    the volume resources can't be filtered by id, so all the resources of
+    the project are listed.
+
+    :param resources: Iterable of (client, resource_id, status) tuples. The
+        client may be a compute servers client, an image client, or a
+        volume, snapshot, backup, group or group snapshot client.
+    :param ready_wait: Whether to wait for the servers to have no task in
+        progress, as in wait_for_server_status.
+    :param raise_on_error: Whether to raise the error of the first resource
+        failing to reach its status. If False, the waiter keeps waiting for
+        the other resources, and returns the error of the resource instead.
+    :param request_id: ID of the request creating the servers, for the
+        error messages.
+    :param reservation_id: Reservation ID of the multiple create request of
+        the servers, to list only them. Otherwise all the servers of the
+        project are listed.
+    :returns: A dict with the last body of each resource, or its error if
+        raise_on_error is False, by resource id.
+    """
+    waits = []
+    clients = {}
+    for client, resource_id, status in resources:
+        if id(client) not in clients:
+            clients[id(client)] = (
+                client,
+                _get_many_waiter(client, ready_wait, request_id,
+                                 reservation_id),
+                {})
+            waits.append(clients[id(client)])
+        clients[id(client)][2][resource_id] = status
+    if not waits:
+        return {}
+    results = {}
+    current_status = {}
+    servers_ready = False
+    # The loop polls as often as the client with the shortest build interval
+    # requires, and expires with the longest build timeout
+    poller = polling.start_polling(
+        min((wait[0] for wait in waits), key=lambda c: c.build_interval),
+        timeout=max(wait[0].build_timeout for wait in waits))
+
+    def _failed(resource_id, error):
+        if raise_on_error:
+            raise error
+        results[resource_id] = error
+
+    while True:
+        for client, waiter, pending in waits:
+            if not pending:
+                continue
+            resource_name, list_resources, show_resource, check_status = waiter
+            listed = {}
+            if list_resources is not None:
+                listed = dict((resource['id'], resource) for resource in
+                              list_resources(list(pending)))
+            for resource_id, status in list(pending.items()):
+                try:
+                    resource = listed.get(resource_id)
+                    if resource is None:
+                        resource = show_resource(resource_id)
+                    current_status[resource_id] = resource['status']
+                    if not check_status(resource, status):
+                        continue
+                except Exception as exc:
+                    del pending[resource_id]
+                    _failed(resource_id, exc)
+                    continue
+                del pending[resource_id]
+                results[resource_id] = resource
+                if resource_name == 'server' and status != 'BUILD':
+                    servers_ready = True
+                LOG.info('%s %s reached %s after waiting for %f seconds',
+                         resource_name, resource_id, status,
+                         poller.elapsed)
+        waiting = False
+        for client, waiter, pending in waits:
+            if not pending:
+                continue
+            if poller.elapsed < client.build_timeout:
+                waiting = True
+                continue
+            for resource_id, status in list(pending.items()):
+                del pending[resource_id]
+                message = ('%s %s failed to reach %s status (current %s) '
+                           'within the required time (%s s).' %
+                           (waiter[0], resource_id, status,
+                            current_status.get(resource_id),
+                            client.build_timeout))
+                if request_id:
+                    message += ' Request ID: %s.' % request_id
+                caller = test_utils.find_test_caller()
+                if caller:
+                    message = '(%s) %s' % (caller, message)
+                _failed(resource_id, lib_exc.TimeoutException(message))
+        if not waiting:
+            break
+        poller.sleep()
+    if ready_wait and servers_ready:
+        # without state api extension 3 sec usually enough, see
+        # wait_for_server_status
+        time.sleep(CONF.compute.ready_wait)
+    return results
 
 
+@_record_timeline('volume_id', 'server_id')
 def wait_for_volume_attachment_create(client, volume_id, server_id):
     """Waits for a volume attachment to be created at a given volume."""
-    start = int(time.time())
+    poller = polling.start_polling(client)
     while True:
-        attachments = client.show_volume(volume_id)['volume']['attachments']
+        resp = client.show_volume(volume_id)
+        _record_poll(resp, resp['volume'].get('status'))
+        attachments = resp['volume']['attachments']
         found = [a for a in attachments if a['server_id'] == server_id]
         if found:
             LOG.info('Attachment %s created for volume %s to server %s after '
                      'waiting for %f seconds', found[0]['attachment_id'],
-                     volume_id, server_id, time.time() - start)
+                     volume_id, server_id, poller.elapsed)
             return found[0]
-        time.sleep(client.build_interval)
-        if int(time.time()) - start >= client.build_timeout:
+        poller.sleep()
+        if poller.expired:
             message = ('Failed to attach volume %s to server %s '
                        'within the required time (%s s).' %
                        (volume_id, server_id, client.build_timeout))
@@ -339,18 +712,18 @@ def wait_for_volume_attachment_create(client, volume_id, server_id):
 
 def wait_for_volume_attachment_remove(client, volume_id, attachment_id):
     """Waits for a volume attachment to be removed from a given volume."""
-    start = int(time.time())
+    poller = polling.start_polling(client)
     attachments = client.show_volume(volume_id)['volume']['attachments']
     while any(attachment_id == a['attachment_id'] for a in attachments):
-        time.sleep(client.build_interval)
-        if int(time.time()) - start >= client.build_timeout:
+        poller.sleep()
+        if poller.expired:
             message = ('Failed to remove attachment %s from volume %s '
                        'within the required time (%s s).' %
                        (attachment_id, volume_id, client.build_timeout))
             raise lib_exc.TimeoutException(message)
         attachments = client.show_volume(volume_id)['volume']['attachments']
     LOG.info('Attachment %s removed from volume %s after waiting for %f '
-             'seconds', attachment_id, volume_id, time.time() - start)
+             'seconds', attachment_id, volume_id, poller.elapsed)
 
 
 def wait_for_volume_attachment_remove_from_server(
@@ -359,8 +732,6 @@ def wait_for_volume_attachment_remove_from_server(
 
     This waiter checks the compute API if the volume attachment is removed.
     """
-    start = int(time.time())
-
     try:
         volumes = client.list_volume_attachments(
             server_id)['volumeAttachments']
@@ -369,10 +740,11 @@ def wait_for_volume_attachment_remove_from_server(
         # is already detached.
         return
 
+    poller = polling.start_polling(client)
     while any(volume for volume in volumes if volume['volumeId'] == volume_id):
-        time.sleep(client.build_interval)
+        poller.sleep()
 
-        timed_out = int(time.time()) - start >= client.build_timeout
+        timed_out = poller.expired
         if timed_out:
             console_output = client.get_console_output(server_id)['output']
             LOG.debug('Console output for %s\nbody=\n%s',
@@ -392,25 +764,30 @@ def wait_for_volume_attachment_remove_from_server(
     return
 
 
+@_record_timeline('volume_id', 'new_host')
 def wait_for_volume_migration(client, volume_id, new_host):
     """Waits for a Volume to move to a new host."""
-    body = client.show_volume(volume_id)['volume']
+    resp = client.show_volume(volume_id)
+    body = resp['volume']
     host = body['os-vol-host-attr:host']
     migration_status = body['migration_status']
-    start = int(time.time())
+    _record_poll(resp, migration_status)
+    poller = polling.start_polling(client)
 
     # new_host is hostname@backend while current_host is hostname@backend#type
     while migration_status != 'success' or new_host not in host:
-        time.sleep(client.build_interval)
-        body = client.show_volume(volume_id)['volume']
+        poller.sleep()
+        resp = client.show_volume(volume_id)
+        body = resp['volume']
         host = body['os-vol-host-attr:host']
         migration_status = body['migration_status']
+        _record_poll(resp, migration_status)
 
         if migration_status == 'error':
             message = ('volume %s failed to migrate.' % (volume_id))
             raise lib_exc.TempestException(message)
 
-        if int(time.time()) - start >= client.build_timeout:
+        if poller.expired:
             message = ('Volume %s failed to migrate to %s (current %s) '
                        'within the required time (%s s).' %
                        (volume_id, new_host, host, client.build_timeout))
@@ -421,14 +798,14 @@ def wait_for_volume_retype(client, volume_id, new_volume_type):
     """Waits for a Volume to have a new volume type."""
     body = client.show_volume(volume_id)['volume']
     current_volume_type = body['volume_type']
-    start = int(time.time())
+    poller = polling.start_polling(client)
 
     while current_volume_type != new_volume_type:
-        time.sleep(client.build_interval)
+        poller.sleep()
         body = client.show_volume(volume_id)['volume']
         current_volume_type = body['volume_type']
 
-        if int(time.time()) - start >= client.build_timeout:
+        if poller.expired:
             message = ('Volume %s failed to reach %s volume type (current %s) '
                        'within the required time (%s s).' %
                        (volume_id, new_volume_type, current_volume_type,
@@ -445,7 +822,7 @@ def wait_for_qos_operations(client, qos_id, operation, args=None):
     args = volume-type-id disassociated when operation = 'disassociate'
     args = None when operation = 'disassociate-all'
     """
-    start_time = int(time.time())
+    poller = polling.start_polling(client)
     while True:
         if operation == 'qos-key-unset':
             body = client.show_qos(qos_id)['qos_specs']
@@ -463,9 +840,9 @@ def wait_for_qos_operations(client, qos_id, operation, args=None):
             msg = (" operation value is either not defined or incorrect.")
             raise lib_exc.UnprocessableEntity(msg)
 
-        if int(time.time()) - start_time >= client.build_timeout:
+        if poller.expired:
             raise lib_exc.TimeoutException
-        time.sleep(client.build_interval)
+        poller.sleep()
 
 
 def wait_for_interface_status(client, server_id, port_id, status):
@@ -473,15 +850,15 @@ def wait_for_interface_status(client, server_id, port_id, status):
     body = (client.show_interface(server_id, port_id)
             ['interfaceAttachment'])
     interface_status = body['port_state']
-    start = int(time.time())
+    poller = polling.start_polling(client)
 
     while(interface_status != status):
-        time.sleep(client.build_interval)
+        poller.sleep()
         body = (client.show_interface(server_id, port_id)
                 ['interfaceAttachment'])
         interface_status = body['port_state']
 
-        timed_out = int(time.time()) - start >= client.build_timeout
+        timed_out = poller.expired
 
         if interface_status != status and timed_out:
             message = ('Interface %s failed to reach %s status '
@@ -513,16 +890,16 @@ def wait_for_interface_detach(client, server_id, port_id, detach_request_id):
 
     detach_event_results = _get_detach_event_results()
 
-    start = int(time.time())
+    poller = polling.start_polling(client)
 
     while "Success" not in detach_event_results:
-        time.sleep(client.build_interval)
+        poller.sleep()
         detach_event_results = _get_detach_event_results()
         if "Success" in detach_event_results:
             return client.show_instance_action(
                 server_id, detach_request_id)['instanceAction']
 
-        timed_out = int(time.time()) - start >= client.build_timeout
+        timed_out = poller.expired
         if timed_out:
             message = ('Interface %s failed to detach from server %s within '
                        'the required time (%s s)' % (port_id, server_id,
@@ -552,7 +929,7 @@ def wait_for_server_floating_ip(servers_client, server, floating_ip,
                     return address
         return None
 
-    start_time = int(time.time())
+    poller = polling.start_polling(servers_client)
     while True:
         server = servers_client.show_server(server['id'])['server']
         address = _get_floating_ip_in_server_addresses(floating_ip, server)
@@ -561,7 +938,7 @@ def wait_for_server_floating_ip(servers_client, server, floating_ip,
         if not wait_for_disassociate and address:
             return address
 
-        if int(time.time()) - start_time >= servers_client.build_timeout:
+        if poller.expired:
             if wait_for_disassociate:
                 msg = ('Floating ip %s failed to disassociate from server %s '
                        'in time.' % (floating_ip, server['id']))
@@ -569,4 +946,4 @@ def wait_for_server_floating_ip(servers_client, server, floating_ip,
                 msg = ('Floating ip %s failed to associate with server %s '
                        'in time.' % (floating_ip, server['id']))
             raise lib_exc.TimeoutException(msg)
-        time.sleep(servers_client.build_interval)
+        poller.sleep()
@@ -21,6 +21,7 @@ from oslo_config import cfg
 from oslo_config import types
 from oslo_log import log as logging
 
+from tempest.lib.common import polling
 from tempest.lib import exceptions
 from tempest.lib.services import clients
 from tempest.test_discover import plugins
@@ -76,6 +77,15 @@ AuthGroup = [
                      "creates. However in some neutron configurations, like "
                      "with VLAN provider networks, this doesn't work. So if "
                      "set to False the isolated networks will not be created"),
+    cfg.IntOpt('dynamic_credentials_pool_size',
+               default=0,
+               help="Number of sets of dynamic credentials, with their "
+                    "network resources, that each test process keeps to "
+                    "reuse them in the next test classes instead of "
+                    "deleting them, until it exits. Credentials are only "
+                    "reused if the test class did not leave ports in their "
+                    "project. When set to 0, dynamic credentials are "
+                    "deleted at the end of each test class."),
     cfg.StrOpt('admin_username',
                help="Username for an administrative user. This is needed for "
                     "authenticating requests made by project isolation to "
@@ -110,6 +120,21 @@ AuthGroup = [
                     "This must be set to 'all' if using the "
                     "[oslo_policy]/enforce_scope=true option for the "
                     "identity service."),
+    cfg.BoolOpt('shared_token_cache',
+                default=False,
+                help="Share the tokens obtained for a set of credentials "
+                     "between the test processes of a run, through files in "
+                     "a 'tokens' directory under the oslo_concurrency "
+                     "lock_path. A process then reuses a valid token instead "
+                     "of authenticating again with the same credentials, "
+                     "which reduces the load on keystone when running in "
+                     "parallel with pre-provisioned credentials."),
+    cfg.BoolOpt('background_token_refresh',
+                default=False,
+                help="Refresh tokens in a background thread shortly before "
+                     "they expire, instead of on the first request made "
+                     "after that, so that long running tests don't wait for "
+                     "keystone in the middle of an operation."),
 ]
 
 identity_group = cfg.OptGroup(name='identity',
@@ -214,7 +239,66 @@ ServiceClientsGroup = [
                help='Timeout in seconds to wait for the http request to '
                     'return'),
     cfg.StrOpt('proxy_url',
-               help='Specify an http proxy to use.')
+               help='Specify an http proxy to use.'),
+    cfg.BoolOpt('keep_alive',
+                default=False,
+                help='Keep the HTTP connections of the service clients open '
+                     'and reuse them for the following requests, instead of '
+                     'opening a new connection (and doing a new TLS '
+                     'handshake) for each request.'),
+    cfg.IntOpt('connection_pool_maxsize',
+               default=10,
+               min=1,
+               help='Maximum number of connections kept open for each host '
+                    'by a service client. Only used when keep_alive is '
+                    'set.'),
+    cfg.BoolOpt('shared_http_pool',
+                default=False,
+                help='Share a single HTTP pool manager between all the '
+                     'service clients of a worker which use the same '
+                     'connection settings, instead of building one for each '
+                     'client. Combined with keep_alive, this allows '
+                     'connections to be reused across clients.'),
+    cfg.StrOpt('response_validation_policy',
+               default='always',
+               regex=r'^(always|first-per-test|off|sampled:\d+(\.\d+)?)$',
+               help="Which API responses are validated against their JSON "
+                    "schema. 'always' validates every response, "
+                    "'first-per-test' only the first response for each "
+                    "schema in each test, 'sampled:N' N percent of the "
+                    "responses picked at random, and 'off' disables the "
+                    "schema validation. The status code of the responses is "
+                    "checked in any case."),
+    cfg.StrOpt('polling_policy',
+               default='fixed',
+               choices=['fixed', 'backoff'],
+               help="How often the waiters poll the resources they wait for. "
+                    "'fixed' polls every build_interval of the service. "
+                    "'backoff' polls first after polling_initial_interval, "
+                    "then multiplies the interval by polling_backoff_factor "
+                    "on each poll, up to polling_max_interval."),
+    cfg.FloatOpt('polling_initial_interval',
+                 default=0.25,
+                 min=0.01,
+                 help="First interval in seconds of the 'backoff' polling "
+                      "policy."),
+    cfg.FloatOpt('polling_backoff_factor',
+                 default=2.0,
+                 min=1,
+                 help="Growth factor of the intervals of the 'backoff' "
+                      "polling policy."),
+    cfg.FloatOpt('polling_max_interval',
+                 min=0.01,
+                 help="Longest interval in seconds of the 'backoff' polling "
+                      "policy. Defaults to the build_interval of the "
+                      "service."),
+    cfg.FloatOpt('polling_jitter',
+                 default=0.0,
+                 min=0,
+                 max=0.9,
+                 help="Fraction of each polling interval by which it is "
+                      "randomly lengthened or shortened, so that concurrent "
+                      "waiters don't poll in lockstep."),
 ]
 
 identity_feature_group = cfg.OptGroup(name='identity-feature-enabled',
@@ -324,6 +408,19 @@ ComputeGroup = [
                default=0,
                help="Additional wait time for clean state, when there is "
                     "no OS-EXT-STS extension available"),
+    cfg.StrOpt('server_events_file',
+               help="Path of a file to which a notification listener of "
+                    "the deployment appends the versioned notifications of "
+                    "the Compute service, one JSON document per line. When "
+                    "set, the server status waiter checks a server as soon "
+                    "as a notification about it is appended, instead of "
+                    "showing it every build_interval."),
+    cfg.IntOpt('server_events_timeout',
+               default=30,
+               min=1,
+               help="Time in seconds after which the server status waiter "
+                    "checks a server even if no notification about it was "
+                    "appended to server_events_file."),
     cfg.StrOpt('fixed_network_name',
                help="Name of the fixed network that is visible to all test "
                     "projects. If multiple networks are available for a "
@@ -1280,7 +1377,25 @@ Expected values for this field are:
 
 If nothing is specified, this feature is not enabled. To trace everything
 specify .* as the regex.
-""")
+"""),
+    cfg.StrOpt('request_log_file',
+               default=None,
+               help="Path of a file to which the service clients append a "
+                    "JSON document per request, with the caller, service, "
+                    "method, URL, status, duration and request id. The "
+                    "records are written independently of the log level, "
+                    "so that the requests of a run can be analyzed without "
+                    "logging them. If not set, no file is written."),
+    cfg.StrOpt('waiter_timeline_file',
+               default=None,
+               help="Path of a file to which the waiters append a JSON "
+                    "document per waited resource, with the test, the "
+                    "waiter, the resource, the outcome, the duration, the "
+                    "number of polls, the bytes of the responses and the "
+                    "time of each status and task state transition. The "
+                    "timelines of many runs can be aggregated to see where "
+                    "the time is spent and to tune the build intervals. If "
+                    "not set, no file is written."),
 ]
 
 
@@ -1525,6 +1640,12 @@ def service_client_config(service_client_name=None):
         * `endpoint_type`
         * `build_timeout` (object-storage and identity default to compute)
         * `build_interval` (object-storage and identity default to compute)
+        * `keep_alive`
+        * `pool_maxsize`
+        * `shared_http_pool`
+        * `validation_policy`
+        * `request_log_file`
+        * `polling_policy`
 
     The following common settings are always returned, even if
     `service_client_name` is None:
@@ -1595,6 +1716,19 @@ def service_client_config(service_client_name=None):
         _parameters['region'] = getattr(options, 'region')
     # Set service
     _parameters['service'] = getattr(options, 'catalog_type')
+    # Set connection handling
+    _parameters['keep_alive'] = CONF.service_clients.keep_alive
+    _parameters['pool_maxsize'] = CONF.service_clients.connection_pool_maxsize
+    _parameters['shared_http_pool'] = CONF.service_clients.shared_http_pool
+    _parameters['validation_policy'] = (
+        CONF.service_clients.response_validation_policy)
+    _parameters['request_log_file'] = CONF.debug.request_log_file
+    _parameters['polling_policy'] = polling.PollingPolicy(
+        CONF.service_clients.polling_policy,
+        initial_interval=CONF.service_clients.polling_initial_interval,
+        backoff_factor=CONF.service_clients.polling_backoff_factor,
+        max_interval=CONF.service_clients.polling_max_interval,
+        jitter=CONF.service_clients.polling_jitter)
     return _parameters
 
 
@@ -15,12 +15,18 @@
 #    under the License.
 
 import abc
-import copy
 import datetime
+import hashlib
+import os
 import re
+import tempfile
+import threading
+import time
 from urllib import parse as urlparse
 
+from oslo_concurrency import lockutils
 from oslo_log import log as logging
+from oslo_serialization import jsonutils as json
 
 from tempest.lib import exceptions
 from tempest.lib.services.identity.v2 import token_client as json_v2id
@@ -28,8 +34,14 @@ from tempest.lib.services.identity.v3 import token_client as json_v3id
 
 ISO8601_FLOAT_SECONDS = '%Y-%m-%dT%H:%M:%S.%fZ'
 ISO8601_INT_SECONDS = '%Y-%m-%dT%H:%M:%SZ'
+EPOCH = datetime.datetime(1970, 1, 1)
 LOG = logging.getLogger(__name__)
 
+# Relative URLs which can be appended to a base URL as they are: they don't
+# start with a slash, have no empty path segment, no path parameters, no
+# fragment and no empty query.
+SIMPLE_RELATIVE_URL = re.compile(r'^[^/?#;]+(?:/[^/?#;]+)*/?(?:\?[^#]+)?$')
+
 
 def replace_version(url, new_version):
     parts = urlparse.urlparse(url)
@@ -64,6 +76,56 @@ def apply_url_filters(url, filters):
     return url
 
 
+class FileTokenCache(object):
+    """Token cache shared by the processes of a test run
+
+    Tokens are stored in a directory, one file per set of credentials, scope
+    and auth URL, so that parallel workers using the same credentials reuse
+    a valid token instead of requesting a new one each. The files are
+    readable by their owner only, and don't contain the passwords, which are
+    only part of the hash naming them. Accesses to a token are serialized
+    with an external lock in the same directory.
+
+    :param str path: Directory of the cache, created if needed
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def key(self, auth_url, auth_params):
+        """Hash identifying the token of a token request"""
+        data = json.dumps([auth_url, auth_params], sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def lock(self, key):
+        """Lock serializing the processes getting the token of a key"""
+        return lockutils.lock(key, lock_file_prefix='token-',
+                              external=True, lock_path=self.path)
+
+    def get(self, key):
+        """Return the cached (token, auth_data) of a key, or None"""
+        try:
+            with open(os.path.join(self.path, key)) as fd:
+                token, auth_data = json.loads(fd.read())
+        except (OSError, ValueError):
+            return None
+        return token, auth_data
+
+    def set(self, key, auth):
+        """Store the (token, auth_data) of a key"""
+        os.makedirs(self.path, exist_ok=True)
+        # Write to a temporary file first, so that a token is never read
+        # partially written
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.' + key)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(json.dumps(list(auth)))
+            os.replace(tmp_path, os.path.join(self.path, key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
 class AuthProvider(object, metaclass=abc.ABCMeta):
     """Provide authentication"""
 
@@ -255,11 +317,28 @@ class KeystoneAuthProvider(AuthProvider):
     EXPIRY_DATE_FORMATS = (ISO8601_FLOAT_SECONDS, ISO8601_INT_SECONDS)
 
     token_expiry_threshold = datetime.timedelta(seconds=60)
+    # How long before the token_expiry_threshold a background refresh is done
+    token_refresh_lead = datetime.timedelta(seconds=60)
 
     def __init__(self, credentials, auth_url,
                  disable_ssl_certificate_validation=None,
                  ca_certs=None, trace_requests=None, scope='project',
-                 http_timeout=None, proxy_url=None):
+                 http_timeout=None, proxy_url=None, token_cache=None,
+                 background_refresh=False):
+        # Endpoints found in the catalog of the cached token, see _endpoint
+        self._clear_endpoints()
+        # Last expiry time parsed, see _expiry_timestamp
+        self._expiry = None
+        self.background_refresh = background_refresh
+        self._refresh_timer = None
+        self._refresh_lock = threading.Lock()
+        # Whether the token was used since it was obtained, see _refresh
+        self._token_used = False
+        # Number of tokens obtained, in the background or not
+        self.token_refreshes = 0
+        self.background_token_refreshes = 0
+        # Seconds spent by get_auth waiting for a token
+        self.auth_blocked_time = 0.0
         super(KeystoneAuthProvider, self).__init__(credentials, scope)
         self.dscv = disable_ssl_certificate_validation
         self.ca_certs = ca_certs
@@ -268,19 +347,153 @@ class KeystoneAuthProvider(AuthProvider):
         self.proxy_url = proxy_url
         self.auth_url = auth_url
         self.auth_client = self._auth_client(auth_url)
+        self.token_cache = token_cache
+
+    def _clear_endpoints(self):
+        self._endpoints = {}
+        self._endpoints_auth_data = None
+
+    def get_auth(self):
+        if self.cache is None or self.is_expired(self.cache):
+            start = time.time()
+            self.set_auth()
+            self.auth_blocked_time += time.time() - start
+        self._token_used = True
+        return self.cache
+
+    def set_auth(self):
+        self._clear_endpoints()
+        super(KeystoneAuthProvider, self).set_auth()
+        self._token_used = False
+        self.token_refreshes += 1
+        self._schedule_refresh()
+
+    def clear_auth(self):
+        self.cancel_refresh()
+        self._clear_endpoints()
+        super(KeystoneAuthProvider, self).clear_auth()
+
+    def _schedule_refresh(self):
+        """Schedule the background refresh of the cached token
+
+        The token is refreshed `token_refresh_lead` before it reaches the
+        `token_expiry_threshold`, or halfway there for short lived tokens, so
+        that requests don't wait for a new token. The refresh stops when the
+        token was not used since it was obtained, the next request then gets
+        a new token if needed.
+        """
+        if not self.background_refresh:
+            return
+        auth_data = self.cache
+        expiry = self._token_expiry(auth_data)
+        if expiry is None:
+            return
+        remaining = (self._expiry_timestamp(expiry) -
+                     self.token_expiry_threshold.total_seconds() -
+                     time.time())
+        if remaining <= 0:
+            return
+        delay = max(remaining - self.token_refresh_lead.total_seconds(),
+                    remaining / 2)
+        timer = threading.Timer(delay, self._refresh, args=(auth_data,))
+        timer.daemon = True
+        with self._refresh_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+            self._refresh_timer = timer
+        timer.start()
+
+    def cancel_refresh(self):
+        """Cancel the background refresh of the cached token
+
+        To be called when the provider is not used anymore, the token is
+        then only requested again on demand.
+        """
+        with self._refresh_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _refresh(self, auth_data):
+        """Replace the cached token, from the background refresh timer"""
+        if auth_data is not self.cache:
+            # The token was already replaced or cleared
+            return
+        if not self._token_used:
+            # NOTE: Providers which are not used anymore, for instance the
+            # ones of credentials which were deleted, stop refreshing
+            LOG.debug('Stopping the background refresh of the unused token '
+                      'of %s', self.credentials)
+            with self._refresh_lock:
+                self._refresh_timer = None
+            return
+        try:
+            auth = self._get_auth(stale_token=auth_data[0])
+        except Exception:
+            # The token is requested again when it expires
+            LOG.warning('Background refresh of the token of %s failed',
+                        self.credentials, exc_info=True)
+            return
+        if auth_data is not self.cache:
+            return
+        self._fill_credentials(auth[1])
+        # The catalog lookups are cached per token, so replacing the cache
+        # is enough for the requests to use the new token
+        self.cache = auth
+        self._token_used = False
+        self.token_refreshes += 1
+        self.background_token_refreshes += 1
+        self._schedule_refresh()
+
+    def _endpoint(self, filters, auth_data):
+        """Base URL and URL prefix for the filters, cached per token
+
+        The catalog lookup of `base_url` is done once per token and set of
+        filters. The prefix is the base URL, normalized the same way as the
+        URLs of the requests, to which simple relative URLs can be appended
+        directly. It is None if the base URL has to be joined with the
+        relative URLs by parsing it.
+        """
+        if auth_data is not self.cache:
+            # Alternative auth data is not cached
+            return self.base_url(filters=filters, auth_data=auth_data), None
+        if auth_data is not self._endpoints_auth_data:
+            self._endpoints = {}
+            self._endpoints_auth_data = auth_data
+        key = (filters.get('service'), filters.get('region'),
+               filters.get('name'), filters.get('endpoint_type'),
+               filters.get('api_version'), filters.get('skip_path'))
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            base_url = self.base_url(filters=filters, auth_data=auth_data)
+            parts = urlparse.urlparse(base_url)
+            prefix = None
+            if (parts.scheme and parts.netloc and not parts.params and
+                    not parts.query and not parts.fragment):
+                path = re.sub("/{2,}", "/", parts.path).rstrip('/')
+                prefix = urlparse.urlunparse(
+                    (parts.scheme, parts.netloc, path, '', '', '')) + '/'
+            endpoint = self._endpoints[key] = (base_url, prefix)
+        return endpoint
 
     def _decorate_request(self, filters, method, url, headers=None, body=None,
                           auth_data=None):
         if auth_data is None:
             auth_data = self.get_auth()
         token, _ = auth_data
-        base_url = self.base_url(filters=filters, auth_data=auth_data)
+        base_url, prefix = self._endpoint(filters, auth_data)
         # build authenticated request
-        # returns new request, it does not touch the original values
-        _headers = copy.deepcopy(headers) if headers is not None else {}
-        _headers['X-Auth-Token'] = str(token)
+        # returns new request, it does not touch the original values. The
+        # header values are strings, so a shallow copy is enough.
+        if headers:
+            _headers = dict(headers)
+            _headers['X-Auth-Token'] = str(token)
+        else:
+            _headers = {'X-Auth-Token': str(token)}
         if url is None or url == "":
             _url = base_url
+        elif prefix is not None and SIMPLE_RELATIVE_URL.match(url):
+            _url = prefix + url
         else:
             # Join base URL and url, and remove multiple contiguous slashes
             _url = "/".join([base_url, url])
@@ -303,29 +516,61 @@ class KeystoneAuthProvider(AuthProvider):
         """
         return
 
-    def _get_auth(self):
+    def _token_expiry(self, auth_data):
+        """Expiry time string of a token, needed by background_refresh
+
+        Providers which don't know the expiry of their tokens return None,
+        their tokens are then not refreshed in the background.
+        """
+        return None
+
+    def _get_auth(self, stale_token=None):
         # Bypasses the cache
         auth_func = getattr(self.auth_client, 'get_token')
         auth_params = self._auth_params()
-
-        # returns token, auth_data
-        token, auth_data = auth_func(**auth_params)
-        return token, auth_data
+        if self.token_cache is None:
+            # returns token, auth_data
+            token, auth_data = auth_func(**auth_params)
+            return token, auth_data
+
+        # A token from the shared cache is only used if it is not about to
+        # expire, according to the token_expiry_threshold, and if it is not
+        # the stale token being refreshed
+        key = self.token_cache.key(self.auth_url, auth_params)
+        with self.token_cache.lock(key):
+            auth = self.token_cache.get(key)
+            if (auth is None or auth[0] == stale_token or
+                    self.is_expired(auth)):
+                auth = auth_func(**auth_params)
+                self.token_cache.set(key, auth)
+            return auth
 
     def _parse_expiry_time(self, expiry_string):
-        expiry = None
         for date_format in self.EXPIRY_DATE_FORMATS:
             try:
-                expiry = datetime.datetime.strptime(
-                    expiry_string, date_format)
+                return datetime.datetime.strptime(expiry_string, date_format)
             except ValueError:
                 pass
-        if expiry is None:
-            raise ValueError(
-                "time data '{data}' does not match any of the "
-                "expected formats: {formats}".format(
-                    data=expiry_string, formats=self.EXPIRY_DATE_FORMATS))
-        return expiry
+        raise ValueError(
+            "time data '{data}' does not match any of the "
+            "expected formats: {formats}".format(
+                data=expiry_string, formats=self.EXPIRY_DATE_FORMATS))
+
+    def _expiry_timestamp(self, expiry_string):
+        """Expiry time of a token as a POSIX timestamp
+
+        The last expiry time parsed is kept, so that checking the expiry of
+        the cached token on every request does not parse it again.
+        """
+        if self._expiry is None or self._expiry[0] != expiry_string:
+            expiry = self._parse_expiry_time(expiry_string)
+            self._expiry = (expiry_string,
+                            (expiry - EPOCH).total_seconds())
+        return self._expiry[1]
+
+    def _is_expiry_reached(self, expiry_string):
+        return (self._expiry_timestamp(expiry_string) -
+                self.token_expiry_threshold.total_seconds() <= time.time())
 
     def get_token(self):
         return self.get_auth()[0]
@@ -416,11 +661,12 @@ class KeystoneV2AuthProvider(KeystoneAuthProvider):
                 (service, region, endpoint_type, name))
         return apply_url_filters(_base_url, filters)
 
-    def is_expired(self, auth_data):
+    def _token_expiry(self, auth_data):
         _, access = auth_data
-        expiry = self._parse_expiry_time(access['token']['expires'])
-        return (expiry - self.token_expiry_threshold <=
-                datetime.datetime.utcnow())
+        return access['token']['expires']
+
+    def is_expired(self, auth_data):
+        return self._is_expiry_reached(self._token_expiry(auth_data))
 
 
 class KeystoneV3AuthProvider(KeystoneAuthProvider):
@@ -592,11 +838,12 @@ class KeystoneV3AuthProvider(KeystoneAuthProvider):
             raise exceptions.EndpointNotFound(service)
         return apply_url_filters(_base_url, filters)
 
-    def is_expired(self, auth_data):
+    def _token_expiry(self, auth_data):
         _, access = auth_data
-        expiry = self._parse_expiry_time(access['expires_at'])
-        return (expiry - self.token_expiry_threshold <=
-                datetime.datetime.utcnow())
+        return access['expires_at']
+
+    def is_expired(self, auth_data):
+        return self._is_expiry_reached(self._token_expiry(auth_data))
 
 
 def is_identity_version_supported(identity_version):
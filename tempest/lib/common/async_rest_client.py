@@ -0,0 +1,143 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+from concurrent import futures
+import contextvars
+import functools
+import threading
+
+from tempest.lib.common import rest_client
+
+# Maximum number of requests in flight for all the asynchronous clients of a
+# process
+ASYNC_MAX_WORKERS = 128
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=ASYNC_MAX_WORKERS,
+                thread_name_prefix='tempest-async')
+        return _executor
+
+
+class _AsyncMethods(object):
+    """Awaitable versions of the methods of a client"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        if not callable(method):
+            raise AttributeError(
+                '%s.%s is not a method' % (type(self._client).__name__, name))
+
+        @functools.wraps(method)
+        async def async_method(*args, **kwargs):
+            return await self._client.async_call(method, *args, **kwargs)
+        return async_method
+
+
+class AsyncClientMixin(object):
+    """Mixin making the methods of a service client awaitable
+
+    The methods of a client using this mixin can be awaited through its
+    `aio` attribute, with the same arguments, return values and exceptions
+    as the synchronous methods, for instance::
+
+        server = await servers_client.aio.show_server(server_id)
+
+    This lets a single process drive many requests concurrently with
+    asyncio. The requests are sent by the synchronous client from a pool of
+    threads shared by all the clients of the process, which bounds the
+    number of requests in flight to `ASYNC_MAX_WORKERS`. The current test is
+    propagated to the threads, so that the requests are attributed to it in
+    the logs.
+    """
+
+    @property
+    def aio(self):
+        return _AsyncMethods(self)
+
+    async def async_call(self, func, *args, **kwargs):
+        """Await a synchronous function from the request threads"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _get_executor(),
+            functools.partial(context.run, func, *args, **kwargs))
+
+
+class AsyncRestClient(AsyncClientMixin, rest_client.RestClient):
+    """RestClient whose HTTP requests can be awaited
+
+    It has the same parameters as `RestClient`, and provides awaitable
+    versions of its HTTP methods: `arequest`, `aget`, `apost`, `aput`,
+    `apatch`, `adelete`, `ahead` and `acopy`. The responses are checked and
+    validated as the ones of the synchronous methods, which remain
+    available.
+    """
+
+    async def arequest(self, method, url, extra_headers=False, headers=None,
+                       body=None, chunked=False):
+        """Awaitable version of `RestClient.request`"""
+        return await self.async_call(self.request, method, url,
+                                     extra_headers=extra_headers,
+                                     headers=headers, body=body,
+                                     chunked=chunked)
+
+    async def aget(self, url, headers=None, extra_headers=False):
+        """Awaitable version of `RestClient.get`"""
+        return await self.async_call(self.get, url, headers=headers,
+                                     extra_headers=extra_headers)
+
+    async def apost(self, url, body, headers=None, extra_headers=False,
+                    chunked=False):
+        """Awaitable version of `RestClient.post`"""
+        return await self.async_call(self.post, url, body, headers=headers,
+                                     extra_headers=extra_headers,
+                                     chunked=chunked)
+
+    async def aput(self, url, body, headers=None, extra_headers=False,
+                   chunked=False):
+        """Awaitable version of `RestClient.put`"""
+        return await self.async_call(self.put, url, body, headers=headers,
+                                     extra_headers=extra_headers,
+                                     chunked=chunked)
+
+    async def apatch(self, url, body, headers=None, extra_headers=False):
+        """Awaitable version of `RestClient.patch`"""
+        return await self.async_call(self.patch, url, body, headers=headers,
+                                     extra_headers=extra_headers)
+
+    async def adelete(self, url, headers=None, body=None,
+                      extra_headers=False):
+        """Awaitable version of `RestClient.delete`"""
+        return await self.async_call(self.delete, url, headers=headers,
+                                     body=body, extra_headers=extra_headers)
+
+    async def ahead(self, url, headers=None, extra_headers=False):
+        """Awaitable version of `RestClient.head`"""
+        return await self.async_call(self.head, url, headers=headers,
+                                     extra_headers=extra_headers)
+
+    async def acopy(self, url, headers=None, extra_headers=False):
+        """Awaitable version of `RestClient.copy`"""
+        return await self.async_call(self.copy, url, headers=headers,
+                                     extra_headers=extra_headers)
@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import tempfile
+
+import netaddr
+from oslo_concurrency import lockutils
+from oslo_log import log as logging
+from oslo_serialization import jsonutils as json
+
+LOG = logging.getLogger(__name__)
+
+
+class CIDRAllocator(object):
+    """Allocates the subnet CIDRs of a block to the processes of a test run
+
+    Instead of trying to create subnets with each CIDR of the block until
+    one does not overlap with an existing subnet, the processes sharing a
+    lock path get CIDRs which no other process of the run is using. The
+    allocated CIDRs are kept in a file of the lock path, with the pid of the
+    process using each of them, so the CIDRs of processes which exited
+    without releasing them are allocated again.
+
+    A CIDR which overlaps with a subnet created outside of the run can be
+    kept allocated, by not releasing it, until the process exits.
+
+    :param str lock_path: Directory of the file of the allocated CIDRs
+    :param str cidr: Block to allocate CIDRs from
+    :param int mask_bits: Mask bits of the allocated CIDRs
+    """
+
+    def __init__(self, lock_path, cidr, mask_bits):
+        self.lock_path = lock_path
+        self.cidr = netaddr.IPNetwork(cidr)
+        self.mask_bits = mask_bits
+        self.name = 'cidrs-%s-%s-%d' % (self.cidr.ip, self.cidr.prefixlen,
+                                        mask_bits)
+        self.path = os.path.join(lock_path, self.name)
+
+    def _read(self):
+        try:
+            with open(self.path) as fd:
+                return json.loads(fd.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, allocated):
+        os.makedirs(self.lock_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.lock_path,
+                                        prefix='.' + self.name)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(json.dumps(allocated))
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _is_running(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _lock(self):
+        return lockutils.lock(self.name, external=True,
+                              lock_path=self.lock_path)
+
+    def allocate(self):
+        """Allocate a CIDR to the process
+
+        :return: The CIDR as a string, or None if all are allocated
+        """
+        with self._lock():
+            allocated = self._read()
+            running = {}
+            for subnet_cidr in self.cidr.subnet(self.mask_bits):
+                cidr = str(subnet_cidr)
+                pid = allocated.get(cidr)
+                if pid is not None:
+                    if pid not in running:
+                        running[pid] = self._is_running(pid)
+                    if running[pid]:
+                        continue
+                    LOG.debug('Reclaiming CIDR %s of exited process %d',
+                              cidr, pid)
+                allocated[cidr] = os.getpid()
+                self._write(allocated)
+                return cidr
+        return None
+
+    def release(self, cidr):
+        """Release a CIDR allocated to the process"""
+        with self._lock():
+            allocated = self._read()
+            if allocated.get(str(cidr)) == os.getpid():
+                del allocated[str(cidr)]
+                self._write(allocated)
@@ -11,6 +11,7 @@
 # under the License.
 
 import abc
+import threading
 
 from oslo_log import log as logging
 
@@ -36,6 +37,9 @@ class CredsClient(object, metaclass=abc.ABCMeta):
         self.users_client = users_client
         self.projects_client = projects_client
         self.roles_client = roles_client
+        # Roles by lower case name, see _check_role_exists
+        self._roles = None
+        self._roles_lock = threading.Lock()
 
     def create_user(self, username, password, project=None, email=None):
         params = {'name': username,
@@ -59,17 +63,29 @@ class CredsClient(object, metaclass=abc.ABCMeta):
         pass
 
     def _check_role_exists(self, role_name):
-        try:
-            roles = self._list_roles()
-            lc_role_name = role_name.lower()
-            role = next(r for r in roles if r['name'].lower() == lc_role_name)
-        except StopIteration:
-            return None
-        return role
+        """Return the role with a name, case insensitive, or None
+
+        The roles are listed once and indexed by name. They are listed again
+        when a role is not found, in case it was created since then.
+        """
+        lc_role_name = role_name.lower()
+        with self._roles_lock:
+            if self._roles is not None and lc_role_name in self._roles:
+                return self._roles[lc_role_name]
+            roles = {}
+            for role in self._list_roles():
+                roles.setdefault(role['name'].lower(), role)
+            self._roles = roles
+            return roles.get(lc_role_name)
 
     def create_user_role(self, role_name):
         if not self._check_role_exists(role_name):
-            self.roles_client.create_role(name=role_name)
+            try:
+                self.roles_client.create_role(name=role_name)
+            finally:
+                # The role is listed on its next lookup
+                with self._roles_lock:
+                    self._roles = None
 
     def assign_user_role(self, user, project, role_name):
         role = self._check_role_exists(role_name)
@@ -111,6 +111,18 @@ class CredentialProvider(object, metaclass=abc.ABCMeta):
     def clear_creds(self):
         return
 
+    def provision_credentials(self, credential_types):
+        """Prepare the credentials of several types
+
+        Providers which can create credentials concurrently do it here, so
+        that the `get_<type>_creds` methods return them right away. Others
+        provide them when requested.
+
+        :param list credential_types: Types of credentials, like 'primary',
+                                      'alt' or 'admin'
+        """
+        return
+
     @abc.abstractmethod
     def is_multi_user(self):
         return
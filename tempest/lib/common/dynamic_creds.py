@@ -12,7 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+from concurrent import futures
+import contextvars
+import functools
 import ipaddress
+import threading
 
 import netaddr
 from oslo_log import log as logging
@@ -25,6 +30,153 @@ from tempest.lib.services import clients
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of requests sent concurrently to provision credentials
+PROVISIONING_MAX_WORKERS = 4
+
+
+class _TaskGraph(object):
+    """Functions run on a pool of threads once the ones they need are done
+
+    Each task is called with the results of the tasks it depends on, as
+    keyword arguments named after them, and after the tasks it must follow
+    without needing their results. Once a task fails, no other task is
+    started, and its error is raised when the running tasks are done.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.results = {}
+
+    def __contains__(self, name):
+        return name in self._tasks
+
+    def add(self, name, func, *depends_on, after=()):
+        self._tasks[name] = (func, depends_on, tuple(after))
+
+    def run(self, max_workers=None):
+        """Run the tasks and return their results by name
+
+        :param int max_workers: Maximum number of tasks run concurrently,
+                                defaults to `PROVISIONING_MAX_WORKERS`
+        """
+        max_workers = max_workers or PROVISIONING_MAX_WORKERS
+        pending = dict(self._tasks)
+        running = {}
+        error = None
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                for name, (func, depends_on, after) in list(pending.items()):
+                    # NOTE: Tasks are only submitted to idle workers, so that
+                    # none is queued once a task failed
+                    if len(running) >= max_workers:
+                        break
+                    if error is None and all(
+                            dep in self.results
+                            for dep in depends_on + after):
+                        del pending[name]
+                        kwargs = {dep: self.results[dep] for dep in depends_on}
+                        running[executor.submit(
+                            contextvars.copy_context().run, func,
+                            **kwargs)] = name
+                if not running:
+                    break
+                done, _ = futures.wait(running,
+                                       return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        error = error or e
+        if error is not None:
+            raise error
+        if pending:
+            raise ValueError('Tasks %s depend on unknown tasks' %
+                             sorted(pending))
+        return self.results
+
+
+def _skip_missing_endpoint(func, *args, **kwargs):
+    # NOTE: The services missing from the catalog have no resources to list
+    try:
+        return func(*args, **kwargs)
+    except lib_exc.EndpointNotFound:
+        return None
+
+
+class DynamicCredentialsPool(object):
+    """Dynamic credentials kept by a process to be reused by test classes
+
+    Creating the project, user, role assignments and network resources of a
+    set of dynamic credentials, and deleting them, takes many API calls for
+    each test class. Instead of deleting their credentials, the providers
+    using a pool return them to it, and the next providers with the same
+    configuration take them from it instead of creating new ones.
+
+    The pool is bounded, credentials returned to a full pool are deleted
+    right away. The credentials left in the pool must be deleted with
+    `clear`, usually when the process exits.
+
+    :param int max_size: Maximum number of sets of credentials kept
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._free = collections.defaultdict(list)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def acquire(self, key):
+        """Take credentials of a key from the pool
+
+        :param key: Hashable key of the configuration and type of the
+                    credentials
+        :return: The `TestResources` of the credentials, or None if the pool
+                 has none for the key
+        """
+        with self._lock:
+            free = self._free.get(key)
+            if not free:
+                return None
+            self._size -= 1
+            return free.pop()[1]
+
+    def release(self, key, provider, credentials):
+        """Return credentials to the pool
+
+        :param key: Hashable key of the configuration and type of the
+                    credentials
+        :param provider: The `DynamicCredentialProvider` able to delete the
+                         credentials
+        :param credentials: The `TestResources` of the credentials
+        :return: True if the credentials were kept, False if the pool is full
+        """
+        with self._lock:
+            if self._size >= self.max_size:
+                return False
+            self._free[key].append((provider, credentials))
+            self._size += 1
+            return True
+
+    def clear(self):
+        """Delete all the credentials of the pool"""
+        with self._lock:
+            free, self._free = self._free, collections.defaultdict(list)
+            self._size = 0
+        providers = collections.defaultdict(list)
+        for entries in free.values():
+            for provider, credentials in entries:
+                providers[provider].append(credentials)
+        for provider, creds in providers.items():
+            try:
+                provider.delete_pooled_creds(creds)
+            except Exception:
+                LOG.exception('Failed to delete pooled dynamic credentials '
+                              '%s', creds)
+
 
 class DynamicCredentialProvider(cred_provider.CredentialProvider):
     """Creates credentials dynamically for tests
@@ -63,6 +215,15 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
     :param identity_admin_endpoint_type: The endpoint type for identity
                                          admin clients. Defaults to public.
     :param identity_uri: Identity URI of the target cloud
+    :param DynamicCredentialsPool credentials_pool: Pool to take credentials
+        from, and to return them to instead of deleting them in
+        `clear_creds`. Credentials are only reused by providers with the same
+        configuration, and if their project is verified empty, see
+        `_list_leftovers`.
+    :param CIDRAllocator cidr_allocator: Allocator of the CIDRs of project
+        subnets, shared with the other processes of the test run. If None,
+        the CIDRs of `project_network_cidr` are tried in order until one does
+        not overlap with an existing subnet.
     """
 
     def __init__(self, identity_version, name=None, network_resources=None,
@@ -72,7 +233,8 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                  neutron_available=False, create_networks=True,
                  project_network_cidr=None, project_network_mask_bits=None,
                  public_network_id=None, resource_prefix=None,
-                 identity_admin_endpoint_type='public', identity_uri=None):
+                 identity_admin_endpoint_type='public', identity_uri=None,
+                 credentials_pool=None, cidr_allocator=None):
         super(DynamicCredentialProvider, self).__init__(
             identity_version=identity_version, identity_uri=identity_uri,
             admin_role=admin_role, name=name,
@@ -80,12 +242,24 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             network_resources=network_resources)
         self.network_resources = network_resources
         self._creds = {}
+        # Type of the credentials of each key of _creds, which keys them in
+        # the pool, see _creds_type
+        self._creds_types = {}
+        # Credentials of several types may be created concurrently, see
+        # provision_credentials. _lock guards _creds and _creds_types, and
+        # the credentials of a key are created once, under its own lock.
+        self._lock = threading.RLock()
+        self._creds_locks = {}
+        self._member_role_lock = threading.Lock()
+        self._member_role_created = False
+        self.credentials_pool = credentials_pool
         self.ports = []
         self.resource_prefix = resource_prefix or ''
         self.neutron_available = neutron_available
         self.create_networks = create_networks
         self.project_network_cidr = project_network_cidr
         self.project_network_mask_bits = project_network_mask_bits
+        self.cidr_allocator = cidr_allocator
         self.public_network_id = public_network_id
         self.default_admin_creds = admin_creds
         self.identity_admin_domain_scope = identity_admin_domain_scope
@@ -117,6 +291,16 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             self.roles_admin_client,
             self.domains_admin_client,
             self.creds_domain_name)
+        # Credentials are shared through the pool by the providers creating
+        # them the same way
+        self._pool_key = (
+            self.identity_uri, self.identity_version,
+            self.default_admin_creds.username,
+            self.default_admin_creds.project_name, self.creds_domain_name,
+            self.admin_role, self.identity_admin_role,
+            self.identity_admin_domain_scope, tuple(self.extra_roles),
+            self.neutron_available, self.create_networks,
+            tuple(sorted((network_resources or {}).items())))
 
     def _get_admin_clients(self, endpoint_type):
         """Returns a tuple with instances of the following admin clients
@@ -163,7 +347,13 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                     os.network.PortsClient(),
                     os.network.SecurityGroupsClient())
 
-    def _create_creds(self, admin=False, roles=None, scope='project'):
+    def _get_creds_clients(self, credentials):
+        """Returns the service clients of dynamic credentials"""
+        return clients.ServiceClients(credentials.credentials,
+                                      self.identity_uri)
+
+    def _create_creds(self, admin=False, roles=None, scope='project',
+                      network=False):
         """Create credentials with random name.
 
         Creates user and role assignments on a project, domain, or system. When
@@ -171,12 +361,18 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         resource. If roles are provided, assigns those roles on the resource.
         Otherwise, assigns the user the 'member' role on the resource.
 
+        The user is created along with the project or domain, and each role
+        assignment and the network resources as soon as the resources they
+        need exist, on a pool of threads.
+
         :param admin: Flag if to assign to the user admin role
         :type admin: bool
         :param roles: Roles to assign for the user
         :type roles: list
         :param str scope: The scope for the role assignment, may be one of
                           'project', 'domain', or 'system'.
+        :param bool network: Whether to create the network resources of the
+                             project, see `_create_network_resources`
         :return: Readonly Credentials with network resources
         :raises: Exception if scope is invalid
         """
@@ -184,35 +380,30 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             roles = []
         root = self.name
 
-        cred_params = {
-            'project': None,
-            'domain': None,
-            'system': None
-        }
+        graph = _TaskGraph()
         if scope == 'project':
             project_name = data_utils.rand_name(
                 root, prefix=self.resource_prefix)
             project_desc = project_name + '-desc'
-            project = self.creds_client.create_project(
-                name=project_name, description=project_desc)
+            graph.add('project', functools.partial(
+                self.creds_client.create_project,
+                name=project_name, description=project_desc))
 
             # NOTE(andreaf) User and project can be distinguished from the
             # context, having the same ID in both makes it easier to match them
             # and debug.
             username = project_name + '-project'
-            cred_params['project'] = project
         elif scope == 'domain':
             domain_name = data_utils.rand_name(
                 root, prefix=self.resource_prefix)
             domain_desc = domain_name + '-desc'
-            domain = self.creds_client.create_domain(
-                name=domain_name, description=domain_desc)
+            graph.add('domain', functools.partial(
+                self.creds_client.create_domain,
+                name=domain_name, description=domain_desc))
             username = domain_name + '-domain'
-            cred_params['domain'] = domain
         elif scope == 'system':
             prefix = data_utils.rand_name(root, prefix=self.resource_prefix)
             username = prefix + '-system'
-            cred_params['system'] = 'all'
         else:
             raise lib_exc.InvalidScopeType(scope=scope)
         if admin:
@@ -220,45 +411,121 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         elif roles and len(roles) == 1:
             username += '-' + roles[0]
         user_password = data_utils.rand_password()
-        cred_params['password'] = user_password
-        user = self.creds_client.create_user(
-            username, user_password)
-        cred_params['user'] = user
+        graph.add('user', functools.partial(
+            self.creds_client.create_user, username, user_password))
+        if network and scope == 'project':
+            graph.add('network_resources',
+                      lambda project: self._create_network_resources(
+                          project['id']), 'project')
+        # Each role is assigned once the user and the project or domain exist
+        role_deps = ('user',) + tuple(name for name in ('project', 'domain')
+                                      if name in graph)
         roles_to_assign = [r for r in roles]
         if admin:
             roles_to_assign.append(self.admin_role)
             if scope == 'project':
-                self.creds_client.assign_user_role(
-                    user, project, self.identity_admin_role)
+                graph.add('identity_admin_role', functools.partial(
+                    self._assign_role, 'project', self.identity_admin_role),
+                    *role_deps)
             if (self.identity_version == 'v3' and
                     self.identity_admin_domain_scope):
-                self.creds_client.assign_user_role_on_domain(
-                    user, self.identity_admin_role)
+                graph.add('identity_admin_domain_role',
+                          lambda user: self.creds_client.
+                          assign_user_role_on_domain(
+                              user, self.identity_admin_role), 'user')
         # Add roles specified in config file
         roles_to_assign.extend(self.extra_roles)
         # If there are still no roles, default to 'member'
         # NOTE(mtreinish) For a user to have access to a project with v3 auth
         # it must beassigned a role on the project. So we need to ensure that
         # our newly created user has a role on the newly created project.
+        role_after = ()
         if not roles_to_assign and self.identity_version == 'v3':
             roles_to_assign = ['member']
+            graph.add('member_role', self._create_member_role)
+            role_after = ('member_role',)
+        for index, role in enumerate(roles_to_assign):
+            graph.add('role_%d' % index, functools.partial(
+                self._assign_role, scope, role), *role_deps, after=role_after)
+
+        try:
+            results = graph.run()
+        except Exception:
+            self._clear_partial_creds(graph.results, user_password)
+            raise
+        user = results['user']
+        LOG.info("Dynamic test user %s is created with scope %s and roles: %s",
+                 user['id'], scope, roles_to_assign)
+
+        creds = self.creds_client.get_credentials(
+            user=user, project=results.get('project'),
+            domain=results.get('domain'), password=user_password,
+            system='all' if scope == 'system' else None)
+        credentials = cred_provider.TestResources(creds)
+        if scope == 'project':
+            # Roles of the user on the project, which must be left as they
+            # are to reuse the credentials, see _list_leftovers
+            credentials.project_roles = set(roles_to_assign)
+            if admin:
+                credentials.project_roles.add(self.identity_admin_role)
+        if network:
+            network, subnet, router = results['network_resources']
+            credentials.set_resources(network=network, subnet=subnet,
+                                      router=router)
+        return credentials
+
+    def _create_member_role(self):
+        # NOTE: The role is created once for the credentials provisioned
+        # concurrently
+        with self._member_role_lock:
+            if self._member_role_created:
+                return
             try:
                 self.creds_client.create_user_role('member')
             except lib_exc.Conflict:
                 LOG.warning('member role already exists, ignoring conflict.')
-        for role in roles_to_assign:
-            if scope == 'project':
-                self.creds_client.assign_user_role(user, project, role)
-            elif scope == 'domain':
-                self.creds_client.assign_user_role_on_domain(
-                    user, role, domain)
-            elif scope == 'system':
-                self.creds_client.assign_user_role_on_system(user, role)
-        LOG.info("Dynamic test user %s is created with scope %s and roles: %s",
-                 user['id'], scope, roles_to_assign)
+            self._member_role_created = True
+
+    def _assign_role(self, scope, role, user, project=None, domain=None):
+        if scope == 'project':
+            self.creds_client.assign_user_role(user, project, role)
+        elif scope == 'domain':
+            self.creds_client.assign_user_role_on_domain(user, role, domain)
+        elif scope == 'system':
+            self.creds_client.assign_user_role_on_system(user, role)
+
+    def _clear_partial_creds(self, results, password):
+        """Clean up the resources of credentials which failed to be created
 
-        creds = self.creds_client.get_credentials(**cred_params)
-        return cred_provider.TestResources(creds)
+        When the user exists, the credentials are kept in _creds to be
+        deleted with the others by clear_creds, as the ones which failed to
+        get network resources. The project or domain is deleted otherwise.
+        """
+        user = results.get('user')
+        project = results.get('project')
+        domain = results.get('domain')
+        if user is not None:
+            creds = cred_provider.TestResources(
+                self.creds_client.get_credentials(
+                    user=user, project=project, domain=domain,
+                    password=password))
+            if results.get('network_resources'):
+                network, subnet, router = results['network_resources']
+                creds.set_resources(network=network, subnet=subnet,
+                                    router=router)
+            with self._lock:
+                self._creds['failed-%s' % user['id']] = creds
+            return
+        try:
+            if results.get('network_resources'):
+                self._clear_network_resources(*results['network_resources'])
+            if project is not None:
+                self.creds_client.delete_project(project['id'])
+            if domain is not None:
+                self.creds_client.delete_domain(domain['id'])
+        except lib_exc.TempestException:
+            LOG.warning('Failed to delete the resources of credentials which '
+                        'failed to be created: %s', results, exc_info=True)
 
     def _create_network_resources(self, tenant_id):
         """The function creates network resources in the given tenant.
@@ -311,7 +578,8 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                 if router:
                     self._clear_isolated_router(router['id'], router['name'])
                 if subnet:
-                    self._clear_isolated_subnet(subnet['id'], subnet['name'])
+                    self._clear_isolated_subnet(subnet['id'], subnet['name'],
+                                                subnet.get('cidr'))
                 if network:
                     self._clear_isolated_network(network['id'],
                                                  network['name'])
@@ -328,37 +596,55 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             name=name, tenant_id=tenant_id)
         return resp_body['network']
 
+    def _subnet_cidrs(self):
+        if self.cidr_allocator is None:
+            base_cidr = netaddr.IPNetwork(self.project_network_cidr)
+            for subnet_cidr in base_cidr.subnet(
+                    self.project_network_mask_bits):
+                yield str(subnet_cidr)
+            return
+        # CIDRs overlapping with subnets created outside of the test run are
+        # kept allocated, so that they are not handed out again
+        for subnet_cidr in iter(self.cidr_allocator.allocate, None):
+            yield subnet_cidr
+
     def _create_subnet(self, subnet_name, tenant_id, network_id):
-        base_cidr = netaddr.IPNetwork(self.project_network_cidr)
-        mask_bits = self.project_network_mask_bits
-        for subnet_cidr in base_cidr.subnet(mask_bits):
+        for subnet_cidr in self._subnet_cidrs():
             try:
                 if self.network_resources:
                     resp_body = self.subnets_admin_client.\
                         create_subnet(
-                            network_id=network_id, cidr=str(subnet_cidr),
+                            network_id=network_id, cidr=subnet_cidr,
                             name=subnet_name,
                             tenant_id=tenant_id,
                             enable_dhcp=self.network_resources['dhcp'],
                             ip_version=(ipaddress.ip_network(
-                                str(subnet_cidr)).version))
+                                subnet_cidr).version))
                 else:
                     resp_body = self.subnets_admin_client.\
                         create_subnet(network_id=network_id,
-                                      cidr=str(subnet_cidr),
+                                      cidr=subnet_cidr,
                                       name=subnet_name,
                                       tenant_id=tenant_id,
                                       ip_version=(ipaddress.ip_network(
-                                          str(subnet_cidr)).version))
+                                          subnet_cidr).version))
                 break
             except lib_exc.BadRequest as e:
                 if 'overlaps with another subnet' not in str(e):
+                    self._release_cidr(subnet_cidr)
                     raise
+            except Exception:
+                self._release_cidr(subnet_cidr)
+                raise
         else:
             message = 'Available CIDR for subnet creation could not be found'
             raise Exception(message)
         return resp_body['subnet']
 
+    def _release_cidr(self, cidr):
+        if self.cidr_allocator is not None:
+            self.cidr_allocator.release(cidr)
+
     def _create_router(self, router_name, tenant_id):
         kwargs = {'name': router_name,
                   'tenant_id': tenant_id}
@@ -372,60 +658,106 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         self.routers_admin_client.add_router_interface(router_id,
                                                        subnet_id=subnet_id)
 
+    def _get_creds_lock(self, creds_key):
+        with self._lock:
+            return self._creds_locks.setdefault(creds_key, threading.RLock())
+
     def get_credentials(self, credential_type, scope=None):
+        if scope:
+            creds_key = "%s_%s" % (scope, str(credential_type))
+        else:
+            creds_key = str(credential_type)
+        with self._get_creds_lock(creds_key):
+            return self._get_credentials(credential_type, scope, creds_key)
+
+    @staticmethod
+    def _creds_type(credential_type, scope):
+        # The roles are sorted, so that credentials with the same roles are
+        # taken from the pool whatever their order
+        if not isinstance(credential_type, str):
+            credential_type = tuple(sorted(credential_type))
+        return scope, credential_type
+
+    def _get_credentials(self, credential_type, scope, creds_key):
         if not scope and self._creds.get(str(credential_type)):
             credentials = self._creds[str(credential_type)]
         elif scope and (
                 self._creds.get("%s_%s" % (scope, str(credential_type)))):
             credentials = self._creds["%s_%s" % (scope, str(credential_type))]
+        elif self.credentials_pool is not None and self._acquire_pooled_creds(
+                creds_key, self._creds_type(credential_type, scope)):
+            credentials = self._creds[creds_key]
+            LOG.info("Acquired pooled dynamic creds:\n"
+                     " credentials: %s", credentials)
         else:
             LOG.debug("Creating new dynamic creds for scope: %s and "
                       "credential_type: %s", scope, credential_type)
+            # NOTE(gmann): For 'domain' and 'system' scoped token, there is no
+            # project_id so we are skipping the network creation for both
+            # scope. How these scoped token can create the network, Nova
+            # server or other project mapped resources is one of the open
+            # question and discussed a lot in Xena cycle PTG. Once we sort
+            # out that then if needed we can update the network creation here.
+            network = bool((not scope or scope == 'project') and
+                           self.neutron_available and self.create_networks)
             if scope:
                 if credential_type in [['admin'], ['alt_admin']]:
                     credentials = self._create_creds(
-                        admin=True, scope=scope)
+                        admin=True, scope=scope, network=network)
                 elif credential_type in [['alt_member'], ['alt_reader']]:
                     cred_type = credential_type[0][4:]
                     if isinstance(cred_type, str):
                         cred_type = [cred_type]
                     credentials = self._create_creds(
-                        roles=cred_type, scope=scope)
+                        roles=cred_type, scope=scope, network=network)
                 else:
                     credentials = self._create_creds(
-                        roles=credential_type, scope=scope)
+                        roles=credential_type, scope=scope, network=network)
             elif credential_type in ['primary', 'alt', 'admin']:
                 is_admin = (credential_type == 'admin')
-                credentials = self._create_creds(admin=is_admin)
+                credentials = self._create_creds(admin=is_admin,
+                                                 network=network)
             else:
-                credentials = self._create_creds(roles=credential_type)
-            if scope:
-                self._creds["%s_%s" %
-                            (scope, str(credential_type))] = credentials
-            else:
-                self._creds[str(credential_type)] = credentials
+                credentials = self._create_creds(roles=credential_type,
+                                                 network=network)
+            with self._lock:
+                self._creds[creds_key] = credentials
+                self._creds_types[creds_key] = self._creds_type(
+                    credential_type, scope)
             # Maintained until tests are ported
             LOG.info("Acquired dynamic creds:\n"
                      " credentials: %s", credentials)
-            # NOTE(gmann): For 'domain' and 'system' scoped token, there is no
-            # project_id so we are skipping the network creation for both
-            # scope. How these scoped token can create the network, Nova
-            # server or other project mapped resources is one of the open
-            # question and discussed a lot in Xena cycle PTG. Once we sort
-            # out that then if needed we can update the network creation here.
-            if (not scope or scope == 'project'):
-                if (self.neutron_available and self.create_networks):
-                    network, subnet, router = self._create_network_resources(
-                        credentials.tenant_id)
-                    credentials.set_resources(network=network, subnet=subnet,
-                                              router=router)
-                    LOG.info("Created isolated network resources for:\n"
-                             " credentials: %s", credentials)
-            else:
+            if network:
+                LOG.info("Created isolated network resources for:\n"
+                         " credentials: %s", credentials)
+            elif scope and scope != 'project':
                 LOG.info("Network resources are not created for scope: %s",
                          scope)
         return credentials
 
+    def provision_credentials(self, credential_types):
+        """Create the credentials of several types concurrently
+
+        The admin clients are authenticated first, so that the credentials
+        share their tokens instead of each requesting one.
+
+        :param list credential_types: Types of credentials, like 'primary',
+            'alt' or 'admin', which are then returned right away by the
+            matching `get_<type>_creds` methods
+        """
+        admin_clients = [self.identity_admin_client]
+        if self.neutron_available:
+            admin_clients.append(self.networks_admin_client)
+        for auth_provider in {id(c.auth_provider): c.auth_provider
+                              for c in admin_clients}.values():
+            auth_provider.get_auth()
+        graph = _TaskGraph()
+        for credential_type in set(credential_types):
+            method = getattr(self, 'get_%s_creds' % credential_type, None)
+            if method is not None:
+                graph.add(credential_type, method)
+        graph.run()
+
     # TODO(gmann): Remove this method in favor of get_project_member_creds()
     # after the deprecation phase.
     def get_primary_creds(self):
@@ -484,15 +816,169 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         creds_name = str(roles)
         if scope:
             creds_name = "%s_%s" % (scope, str(roles))
-        exist_creds = self._creds.get(creds_name)
-        # If force_new flag is True 2 cred sets with the same roles are needed
-        # handle this by creating a separate index for old one to store it
-        # separately for cleanup
-        if exist_creds and force_new:
-            new_index = creds_name + '-' + str(len(self._creds))
-            self._creds[new_index] = exist_creds
-            del self._creds[creds_name]
-        return self.get_credentials(roles, scope=scope)
+        with self._get_creds_lock(creds_name):
+            exist_creds = self._creds.get(creds_name)
+            # If force_new flag is True 2 cred sets with the same roles are
+            # needed handle this by creating a separate index for old one to
+            # store it separately for cleanup
+            if exist_creds and force_new:
+                with self._lock:
+                    new_index = creds_name + '-' + str(len(self._creds))
+                    self._creds[new_index] = exist_creds
+                    del self._creds[creds_name]
+                    self._creds_types[new_index] = self._creds_types.pop(
+                        creds_name, None)
+            return self.get_credentials(roles, scope=scope)
+
+    def _acquire_pooled_creds(self, creds_key, creds_type):
+        credentials = self.credentials_pool.acquire(
+            self._pool_key + (creds_type,))
+        if credentials is None:
+            return False
+        with self._lock:
+            self._creds[creds_key] = credentials
+            self._creds_types[creds_key] = creds_type
+        return True
+
+    def _list_leftovers(self, credentials):
+        """List the resources left in the project of credentials
+
+        The network resources are listed with the admin clients, other than
+        the ones created with the credentials, as well as the roles of the
+        user on the project other than or missing from the ones assigned at
+        creation. The servers, keypairs, volumes, images and the compute,
+        volume and network quotas which differ from the defaults are listed
+        with the clients of the credentials, for the services of their
+        catalog.
+
+        :param credentials: The `TestResources` of the credentials
+        :return: Dict of the IDs of the leftover resources, by type
+        """
+        project_id = credentials.tenant_id
+        graph = _TaskGraph()
+
+        def add(name, func, *args, **kwargs):
+            graph.add(name, functools.partial(
+                _skip_missing_endpoint, func, *args, **kwargs))
+
+        if self.neutron_available:
+            own_ids = [resource['id'] for resource in (
+                credentials.network, credentials.subnet, credentials.router)
+                if resource]
+            for name, client in (('networks', self.networks_admin_client),
+                                 ('subnets', self.subnets_admin_client),
+                                 ('routers', self.routers_admin_client),
+                                 ('ports', self.ports_admin_client),
+                                 ('security_groups',
+                                  self.security_groups_admin_client)):
+                add(name, getattr(client, 'list_' + name),
+                    project_id=project_id)
+        else:
+            own_ids = []
+        project_roles = getattr(credentials, 'project_roles', None)
+        if project_roles is not None:
+            add('roles', self.roles_admin_client.list_user_roles_on_project,
+                project_id, credentials.user_id)
+        user_clients = self._get_creds_clients(credentials)
+        # Quotas of each service, by the key of their response body
+        quotas = {}
+        compute = getattr(user_clients, 'compute', None)
+        if compute is not None:
+            add('servers', compute.ServersClient().list_servers)
+            add('keypairs', compute.KeyPairsClient().list_keypairs)
+            quotas_client = compute.QuotasClient()
+            quotas['compute_quotas'] = ('quota_set',
+                                        quotas_client.show_quota_set,
+                                        quotas_client.show_default_quota_set)
+        volume = getattr(user_clients, 'volume_v3', None)
+        if volume is not None:
+            add('volumes', volume.VolumesClient().list_volumes)
+            quotas_client = volume.QuotasClient()
+            quotas['volume_quotas'] = ('quota_set',
+                                       quotas_client.show_quota_set,
+                                       quotas_client.show_default_quota_set)
+        network = getattr(user_clients, 'network', None)
+        if self.neutron_available and network is not None:
+            quotas_client = network.QuotasClient()
+            quotas['network_quotas'] = ('quota', quotas_client.show_quotas,
+                                        quotas_client.show_default_quotas)
+        for name, (_, show, show_default) in quotas.items():
+            add(name, show, project_id)
+            add(name + '_defaults', show_default, project_id)
+        image = getattr(user_clients, 'image_v2', None)
+        if image is not None:
+            add('images', image.ImagesClient().list_images,
+                params={'owner': project_id})
+        results = graph.run()
+        leftovers = {}
+        for name in ('networks', 'subnets', 'routers', 'servers', 'volumes',
+                     'images'):
+            if results.get(name):
+                leftovers[name] = [
+                    resource['id'] for resource in results[name][name]
+                    if resource['id'] not in own_ids]
+        if results.get('ports'):
+            # The ports of the network resources, like the DHCP and router
+            # ports, are owned by the network service
+            leftovers['ports'] = [
+                port['id'] for port in results['ports']['ports']
+                if not port['device_owner'].startswith('network:')]
+        if results.get('security_groups'):
+            leftovers['security_groups'] = [
+                group['id'] for group in
+                results['security_groups']['security_groups']
+                if group['name'] != 'default']
+        if results.get('keypairs'):
+            leftovers['keypairs'] = [
+                keypair['keypair']['name']
+                for keypair in results['keypairs']['keypairs']]
+        if results.get('roles'):
+            roles = set(role['name'] for role in results['roles']['roles'])
+            leftovers['roles'] = sorted(roles ^ project_roles)
+        for name, (key, _, _) in quotas.items():
+            if results.get(name) and results.get(name + '_defaults'):
+                quota = results[name][key]
+                defaults = results[name + '_defaults'][key]
+                leftovers[name] = sorted(
+                    quota_name for quota_name, value in quota.items()
+                    if quota_name != 'id' and
+                    value != defaults.get(quota_name))
+        return {name: ids for name, ids in leftovers.items() if ids}
+
+    def _is_reusable(self, credentials):
+        """Whether the project of credentials is left as it was created
+
+        Credentials are not reused when resources other than the ones
+        created with them are left in their project, for instance a server
+        which was not deleted, when roles were assigned to or removed from
+        their user, or when the quotas of the project were changed.
+        """
+        if not credentials.tenant_id:
+            return True
+        try:
+            leftovers = self._list_leftovers(credentials)
+        except Exception:
+            LOG.warning('Failed to list the resources of project %s',
+                        credentials.tenant_id, exc_info=True)
+            return False
+        if leftovers:
+            LOG.warning('Dynamic creds %s are not reused, resources %s are '
+                        'left in their project', credentials, leftovers)
+        return not leftovers
+
+    def _release_pooled_creds(self):
+        for key in list(self._creds):
+            creds_type = self._creds_types.get(key)
+            credentials = self._creds[key]
+            if (creds_type is None or credentials is None or
+                    not self._is_reusable(credentials)):
+                continue
+            if not self.credentials_pool.release(
+                    self._pool_key + (creds_type,), self, credentials):
+                break
+            LOG.info("Released dynamic creds to the pool:\n"
+                     " credentials: %s", credentials)
+            del self._creds[key]
 
     def _clear_isolated_router(self, router_id, router_name):
         client = self.routers_admin_client
@@ -502,13 +988,15 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             LOG.warning('router with name: %s not found for delete',
                         router_name)
 
-    def _clear_isolated_subnet(self, subnet_id, subnet_name):
+    def _clear_isolated_subnet(self, subnet_id, subnet_name, cidr=None):
         client = self.subnets_admin_client
         try:
             client.delete_subnet(subnet_id)
         except lib_exc.NotFound:
             LOG.warning('subnet with name: %s not found for delete',
                         subnet_name)
+        if cidr:
+            self._release_cidr(cidr)
 
     def _clear_isolated_network(self, network_id, network_name):
         net_client = self.networks_admin_client
@@ -518,42 +1006,60 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             LOG.warning('network with name: %s not found for delete',
                         network_name)
 
-    def _clear_isolated_net_resources(self):
-        client = self.routers_admin_client
-        for cred in self._creds:
-            creds = self._creds.get(cred)
+    def _clear_isolated_net_resources(self, credentials):
+        for creds in credentials:
             if (not creds or not any([creds.router, creds.network,
                                       creds.subnet])):
                 continue
-            LOG.debug("Clearing network: %(network)s, "
-                      "subnet: %(subnet)s, router: %(router)s",
-                      {'network': creds.network, 'subnet': creds.subnet,
-                       'router': creds.router})
-            if (not self.network_resources or
-                    (self.network_resources.get('router') and creds.subnet)):
-                try:
-                    client.remove_router_interface(
-                        creds.router['id'],
-                        subnet_id=creds.subnet['id'])
-                except lib_exc.NotFound:
-                    LOG.warning('router with name: %s not found for delete',
-                                creds.router['name'])
-                self._clear_isolated_router(creds.router['id'],
-                                            creds.router['name'])
-            if (not self.network_resources or
-                self.network_resources.get('subnet')):
-                self._clear_isolated_subnet(creds.subnet['id'],
-                                            creds.subnet['name'])
-            if (not self.network_resources or
-                self.network_resources.get('network')):
-                self._clear_isolated_network(creds.network['id'],
-                                             creds.network['name'])
+            self._clear_network_resources(creds.network, creds.subnet,
+                                          creds.router)
+
+    def _clear_network_resources(self, network, subnet, router):
+        client = self.routers_admin_client
+        LOG.debug("Clearing network: %(network)s, "
+                  "subnet: %(subnet)s, router: %(router)s",
+                  {'network': network, 'subnet': subnet, 'router': router})
+        if (not self.network_resources or
+                (self.network_resources.get('router') and subnet)):
+            try:
+                client.remove_router_interface(
+                    router['id'],
+                    subnet_id=subnet['id'])
+            except lib_exc.NotFound:
+                LOG.warning('router with name: %s not found for delete',
+                            router['name'])
+            self._clear_isolated_router(router['id'], router['name'])
+        if (not self.network_resources or
+            self.network_resources.get('subnet')):
+            self._clear_isolated_subnet(subnet['id'], subnet['name'],
+                                        subnet.get('cidr'))
+        if (not self.network_resources or
+            self.network_resources.get('network')):
+            self._clear_isolated_network(network['id'], network['name'])
 
     def clear_creds(self):
+        if self.credentials_pool is not None:
+            self._release_pooled_creds()
+        self._clear_creds()
+        self._creds_types = {}
+
+    def delete_pooled_creds(self, credentials):
+        """Delete credentials taken back from the pool
+
+        :param list credentials: `TestResources` of the credentials released
+                                 to the pool by this provider
+        """
+        self._delete_creds(credentials)
+
+    def _clear_creds(self):
         if not self._creds:
             return
-        self._clear_isolated_net_resources()
-        for creds in self._creds.values():
+        self._delete_creds(list(self._creds.values()))
+        self._creds = {}
+
+    def _delete_creds(self, credentials):
+        self._clear_isolated_net_resources(credentials)
+        for creds in credentials:
             try:
                 self.creds_client.delete_user(creds.user_id)
             except lib_exc.NotFound:
@@ -586,7 +1092,6 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                 except lib_exc.NotFound:
                     LOG.warning("domain with name: %s not found for delete",
                                 creds.domain_name)
-        self._creds = {}
 
     def is_multi_user(self):
         return True
@@ -13,12 +13,295 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import hashlib
+import http.client
+import io
+import mmap
+import os
+import stat
+import threading
+
+from oslo_utils import secretutils
 import urllib3
 
+from tempest.lib.common.utils import misc
+
+
+# Exceptions raised by the standard library when the server closed a kept
+# alive connection before it could be reused.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                           ConnectionResetError, BrokenPipeError)
+
+# Methods of the requests which can be sent again without changing their
+# outcome, when they may have been processed by the server already.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+# Shared pool managers talk to all the services, so they keep more pools
+# around than the urllib3 default of 10.
+SHARED_NUM_POOLS = 50
+
+# Size of the chunks yielded when iterating over a streamed response body
+STREAM_CHUNKSIZE = 1024 * 64
+
+
+class StreamingBody(object):
+    """Body of a response which is read from the connection on demand
+
+    It is returned instead of the content of the response for the requests
+    sent with `stream=True`, so that large bodies (images, objects) do not
+    need to be held in memory. The body is read with `read` or by iterating
+    over it, and the checksums of the data read so far are available with
+    `hexdigest`. The connection is released once the body has been read
+    entirely or closed. If the body was closed before being read entirely,
+    the connection is closed rather than reused, since the data not read
+    is still pending on it.
+
+    :param response: The urllib3 response, sent with preload_content=False
+    :param int chunk_size: Size of the chunks yielded by the iterator
+    :param hash_algorithms: Names of the hashlib algorithms of the checksums
+                            computed while the body is read
+    """
+
+    def __init__(self, response, chunk_size=STREAM_CHUNKSIZE,
+                 hash_algorithms=('md5',)):
+        self._response = response
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._exhausted = False
+        self._hashes = {}
+        for algorithm in hash_algorithms:
+            if algorithm == 'md5':
+                self._hashes[algorithm] = secretutils.md5(
+                    usedforsecurity=False)
+            else:
+                self._hashes[algorithm] = hashlib.new(algorithm)
+
+    def read(self, amt=None):
+        """Read up to amt bytes, or the rest of the body if amt is None"""
+        data = self._response.read(amt)
+        if data:
+            self.bytes_read += len(data)
+            for checksum in self._hashes.values():
+                checksum.update(data)
+        if amt is None or not data:
+            self._exhausted = True
+            self.close()
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def hexdigest(self, algorithm='md5'):
+        """Return the checksum of the data read so far"""
+        return self._hashes[algorithm].hexdigest()
+
+    def close(self):
+        """Release the connection, discarding the data not read yet"""
+        if not self._exhausted:
+            # NOTE: The pool reconnects the closed connection when it is
+            # used again.
+            self._response.close()
+        self._response.release_conn()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __str__(self):
+        return '<StreamingBody: %d bytes read>' % self.bytes_read
+
+
+def _file_buffer(data):
+    if isinstance(data, io.BytesIO):
+        return data.getbuffer()
+    try:
+        file_stat = os.fstat(data.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    # NOTE: empty files can't be mapped, and the size of special files is
+    # not known.
+    if not stat.S_ISREG(file_stat.st_mode) or not file_stat.st_size:
+        return None
+    return mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextlib.contextmanager
+def file_body(data):
+    """Expose the rest of a file as a buffer to send it as a request body
+
+    Regular files are mapped to memory and in-memory files are exposed
+    without copy, so that their data is sent as is by the socket, with a
+    known Content-Length, instead of being read in chunks and sent with
+    chunked transfer encoding. The file is positioned at its end once the
+    body has been sent.
+
+    :param data: A file-like object
+    :return: A context manager yielding a memoryview of the data left to
+             read, or None if the size of the file is not known upfront, in
+             which case the file should be sent in chunks.
+    """
+    buffer = _file_buffer(data)
+    if buffer is None:
+        yield None
+        return
+    try:
+        position = data.tell()
+        with memoryview(buffer) as view:
+            with view[position:] as body:
+                yield body
+        data.seek(0, os.SEEK_END)
+    finally:
+        # NOTE: the memoryviews have been released, BytesIO can be resized
+        # again and the mapping can be closed.
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+        else:
+            buffer.release()
+
+
+class ConnectionStats(object):
+    """Counters of the connections used by a pool manager
+
+    The counters are shared by all the connection pools created by a pool
+    manager, and are safe to update from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.opened = 0
+            self.stale_retries = 0
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def reused(self):
+        """Number of requests that were sent over an existing connection"""
+        return max(0, self.requests - self.opened)
+
+    def __str__(self):
+        return ("requests: %d, connections opened: %d, connections reused: "
+                "%d, stale connection retries: %d" % (
+                    self.requests, self.opened, self.reused,
+                    self.stale_retries))
+
+
+class _CountingPoolMixin(object):
+    connection_stats = None
+
+    def _new_conn(self):
+        if self.connection_stats is not None:
+            self.connection_stats.increment('opened')
+        return super(_CountingPoolMixin, self)._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        if self.connection_stats is not None:
+            self.connection_stats.increment('requests')
+        return super(_CountingPoolMixin, self)._make_request(*args, **kwargs)
+
 
-class ClosingProxyHttp(urllib3.ProxyManager):
+class CountingHTTPConnectionPool(_CountingPoolMixin,
+                                 urllib3.HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin,
+                                  urllib3.HTTPSConnectionPool):
+    pass
+
+
+class _KeepAliveMixin(object):
+    """Connection handling shared by ClosingHttp and ClosingProxyHttp
+
+    By default every request is sent with a `Connection: close` header, so
+    a new connection is opened for each of them. When `keep_alive` is set
+    connections are kept in the pools of the manager, up to `pool_maxsize`
+    connections per host, and reused by the following requests.
+    """
+
+    def _set_connection_options(self, keep_alive, pool_maxsize, kwargs):
+        self.keep_alive = keep_alive
+        self.connection_stats = ConnectionStats()
+        if keep_alive and pool_maxsize:
+            kwargs['maxsize'] = pool_maxsize
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(_KeepAliveMixin, self)._new_pool(
+            scheme, host, port, request_context=request_context)
+        pool.connection_stats = self.connection_stats
+        return pool
+
+    def _request_headers(self, kwargs):
+        if self.keep_alive:
+            return kwargs
+        original_headers = kwargs.get('headers', {})
+        new_headers = dict(original_headers, connection='close')
+        return dict(kwargs, headers=new_headers)
+
+    def _retry_policy(self):
+        if self.follow_redirects:
+            # Follow up to 5 redirections. Don't raise an exception if
+            # it's exceeded but return the HTTP 3XX response instead.
+            return urllib3.util.Retry(raise_on_redirect=False, redirect=5)
+        # Do not follow redirections. Don't raise an exception if
+        # a redirect is found, but return the HTTP 3XX response instead.
+        return urllib3.util.Retry(redirect=False)
+
+    def _response_body(self, response, method, stream):
+        # NOTE: Only the bodies of successful responses are streamed, the
+        # error handling of the clients needs the content of the others.
+        if (stream and 200 <= response.status < 300 and
+                response.status not in (204, 205) and method != 'HEAD'):
+            return StreamingBody(response)
+        data = response.data
+        if stream:
+            response.release_conn()
+        return data
+
+    def _send(self, send, url, method, *args, **kwargs):
+        new_kwargs = self._request_headers(kwargs)
+        try:
+            return send(method, url, retries=self._retry_policy(),
+                        *args, **new_kwargs)
+        except urllib3.exceptions.ProtocolError as ex:
+            # NOTE: A kept alive connection may have been closed by the
+            # server while it was idle in the pool, the request is then sent
+            # again once on a new connection, unless its body cannot be read
+            # a second time. The connection may also be closed after the
+            # request was written, while waiting for the response, so that
+            # the server may have processed it. Only idempotent requests are
+            # sent again then, the others only when writing them failed.
+            body = kwargs.get('body')
+            error = ex.args[1] if len(ex.args) > 1 else None
+            if not (self.keep_alive and
+                    isinstance(body, (type(None), str, bytes,
+                                      memoryview)) and
+                    isinstance(error, STALE_CONNECTION_ERRORS) and
+                    (method.upper() in IDEMPOTENT_METHODS or
+                     isinstance(error, BrokenPipeError))):
+                raise
+            self.connection_stats.increment('stale_retries')
+            return send(method, url, retries=self._retry_policy(),
+                        *args, **new_kwargs)
+
+
+class ClosingProxyHttp(_KeepAliveMixin, urllib3.ProxyManager):
     def __init__(self, proxy_url, disable_ssl_certificate_validation=False,
-                 ca_certs=None, timeout=None, follow_redirects=True):
+                 ca_certs=None, timeout=None, follow_redirects=True,
+                 keep_alive=False, pool_maxsize=None, num_pools=10):
         self.follow_redirects = follow_redirects
         kwargs = {}
 
@@ -32,9 +315,14 @@ class ClosingProxyHttp(urllib3.ProxyManager):
         if timeout:
             kwargs['timeout'] = timeout
 
-        super(ClosingProxyHttp, self).__init__(proxy_url, **kwargs)
+        self._set_connection_options(keep_alive, pool_maxsize, kwargs)
+        super(ClosingProxyHttp, self).__init__(proxy_url, num_pools,
+                                               **kwargs)
+        self.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool}
 
-    def request(self, url, method, *args, **kwargs):
+    def request(self, url, method, *args, stream=False, **kwargs):
 
         class Response(dict):
             def __init__(self, info):
@@ -46,26 +334,17 @@ class ClosingProxyHttp(urllib3.ProxyManager):
                 self.version = info.version
                 self['content-location'] = url
 
-        original_headers = kwargs.get('headers', {})
-        new_headers = dict(original_headers, connection='close')
-        new_kwargs = dict(kwargs, headers=new_headers)
+        if stream:
+            kwargs['preload_content'] = False
+        r = self._send(super(ClosingProxyHttp, self).request, url, method,
+                       *args, **kwargs)
+        return Response(r), self._response_body(r, method, stream)
 
-        if self.follow_redirects:
-            # Follow up to 5 redirections. Don't raise an exception if
-            # it's exceeded but return the HTTP 3XX response instead.
-            retry = urllib3.util.Retry(raise_on_redirect=False, redirect=5)
-        else:
-            # Do not follow redirections. Don't raise an exception if
-            # a redirect is found, but return the HTTP 3XX response instead.
-            retry = urllib3.util.Retry(redirect=False)
-        r = super(ClosingProxyHttp, self).request(method, url, retries=retry,
-                                                  *args, **new_kwargs)
-        return Response(r), r.data
 
-
-class ClosingHttp(urllib3.poolmanager.PoolManager):
+class ClosingHttp(_KeepAliveMixin, urllib3.poolmanager.PoolManager):
     def __init__(self, disable_ssl_certificate_validation=False,
-                 ca_certs=None, timeout=None, follow_redirects=True):
+                 ca_certs=None, timeout=None, follow_redirects=True,
+                 keep_alive=False, pool_maxsize=None, num_pools=10):
         self.follow_redirects = follow_redirects
         kwargs = {}
 
@@ -79,9 +358,13 @@ class ClosingHttp(urllib3.poolmanager.PoolManager):
         if timeout:
             kwargs['timeout'] = timeout
 
-        super(ClosingHttp, self).__init__(**kwargs)
+        self._set_connection_options(keep_alive, pool_maxsize, kwargs)
+        super(ClosingHttp, self).__init__(num_pools, **kwargs)
+        self.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool}
 
-    def request(self, url, method, *args, **kwargs):
+    def request(self, url, method, *args, stream=False, **kwargs):
 
         class Response(dict):
             def __init__(self, info):
@@ -95,18 +378,60 @@ class ClosingHttp(urllib3.poolmanager.PoolManager):
                 self.version = info.version
                 self['content-location'] = url
 
-        original_headers = kwargs.get('headers', {})
-        new_headers = dict(original_headers, connection='close')
-        new_kwargs = dict(kwargs, headers=new_headers)
+        if stream:
+            kwargs['preload_content'] = False
+        r = self._send(super(ClosingHttp, self).request, url, method,
+                       *args, **kwargs)
+        return Response(r), self._response_body(r, method, stream)
 
-        if self.follow_redirects:
-            # Follow up to 5 redirections. Don't raise an exception if
-            # it's exceeded but return the HTTP 3XX response instead.
-            retry = urllib3.util.Retry(raise_on_redirect=False, redirect=5)
-        else:
-            # Do not follow redirections. Don't raise an exception if
-            # a redirect is found, but return the HTTP 3XX response instead.
-            retry = urllib3.util.Retry(redirect=False)
-        r = super(ClosingHttp, self).request(method, url, retries=retry,
-                                             *args, **new_kwargs)
-        return Response(r), r.data
+
+@misc.singleton
+class SharedHttpRegistry(object):
+    """Registry of the pool managers shared by all the service clients
+
+    Building a pool manager loads the CA bundle and creates a new SSL context
+    for each of its pools, and connections cannot be reused across pool
+    managers. This registry hands out a single pool manager for each set of
+    connection settings, to be shared by all the clients in the process.
+    Pool managers are safe to use from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool_managers = {}
+
+    def get_http(self, proxy_url=None,
+                 disable_ssl_certificate_validation=False, ca_certs=None,
+                 timeout=None, follow_redirects=True, keep_alive=False,
+                 pool_maxsize=None):
+        """Return the pool manager shared for the given connection settings
+
+        Parameters are the same as the ones of ClosingHttp, plus proxy_url.
+        A ClosingProxyHttp is returned when proxy_url is set.
+        """
+        key = (proxy_url, bool(disable_ssl_certificate_validation),
+               ca_certs, timeout, follow_redirects, keep_alive,
+               pool_maxsize)
+        with self._lock:
+            pool_manager = self._pool_managers.get(key)
+            if pool_manager is None:
+                kwargs = dict(
+                    disable_ssl_certificate_validation=(
+                        disable_ssl_certificate_validation),
+                    ca_certs=ca_certs, timeout=timeout,
+                    follow_redirects=follow_redirects,
+                    keep_alive=keep_alive, pool_maxsize=pool_maxsize,
+                    num_pools=SHARED_NUM_POOLS)
+                if proxy_url:
+                    pool_manager = ClosingProxyHttp(proxy_url, **kwargs)
+                else:
+                    pool_manager = ClosingHttp(**kwargs)
+                self._pool_managers[key] = pool_manager
+            return pool_manager
+
+    def clear(self):
+        """Close all the connections and forget the shared pool managers"""
+        with self._lock:
+            for pool_manager in self._pool_managers.values():
+                pool_manager.clear()
+            self._pool_managers = {}
@@ -20,6 +20,13 @@ from oslo_utils import timeutils
 JSONSCHEMA_VALIDATOR = jsonschema.Draft4Validator
 FORMAT_CHECKER = jsonschema.draft4_format_checker
 
+# Maximum number of compiled validators kept in the cache. Response schemas
+# are module level constants, so this is only reached if schemas are built
+# on the fly.
+VALIDATOR_CACHE_SIZE = 4096
+
+_validators = {}
+
 
 # NOTE(gmann): Add customized format checker for 'date-time' format because:
 # 1. jsonschema needs strict_rfc3339 or isodate module to be installed
@@ -51,3 +58,51 @@ def _validate_base64_format(instance):
         return False
 
     return True
+
+
+def get_validator(schema, cls=None, format_checker=None):
+    """Return a validator for a schema, compiled once and then cached
+
+    The schema itself is checked only when its validator is compiled.
+    Validators are cached by schema identity, so a schema must not be
+    modified once it has been used for validation.
+
+    :param schema: The JSON schema
+    :param cls: The validator class, defaults to JSONSCHEMA_VALIDATOR
+    :param format_checker: The format checker, defaults to FORMAT_CHECKER
+    :raises jsonschema.SchemaError: if the schema is not valid
+    :return: A validator instance for the schema
+    """
+    cls = cls or JSONSCHEMA_VALIDATOR
+    format_checker = format_checker or FORMAT_CHECKER
+    key = (id(schema), cls, format_checker)
+    cached = _validators.get(key)
+    # NOTE: The schema is kept in the cache along with its validator, so
+    # that its id cannot be reused by another object while it is cached.
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    cls.check_schema(schema)
+    validator = cls(schema, format_checker=format_checker)
+    if len(_validators) >= VALIDATOR_CACHE_SIZE:
+        _validators.clear()
+    _validators[key] = (schema, validator)
+    return validator
+
+
+def validate(instance, schema, cls=None, format_checker=None):
+    """Validate an instance against a schema with a pre-compiled validator
+
+    This is equivalent to `jsonschema.validate`, but the validator for the
+    schema is only built (and the schema checked) the first time it is used.
+
+    :param instance: The instance to validate
+    :param schema: The JSON schema
+    :param cls: The validator class, defaults to JSONSCHEMA_VALIDATOR
+    :param format_checker: The format checker, defaults to FORMAT_CHECKER
+    :raises jsonschema.ValidationError: if the instance is invalid
+    :raises jsonschema.SchemaError: if the schema is not valid
+    """
+    validator = get_validator(schema, cls=cls, format_checker=format_checker)
+    error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import random
+import time
+
+from tempest.lib import exceptions
+
+POLL_FIXED = 'fixed'
+POLL_BACKOFF = 'backoff'
+
+
+class PollingPolicy(object):
+    """Decides the intervals between the polls of a wait loop
+
+    :param str policy: One of:
+
+        * `fixed`: the resource is polled every build interval of the client
+          (default)
+        * `backoff`: the resource is polled first after `initial_interval`,
+          then the interval grows by `backoff_factor` on each poll, up to
+          `max_interval`
+
+    :param float initial_interval: First interval of the `backoff` policy
+    :param float backoff_factor: Growth of the intervals of the `backoff`
+                                 policy
+    :param float max_interval: Longest interval of the `backoff` policy.
+                               Defaults to the build interval of the client.
+    :param float jitter: Each interval is randomly lengthened or shortened by
+                         up to this fraction of itself, so that concurrent
+                         waiters don't poll in lockstep
+    :raises InvalidParam: if the policy is not valid
+    """
+
+    def __init__(self, policy=POLL_FIXED, initial_interval=0.25,
+                 backoff_factor=2.0, max_interval=None, jitter=0.0):
+        self.policy = policy or POLL_FIXED
+        if self.policy not in (POLL_FIXED, POLL_BACKOFF):
+            raise exceptions.InvalidParam(
+                invalid_param='polling policy %s' % self.policy)
+        if not 0 <= jitter < 1:
+            raise exceptions.InvalidParam(invalid_param=(
+                'polling jitter %s, it must be a fraction' % jitter))
+        if self.policy == POLL_BACKOFF and (initial_interval <= 0 or
+                                            backoff_factor < 1):
+            raise exceptions.InvalidParam(invalid_param=(
+                'polling backoff from %s by %s' % (initial_interval,
+                                                   backoff_factor)))
+        if max_interval is not None and max_interval <= 0:
+            raise exceptions.InvalidParam(invalid_param=(
+                'polling max interval %s' % max_interval))
+        self.initial_interval = initial_interval
+        self.backoff_factor = backoff_factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+
+    def start(self, timeout, interval):
+        """Start a wait loop
+
+        :param timeout: Time in seconds after which the loop expires
+        :param interval: Build interval of the client
+        :return: A `Poller` timing the loop
+        """
+        return Poller(self, timeout, interval)
+
+
+class Poller(object):
+    """Times a wait loop, on the monotonic clock
+
+    :param PollingPolicy policy: Policy of the intervals between the polls
+    :param timeout: Time in seconds after which the loop expires
+    :param interval: Build interval of the client
+    """
+
+    def __init__(self, policy, timeout, interval):
+        self.policy = policy
+        self.timeout = timeout
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time + timeout
+        if policy.policy == POLL_BACKOFF:
+            self.max_interval = (interval if policy.max_interval is None
+                                 else policy.max_interval)
+            self.interval = min(policy.initial_interval, self.max_interval)
+        else:
+            self.max_interval = self.interval = interval
+
+    @property
+    def elapsed(self):
+        """Time in seconds since the start of the loop"""
+        return time.monotonic() - self.start_time
+
+    @property
+    def remaining(self):
+        """Time in seconds until the timeout of the loop"""
+        return max(self.deadline - time.monotonic(), 0)
+
+    @property
+    def expired(self):
+        """Whether the timeout of the loop has elapsed"""
+        return time.monotonic() >= self.deadline
+
+    def sleep(self):
+        """Sleep until the next poll"""
+        interval = self.interval
+        if self.policy.jitter:
+            interval *= 1 + random.uniform(-self.policy.jitter,
+                                           self.policy.jitter)
+        time.sleep(interval)
+        if self.policy.policy == POLL_BACKOFF:
+            self.interval = min(self.interval * self.policy.backoff_factor,
+                                self.max_interval)
+
+
+def start_polling(client, timeout=None):
+    """Start a wait loop with the polling policy of a client
+
+    :param client: A service client, with `build_interval` and
+                   `build_timeout` attributes
+    :param timeout: Timeout of the loop. Defaults to the build timeout of
+                    the client.
+    :return: A `Poller` timing the loop
+    """
+    policy = getattr(client, 'polling_policy', None)
+    # NOTE: Clients which are not rest clients poll every build interval
+    if not isinstance(policy, PollingPolicy):
+        policy = PollingPolicy()
+    if timeout is None:
+        timeout = client.build_timeout
+    return policy.start(timeout, client.build_interval)
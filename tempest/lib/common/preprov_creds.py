@@ -13,8 +13,8 @@
 #    under the License.
 
 import os
+import random
 
-from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_utils.secretutils import md5
 import yaml
@@ -44,9 +44,10 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
 
     This credentials provider loads the details of pre-provisioned
     accounts from a YAML file, in the format specified by
-    ``etc/accounts.yaml.sample``. It locks accounts while in use, using the
-    external locking mechanism, allowing for multiple python processes
-    to share a single account file, and thus running tests in parallel.
+    ``etc/accounts.yaml.sample``. It locks accounts while in use, creating
+    a lock file per account in the accounts lock dir, allowing for multiple
+    python processes to share a single account file, and thus running tests
+    in parallel.
 
     The accounts_lock_dir must be generated using `lockutils.get_lock_path`
     from the oslo.concurrency library. For instance::
@@ -93,6 +94,13 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
             object_storage_reseller_admin_role)
         self.accounts_dir = accounts_lock_dir
         self._creds = {}
+        # Accounts matching each (roles, scope) request, see
+        # _get_match_hash_list
+        self._match_hashes = {}
+        # Hash of the accounts by their hashed attributes, see get_hash
+        self._hash_index = dict(
+            (self._hash_index_key(account, account.get), _hash)
+            for (_hash, account) in self.hash_dict['creds'].items())
 
     @classmethod
     def _append_role(cls, role, account_hash, hash_dict):
@@ -189,40 +197,58 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
         return self.is_multi_user()
 
     def _create_hash_file(self, hash_string):
+        # The file is created atomically, so that only one process can
+        # allocate the account
         path = os.path.join(self.accounts_dir, hash_string)
-        if not os.path.isfile(path):
-            with open(path, 'w') as fd:
-                fd.write(self.name)
-            return True
-        return False
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as lock_file:
+            lock_file.write(self.name)
+        return True
 
-    @lockutils.synchronized('test_accounts_io', external=True)
     def _get_free_hash(self, hashes):
         # Cast as a list because in some edge cases a set will be passed in
         hashes = list(hashes)
-        if not os.path.isdir(self.accounts_dir):
-            os.mkdir(self.accounts_dir)
-            # Create File from first hash (since none are in use)
-            self._create_hash_file(hashes[0])
-            return hashes[0]
-        names = []
+        # Start from a random account, so that concurrent processes don't
+        # all try the accounts allocated first
+        start = random.randrange(len(hashes)) if hashes else 0
+        hashes = hashes[start:] + hashes[:start]
         for _hash in hashes:
-            res = self._create_hash_file(_hash)
+            try:
+                res = self._create_hash_file(_hash)
+            except FileNotFoundError:
+                # The lock dir doesn't exist, or was removed by a process
+                # returning the last allocated account
+                os.makedirs(self.accounts_dir, exist_ok=True)
+                res = self._create_hash_file(_hash)
             if res:
                 return _hash
-            else:
-                path = os.path.join(self.accounts_dir, _hash)
+        names = []
+        for _hash in hashes:
+            path = os.path.join(self.accounts_dir, _hash)
+            try:
                 with open(path, 'r') as fd:
                     names.append(fd.read())
+            except FileNotFoundError:
+                pass
         msg = ('Insufficient number of users provided. %s have allocated all '
                'the credentials for this allocation request' % ','.join(names))
         raise lib_exc.InvalidCredentials(msg)
 
     def _get_match_hash_list(self, roles=None, scope=None):
-        hashes = []
+        key = (frozenset(roles or []), scope)
+        if key not in self._match_hashes:
+            self._match_hashes[key] = self._find_match_hashes(roles, scope)
+        return self._match_hashes[key]
+
+    def _find_match_hashes(self, roles=None, scope=None):
         if roles:
-            # Loop over all the creds for each role in the subdict and generate
-            # a list of cred lists for each role
+            # Take the creds for each role in the subdict, and do a boolean
+            # and between them to find the creds which fall under all the
+            # specified roles
+            hashes = None
             for role in roles:
                 if scope:
                     key = "%s_%s" % (scope, role)
@@ -237,15 +263,12 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
                         raise lib_exc.InvalidCredentials(
                             "No credentials with role: %s specified in the "
                             "accounts file" % role)
-                hashes.append(temp_hashes)
-            # Take the list of lists and do a boolean and between each list to
-            # find the creds which fall under all the specified roles
-            temp_list = set(hashes[0])
-            for hash_list in hashes[1:]:
-                temp_list = temp_list & set(hash_list)
-            hashes = temp_list
+                if hashes is None:
+                    hashes = set(temp_hashes)
+                else:
+                    hashes &= set(temp_hashes)
         else:
-            hashes = self.hash_dict['creds'].keys()
+            hashes = set(self.hash_dict['creds'])
         # NOTE(mtreinish): admin is a special case because of the increased
         # privilege set which could potentially cause issues on tests where
         # that is not expected. So unless the admin role isn't specified do
@@ -254,10 +277,9 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
                                                    None)
         if ((not roles or self.admin_role not in roles) and
                 admin_hashes):
-            useable_hashes = [x for x in hashes if x not in admin_hashes]
-        else:
-            useable_hashes = hashes
-        return useable_hashes
+            hashes -= set(admin_hashes)
+        # Keep the order of the accounts file
+        return [x for x in self.hash_dict['creds'] if x in hashes]
 
     def _sanitize_creds(self, creds):
         temp_creds = creds.copy()
@@ -275,25 +297,38 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
         LOG.info('%s allocated creds:\n%s', self.name, clean_creds)
         return self._wrap_creds_with_network(free_hash)
 
-    @lockutils.synchronized('test_accounts_io', external=True)
     def remove_hash(self, hash_string):
         hash_path = os.path.join(self.accounts_dir, hash_string)
-        if not os.path.isfile(hash_path):
+        try:
+            os.remove(hash_path)
+        except FileNotFoundError:
             LOG.warning('Expected an account lock file %s to remove, but '
                         'one did not exist', hash_path)
-        else:
-            os.remove(hash_path)
-            if not os.listdir(self.accounts_dir):
+            return
+        if not os.listdir(self.accounts_dir):
+            try:
                 os.rmdir(self.accounts_dir)
+            except OSError:
+                # Another process allocated an account in the meantime
+                pass
+
+    @classmethod
+    def _hash_index_key(cls, attributes, get_attribute):
+        return frozenset((k, get_attribute(k)) for k in attributes
+                         if k in cls.HASH_CRED_FIELDS and
+                         get_attribute(k) is not None)
 
     def get_hash(self, creds):
+        # Only use the attributes initially used to calculate the hash
+        init_attributes = [x for x in creds.get_init_attributes() if
+                           x in self.HASH_CRED_FIELDS]
+        _hash = self._hash_index.get(self._hash_index_key(
+            init_attributes, lambda k: getattr(creds, k, None)))
+        if _hash is not None:
+            return _hash
+        # Credentials with fewer attributes than their account
         for _hash in self.hash_dict['creds']:
-            # Comparing on the attributes that are expected in the YAML
-            init_attributes = creds.get_init_attributes()
-            # Only use the attributes initially used to calculate the hash
-            init_attributes = [x for x in init_attributes if
-                               x in self.HASH_CRED_FIELDS]
-            hash_attributes = self.hash_dict['creds'][_hash].copy()
+            hash_attributes = self.hash_dict['creds'][_hash]
             # NOTE(andreaf) Not all fields may be available on all credentials
             # so defaulting to None for that case.
             if all([getattr(creds, k, None) == hash_attributes.get(k, None) for
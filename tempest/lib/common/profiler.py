@@ -19,6 +19,8 @@ from oslo_utils import encodeutils
 from oslo_utils import uuidutils
 
 _profiler = {}
+# Headers serialized for the current trace, see serialize_as_http_headers
+_headers = {}
 
 
 def enable(profiler_key, trace_id=None):
@@ -30,32 +32,46 @@ def enable(profiler_key, trace_id=None):
     """
     _profiler['key'] = profiler_key
     _profiler['uuid'] = trace_id or uuidutils.generate_uuid()
+    _headers.clear()
 
 
 def disable():
     """Disable global profiler instance"""
     _profiler.clear()
+    _headers.clear()
+
+
+def trace_id():
+    """Return the id of the current trace, None if profiler is disabled"""
+    return _profiler.get('uuid')
 
 
 def serialize_as_http_headers():
     """Serialize profiler state as HTTP headers
 
-    This function corresponds to the one from osprofiler library.
+    This function corresponds to the one from osprofiler library. The
+    headers are only serialized and signed once per trace.
     :return: dictionary with 2 keys `X-Trace-Info` and `X-Trace-HMAC`.
     """
     p = _profiler
     if not p:  # profiler is not enabled
         return {}
 
-    info = {'base_id': p['uuid'], 'parent_id': p['uuid']}
-    trace_info = base64.urlsafe_b64encode(
-        encodeutils.to_utf8(json.dumps(info)))
-    trace_hmac = _sign(trace_info, p['key'])
+    trace = (p['uuid'], p['key'])
+    headers = _headers.get(trace)
+    if headers is None:
+        info = {'base_id': p['uuid'], 'parent_id': p['uuid']}
+        trace_info = base64.urlsafe_b64encode(
+            encodeutils.to_utf8(json.dumps(info)))
+        trace_hmac = _sign(trace_info, p['key'])
+        headers = {
+            'X-Trace-Info': trace_info,
+            'X-Trace-HMAC': trace_hmac,
+        }
+        _headers.clear()
+        _headers[trace] = headers
 
-    return {
-        'X-Trace-Info': trace_info,
-        'X-Trace-HMAC': trace_hmac,
-    }
+    return dict(headers)
 
 
 def _sign(trace_info, key):
@@ -0,0 +1,86 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import os
+import threading
+
+from oslo_serialization import jsonutils as json
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+class DeferredStr(object):
+    """A log argument which is only rendered if the record is emitted
+
+    Logging calls str() on their arguments only when a handler formats the
+    record, so wrapping an expensive rendering in a DeferredStr avoids paying
+    for it when the record is filtered out.
+    """
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+class NDJSONRequestSink(object):
+    """Writes one JSON document per request to a file
+
+    Each record is written with a single write on a file opened in append
+    mode, so several processes can share the same file.
+
+    :param str path: Path of the file to append the records to
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                           0o644)
+
+    def write(self, record):
+        """Append a record, a JSON serializable dict, to the file"""
+        line = (json.dumps(record) + '\n').encode('utf-8')
+        with self._lock:
+            os.write(self._fd, line)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def get_sink(path):
+    """Return the request log sink for a path, shared in the process"""
+    with _sinks_lock:
+        sink = _sinks.get(path)
+        if sink is None:
+            sink = _sinks[path] = NDJSONRequestSink(path)
+        return sink
+
+
+def close_sinks():
+    """Close all the request log sinks of the process"""
+    with _sinks_lock:
+        for sink in _sinks.values():
+            sink.close()
+        _sinks.clear()
+
+
+atexit.register(close_sinks)
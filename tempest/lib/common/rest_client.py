@@ -15,8 +15,12 @@
 #    under the License.
 
 from collections import abc
+from concurrent import futures
+import contextvars
 import email.utils
+import random
 import re
+import sys
 import time
 import urllib
 
@@ -24,16 +28,23 @@ import jsonschema
 from oslo_log import log as logging
 from oslo_log import versionutils
 from oslo_serialization import jsonutils as json
+import testtools
 
 from tempest.lib.common import http
 from tempest.lib.common import jsonschema_validator
+from tempest.lib.common import polling
 from tempest.lib.common import profiler
+from tempest.lib.common import request_log
 from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions
 
 # redrive rate limited calls at most twice
 MAX_RECURSION_DEPTH = 2
 
+# Default number of requests sent concurrently by map_requests, which is
+# also the default number of connections kept per host by urllib3
+MAP_REQUESTS_MAX_WORKERS = 10
+
 # All the successful HTTP status codes from RFC 7231 & 4918
 HTTP_SUCCESS = (200, 201, 202, 203, 204, 205, 206, 207)
 
@@ -44,6 +55,67 @@ HTTP_REDIRECTION = (300, 301, 302, 303, 304, 305, 306, 307)
 JSONSCHEMA_VALIDATOR = jsonschema_validator.JSONSCHEMA_VALIDATOR
 FORMAT_CHECKER = jsonschema_validator.FORMAT_CHECKER
 
+# Response schema validation policies
+VALIDATE_ALWAYS = 'always'
+VALIDATE_FIRST_PER_TEST = 'first-per-test'
+VALIDATE_SAMPLED = 'sampled'
+VALIDATE_OFF = 'off'
+
+
+class ValidationPolicy(object):
+    """Decides which responses are validated against their JSON schema
+
+    :param str policy: One of:
+
+        * `always`: every response is validated (default)
+        * `first-per-test`: only the first response for each schema is
+          validated in each test (or test fixture)
+        * `sampled:N`: N percent of the responses, picked at random, are
+          validated
+        * `off`: responses are never validated against their JSON schema
+
+    The status code of a response is checked in any case.
+    :raises InvalidParam: if the policy is not valid
+    """
+
+    def __init__(self, policy=VALIDATE_ALWAYS):
+        self.policy = policy or VALIDATE_ALWAYS
+        self.rate = None
+        self._test = None
+        self._validated_schemas = set()
+        name, _, rate = self.policy.partition(':')
+        if name == VALIDATE_SAMPLED:
+            try:
+                self.rate = float(rate)
+            except ValueError:
+                self.rate = -1
+            if not 0 <= self.rate <= 100:
+                raise exceptions.InvalidParam(invalid_param=(
+                    'validation policy %s, the sampling rate must be a '
+                    'percentage' % self.policy))
+        elif self.policy not in (VALIDATE_ALWAYS, VALIDATE_FIRST_PER_TEST,
+                                 VALIDATE_OFF):
+            raise exceptions.InvalidParam(
+                invalid_param='validation policy %s' % self.policy)
+        self.name = name
+
+    def should_validate(self, schema):
+        """Whether a response for the schema must be validated now"""
+        if self.name == VALIDATE_ALWAYS:
+            return True
+        if self.name == VALIDATE_OFF:
+            return False
+        if self.name == VALIDATE_SAMPLED:
+            return random.uniform(0, 100) < self.rate
+        test = test_utils.find_test_caller()
+        if test != self._test:
+            self._test = test
+            self._validated_schemas = set()
+        if id(schema) in self._validated_schemas:
+            return False
+        self._validated_schemas.add(id(schema))
+        return True
+
 
 class RestClient(object):
     """Unified OpenStack RestClient class
@@ -72,6 +144,23 @@ class RestClient(object):
                              return
     :param str proxy_url: http proxy url to use.
     :param bool follow_redirects: Set to false to stop following redirects.
+    :param bool keep_alive: Set to true to keep connections open and reuse
+                            them for the following requests, instead of
+                            closing them after each request.
+    :param int pool_maxsize: Maximum number of connections kept open for each
+                             host when keep_alive is set.
+    :param bool shared_http_pool: Set to true to use the pool manager shared
+                                  by all the clients with the same connection
+                                  settings, instead of a dedicated one.
+    :param str validation_policy: Which responses are validated against their
+                                  JSON schema, see `ValidationPolicy`.
+                                  Defaults to `always`.
+    :param str request_log_file: Path of a file to which a JSON document is
+                                 appended for each request, independently of
+                                 the log level.
+    :param PollingPolicy polling_policy: How often the wait loops poll the
+                                         resources, see `PollingPolicy`.
+                                         Defaults to every build_interval.
     """
 
     # The version of the API this client implements
@@ -84,7 +173,10 @@ class RestClient(object):
                  build_interval=1, build_timeout=60,
                  disable_ssl_certificate_validation=False, ca_certs=None,
                  trace_requests='', name=None, http_timeout=None,
-                 proxy_url=None, follow_redirects=True):
+                 proxy_url=None, follow_redirects=True, keep_alive=False,
+                 pool_maxsize=None, shared_http_pool=False,
+                 validation_policy=VALIDATE_ALWAYS, request_log_file=None,
+                 polling_policy=None):
         self.auth_provider = auth_provider
         self.service = service
         self.region = region
@@ -92,9 +184,15 @@ class RestClient(object):
         self.endpoint_type = endpoint_type
         self.build_interval = build_interval
         self.build_timeout = build_timeout
+        self.polling_policy = polling_policy or polling.PollingPolicy()
         self.trace_requests = trace_requests
+        self.request_log_sink = None
+        if request_log_file:
+            self.request_log_sink = request_log.get_sink(request_log_file)
 
         self._skip_path = False
+        # Default headers per accept and send types, see get_headers
+        self._headers_templates = {}
         self.general_header_lc = set(('cache-control', 'connection',
                                       'date', 'pragma', 'trailer',
                                       'transfer-encoding', 'via',
@@ -104,18 +202,33 @@ class RestClient(object):
                                        'retry-after', 'server',
                                        'vary', 'www-authenticate'))
         self.dscv = disable_ssl_certificate_validation
-
-        if proxy_url:
+        self.validation_policy = ValidationPolicy(validation_policy)
+        if self.validation_policy.name != VALIDATE_ALWAYS:
+            # NOTE: validate_response is a class method, which is also
+            # called on the class itself. The instance attribute shadows it
+            # only for the calls made through this client.
+            self.validate_response = self._validate_response_by_policy
+
+        if shared_http_pool:
+            self.http_obj = http.SharedHttpRegistry().get_http(
+                proxy_url=proxy_url,
+                disable_ssl_certificate_validation=self.dscv,
+                ca_certs=ca_certs,
+                timeout=http_timeout, follow_redirects=follow_redirects,
+                keep_alive=keep_alive, pool_maxsize=pool_maxsize)
+        elif proxy_url:
             self.http_obj = http.ClosingProxyHttp(
                 proxy_url,
                 disable_ssl_certificate_validation=self.dscv,
                 ca_certs=ca_certs,
-                timeout=http_timeout, follow_redirects=follow_redirects)
+                timeout=http_timeout, follow_redirects=follow_redirects,
+                keep_alive=keep_alive, pool_maxsize=pool_maxsize)
         else:
             self.http_obj = http.ClosingHttp(
                 disable_ssl_certificate_validation=self.dscv,
                 ca_certs=ca_certs,
-                timeout=http_timeout, follow_redirects=follow_redirects)
+                timeout=http_timeout, follow_redirects=follow_redirects,
+                keep_alive=keep_alive, pool_maxsize=pool_maxsize)
 
     def get_headers(self, accept_type=None, send_type=None):
         """Return the default headers which will be used with outgoing requests
@@ -134,10 +247,17 @@ class RestClient(object):
             accept_type = 'json'
         if send_type is None:
             send_type = 'json'
-        headers = {'Content-Type': 'application/%s' % send_type,
-                   'Accept': 'application/%s' % accept_type}
-        headers.update(profiler.serialize_as_http_headers())
-        return headers
+        # The headers only change with the profiler trace, so they are built
+        # once per trace and copied for each request
+        trace_id = profiler.trace_id()
+        template = self._headers_templates.get((accept_type, send_type))
+        if template is None or template[0] != trace_id:
+            headers = {'Content-Type': 'application/%s' % send_type,
+                       'Accept': 'application/%s' % accept_type}
+            headers.update(profiler.serialize_as_http_headers())
+            template = (trace_id, headers)
+            self._headers_templates[(accept_type, send_type)] = template
+        return dict(template[1])
 
     def __str__(self):
         STRING_LIMIT = 80
@@ -210,6 +330,15 @@ class RestClient(object):
         """
         return self.auth_provider.credentials.password
 
+    @property
+    def connection_stats(self):
+        """Counters of the HTTP connections opened and reused by the client
+
+        :rtype: tempest.lib.common.http.ConnectionStats
+        :return: The connection counters of the client http object
+        """
+        return self.http_obj.connection_stats
+
     @property
     def base_url(self):
         return self.auth_provider.base_url(filters=self.filters)
@@ -298,7 +427,7 @@ class RestClient(object):
         """
         return self.request('POST', url, extra_headers, headers, body, chunked)
 
-    def get(self, url, headers=None, extra_headers=False):
+    def get(self, url, headers=None, extra_headers=False, stream=False):
         """Send a HTTP GET request using keystone service catalog and auth
 
         :param str url: the relative url to send the get request to
@@ -307,11 +436,17 @@ class RestClient(object):
                                    returned by the get_headers() method are to
                                    be used but additional headers are needed in
                                    the request pass them in as a dict.
+        :param bool stream: Set to true to get the body of a successful
+                            response as a `tempest.lib.common.http.
+                            StreamingBody` instead of its content.
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
         :rtype: tuple
         """
-        return self.request('GET', url, extra_headers, headers)
+        # NOTE: stream is only passed when set, for the clients overriding
+        # request() without it.
+        kwargs = {'stream': True} if stream else {}
+        return self.request('GET', url, extra_headers, headers, **kwargs)
 
     def delete(self, url, headers=None, body=None, extra_headers=False):
         """Send a HTTP DELETE request using keystone service catalog and auth
@@ -427,21 +562,28 @@ class RestClient(object):
             return text
 
     def _log_request_start(self, method, req_url):
+        if not self.trace_requests:
+            return
         caller_name = test_utils.find_test_caller()
-        if self.trace_requests and re.search(self.trace_requests, caller_name):
+        if re.search(self.trace_requests, caller_name):
             self.LOG.debug('Starting Request (%s): %s %s', caller_name,
                            method, req_url)
 
+    @staticmethod
+    def _hide_tokens(headers, names):
+        # Only copy the headers when there is a token to hide
+        hidden = [name for name in names if name in headers]
+        if not hidden:
+            return headers
+        headers = headers.copy()
+        for name in hidden:
+            headers[name] = '<omitted>'
+        return headers
+
     def _log_request_full(self, resp, req_headers=None, req_body=None,
                           resp_body=None, extra=None):
-        if 'X-Auth-Token' in req_headers:
-            req_headers['X-Auth-Token'] = '<omitted>'
-        if 'X-Subject-Token' in req_headers:
-            req_headers['X-Subject-Token'] = '<omitted>'
-        # A shallow copy is sufficient
-        resp_log = resp.copy()
-        if 'x-subject-token' in resp_log:
-            resp_log['x-subject-token'] = '<omitted>'
+        # NOTE: the arguments are only rendered if the record is emitted by
+        # a handler, the request and response bodies can be large.
         log_fmt = """Request - Headers: %s
         Body: %s
     Response - Headers: %s
@@ -449,15 +591,29 @@ class RestClient(object):
 
         self.LOG.debug(
             log_fmt,
-            str(req_headers),
-            self._safe_body(req_body),
-            str(resp_log),
-            self._safe_body(resp_body),
+            request_log.DeferredStr(self._hide_tokens, req_headers,
+                                    ('X-Auth-Token', 'X-Subject-Token')),
+            request_log.DeferredStr(self._safe_body, req_body),
+            request_log.DeferredStr(self._hide_tokens, resp,
+                                    ('x-subject-token',)),
+            request_log.DeferredStr(self._safe_body, resp_body),
             extra=extra)
 
     def _log_request(self, method, req_url, resp,
                      secs="", req_headers=None,
                      req_body=None, resp_body=None):
+        if self.request_log_sink is not None:
+            self.request_log_sink.write({
+                'time': time.time(),
+                'caller': test_utils.find_test_caller(),
+                'service': self.service,
+                'method': method,
+                'url': req_url,
+                'status': resp['status'],
+                'secs': round(secs, 6) if secs else None,
+                'request_id': self._get_request_id(resp)})
+        if not self.LOG.isEnabledFor(logging.INFO):
+            return
         if req_headers is None:
             req_headers = {}
         # if we have the request id, put it in the right part of the log
@@ -468,15 +624,22 @@ class RestClient(object):
         # Once we're down to 1 caller, clean this up.
         caller_name = test_utils.find_test_caller()
         if secs:
-            secs = " %.3fs" % secs
-        self.LOG.info(
-            'Request (%s): %s %s %s%s',
-            caller_name,
-            resp['status'],
-            method,
-            req_url,
-            secs,
-            extra=extra)
+            self.LOG.info(
+                'Request (%s): %s %s %s %.3fs',
+                caller_name,
+                resp['status'],
+                method,
+                req_url,
+                secs,
+                extra=extra)
+        else:
+            self.LOG.info(
+                'Request (%s): %s %s %s',
+                caller_name,
+                resp['status'],
+                method,
+                req_url,
+                extra=extra)
 
         # Also look everything at DEBUG if you want to filter this
         # out, don't run at debug.
@@ -557,7 +720,8 @@ class RestClient(object):
         if method != 'HEAD' and not resp_body and resp.status >= 400:
             self.LOG.warning("status >= 400 response with empty body")
 
-    def _request(self, method, url, headers=None, body=None, chunked=False):
+    def _request(self, method, url, headers=None, body=None, chunked=False,
+                 stream=False):
         """A simple HTTP request interface."""
         # Authenticate the request with the auth provider
         req_url, req_headers, req_body = self.auth_provider.auth_request(
@@ -565,7 +729,7 @@ class RestClient(object):
 
         resp, resp_body = self.raw_request(
             req_url, method, headers=req_headers, body=req_body,
-            chunked=chunked
+            chunked=chunked, stream=stream
         )
         # Verify HTTP response codes
         self.response_checker(method, resp, resp_body)
@@ -573,7 +737,7 @@ class RestClient(object):
         return resp, resp_body
 
     def raw_request(self, url, method, headers=None, body=None, chunked=False,
-                    log_req_body=None):
+                    log_req_body=None, stream=False):
         """Send a raw HTTP request without the keystone catalog or auth
 
         This method sends a HTTP request in the same manner as the request()
@@ -594,18 +758,25 @@ class RestClient(object):
                                  body is safe to log otherwise pass any string
                                  you want to log in place of request body.
                                  For example: '<omitted>'
+        :param bool stream: Set to true to get the body of a successful
+                            response as a `tempest.lib.common.http.
+                            StreamingBody`, read from the connection on
+                            demand, instead of its content.
         :rtype: tuple
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
         """
         if headers is None:
             headers = self.get_headers()
+        # NOTE: stream is only passed when set, so that HTTP objects which
+        # do not support it can still be used for the other requests.
+        kwargs = {'stream': True} if stream else {}
         # Do the actual request, and time it
         start = time.time()
         self._log_request_start(method, url)
         resp, resp_body = self.http_obj.request(
             url, method, headers=headers,
-            body=body, chunked=chunked)
+            body=body, chunked=chunked, **kwargs)
         end = time.time()
         req_body = body if log_req_body is None else log_req_body
         self._log_request(method, url, resp, secs=(end - start),
@@ -614,7 +785,7 @@ class RestClient(object):
         return resp, resp_body
 
     def request(self, method, url, extra_headers=False, headers=None,
-                body=None, chunked=False):
+                body=None, chunked=False, stream=False):
         """Send a HTTP request with keystone auth and using the catalog
 
         This method will send an HTTP request using keystone auth in the
@@ -641,6 +812,9 @@ class RestClient(object):
                              explicitly requires no headers use an empty dict.
         :param str body: Body to send with the request
         :param bool chunked: sends the body with chunked encoding
+        :param bool stream: Set to true to get the body of a successful
+                            response as a `tempest.lib.common.http.
+                            StreamingBody` instead of its content.
         :rtype: tuple
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
@@ -685,7 +859,8 @@ class RestClient(object):
                 headers = self.get_headers()
 
         resp, resp_body = self._request(method, url, headers=headers,
-                                        body=body, chunked=chunked)
+                                        body=body, chunked=chunked,
+                                        stream=stream)
 
         while (resp.status == 413 and
                'retry-after' in resp and
@@ -699,10 +874,68 @@ class RestClient(object):
             )
             time.sleep(delay)
             resp, resp_body = self._request(method, url,
-                                            headers=headers, body=body)
+                                            headers=headers, body=body,
+                                            stream=stream)
         self._error_checker(resp, resp_body)
         return resp, resp_body
 
+    def map_requests(self, requests, max_workers=MAP_REQUESTS_MAX_WORKERS,
+                     return_exceptions=False):
+        """Send independent HTTP requests concurrently
+
+        Each request is sent with `request`, so it is authenticated, checked
+        and retried on rate limiting as any other request, from a pool of
+        threads. The current test is propagated to the threads, so that the
+        requests are attributed to it in the logs.
+
+        Example::
+
+            results = client.map_requests(
+                [('DELETE', 'servers/%s' % server_id)
+                 for server_id in server_ids], max_workers=5)
+
+        :param requests: The requests to send, each one as a tuple of the
+                         HTTP verb and the relative url, optionally followed
+                         by a dict of the other keyword arguments of
+                         `request` (headers, body, extra_headers...)
+        :param int max_workers: The maximum number of requests sent at the
+                                same time
+        :param bool return_exceptions: Set to true to return the exception
+                                       raised by a request in place of its
+                                       result, instead of raising them.
+        :rtype: list
+        :return: The (response headers, response body) tuple of each
+                 request, in the order of the requests
+        :raises MultipleExceptions: If some requests failed and
+                                    return_exceptions is not set, once all
+                                    the requests are done
+        """
+        requests = list(requests)
+        if not requests:
+            return []
+        max_workers = max(1, min(max_workers, len(requests)))
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # NOTE: A context can only be entered by one thread at a time, so
+            # each request runs in its own copy of the caller context.
+            pending = [executor.submit(contextvars.copy_context().run,
+                                       self._map_request, *request)
+                       for request in requests]
+        results = []
+        errors = []
+        for future in pending:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                if not return_exceptions:
+                    errors.append(sys.exc_info())
+                results.append(exc)
+        if errors:
+            raise testtools.MultipleExceptions(*errors)
+        return results
+
+    def _map_request(self, method, url, kwargs=None):
+        return self.request(method, url, **(kwargs or {}))
+
     def _get_retry_after_delay(self, resp):
         """Extract the delay from the retry-after header.
 
@@ -900,11 +1133,12 @@ class RestClient(object):
         :raises TimeoutException: If the build_timeout has elapsed and the
                                   resource still hasn't been deleted
         """
+        poller = polling.start_polling(self)
         start_time = int(time.time())
         while True:
             if self.is_resource_deleted(id, *args, **kwargs):
                 return
-            if int(time.time()) - start_time >= self.build_timeout:
+            if poller.expired:
                 message = ('Failed to delete %(resource_type)s %(id)s within '
                            'the required time (%(timeout)s s). Timer started '
                            'at %(start_time)s. Timer ended at %(end_time)s. '
@@ -913,12 +1147,12 @@ class RestClient(object):
                             'timeout': self.build_timeout,
                             'start_time': start_time,
                             'end_time': int(time.time()),
-                            'wait_time': int(time.time()) - start_time})
+                            'wait_time': int(poller.elapsed)})
                 caller = test_utils.find_test_caller()
                 if caller:
                     message = '(%s) %s' % (caller, message)
                 raise exceptions.TimeoutException(message)
-            time.sleep(self.build_interval)
+            poller.sleep()
 
     def wait_for_resource_activation(self, id):
         """Waits for a resource to become active
@@ -931,11 +1165,11 @@ class RestClient(object):
         :raises TimeoutException: If the build_timeout has elapsed and the
                                   resource still hasn't been active
         """
-        start_time = int(time.time())
+        poller = polling.start_polling(self)
         while True:
             if self.is_resource_active(id):
                 return
-            if int(time.time()) - start_time >= self.build_timeout:
+            if poller.expired:
                 message = ('Failed to reach active state %(resource_type)s '
                            '%(id)s within the required time (%(timeout)s s).' %
                            {'resource_type': self.resource_type, 'id': id,
@@ -944,7 +1178,7 @@ class RestClient(object):
                 if caller:
                     message = '(%s) %s' % (caller, message)
                 raise exceptions.TimeoutException(message)
-            time.sleep(self.build_interval)
+            poller.sleep()
 
     def is_resource_deleted(self, id):
         """Subclasses override with specific deletion detection."""
@@ -977,9 +1211,9 @@ class RestClient(object):
             body_schema = schema.get('response_body')
             if body_schema:
                 try:
-                    jsonschema.validate(body, body_schema,
-                                        cls=JSONSCHEMA_VALIDATOR,
-                                        format_checker=FORMAT_CHECKER)
+                    jsonschema_validator.validate(
+                        body, body_schema, cls=JSONSCHEMA_VALIDATOR,
+                        format_checker=FORMAT_CHECKER)
                 except jsonschema.ValidationError as ex:
                     msg = ("HTTP response body is invalid (%s)" % ex)
                     raise exceptions.InvalidHTTPResponseBody(msg)
@@ -992,13 +1226,19 @@ class RestClient(object):
             header_schema = schema.get('response_header')
             if header_schema:
                 try:
-                    jsonschema.validate(resp, header_schema,
-                                        cls=JSONSCHEMA_VALIDATOR,
-                                        format_checker=FORMAT_CHECKER)
+                    jsonschema_validator.validate(
+                        resp, header_schema, cls=JSONSCHEMA_VALIDATOR,
+                        format_checker=FORMAT_CHECKER)
                 except jsonschema.ValidationError as ex:
                     msg = ("HTTP response header is invalid (%s)" % ex)
                     raise exceptions.InvalidHTTPResponseHeader(msg)
 
+    def _validate_response_by_policy(self, schema, resp, body):
+        if self.validation_policy.should_validate(schema):
+            type(self).validate_response(schema, resp, body)
+        elif resp.status in HTTP_SUCCESS + HTTP_REDIRECTION:
+            self.expected_success(schema['status_code'], resp.status)
+
     def _get_base_version_url(self):
         # TODO(oomichi): This method can be used for auth's replace_version().
         # So it is nice to have common logic for the maintenance.
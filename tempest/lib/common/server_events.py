@@ -0,0 +1,129 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import abc
+import os
+import time
+
+from oslo_log import log as logging
+from oslo_serialization import jsonutils as json
+
+LOG = logging.getLogger(__name__)
+
+
+class ServerEventSource(object, metaclass=abc.ABCMeta):
+    """Source of the events about the state changes of servers
+
+    Waiters watch a server with an event source, to check the server when
+    an event about it arrives instead of polling it on a fixed interval.
+    """
+
+    @abc.abstractmethod
+    def watch(self, server_id):
+        """Start watching the events about a server
+
+        Events which arrive after the call are reported by the watcher, so
+        that the server must be checked after starting to watch it.
+
+        :param server_id: ID of the server
+        :return: A `ServerWatcher`
+        """
+        return
+
+
+class ServerWatcher(object, metaclass=abc.ABCMeta):
+    """Reports the events about a server"""
+
+    @abc.abstractmethod
+    def wait(self, timeout):
+        """Wait for an event about the server
+
+        :param timeout: Time in seconds to wait for an event
+        :return: True if an event arrived, False on timeout
+        """
+        return
+
+    def close(self):
+        """Stop watching the server"""
+
+
+def _get_event_server_id(event):
+    payload = event.get('payload')
+    if not isinstance(payload, dict):
+        return None
+    data = payload.get('nova_object.data', payload)
+    return data.get('uuid') or data.get('instance_id')
+
+
+class FileServerEventSource(ServerEventSource):
+    """Events read from a file of versioned notifications
+
+    A notification listener of the deployment, or a test, appends the
+    versioned notifications of the Compute service to the file, one JSON
+    document per line. The file is read locally, every `interval` seconds,
+    which doesn't cost any API request.
+
+    :param str path: Path of the file of notifications
+    :param float interval: Time in seconds between the reads of the file
+    """
+
+    def __init__(self, path, interval=0.1):
+        self.path = path
+        self.interval = interval
+
+    def watch(self, server_id):
+        return _FileServerWatcher(self, server_id)
+
+
+class _FileServerWatcher(ServerWatcher):
+
+    def __init__(self, source, server_id):
+        self.source = source
+        self.server_id = server_id
+        try:
+            self.offset = os.path.getsize(source.path)
+        except OSError:
+            self.offset = 0
+
+    def _read_events(self):
+        try:
+            with open(self.source.path, 'rb') as events_file:
+                if os.fstat(events_file.fileno()).st_size < self.offset:
+                    # NOTE: The file was truncated or rotated
+                    self.offset = 0
+                events_file.seek(self.offset)
+                data = events_file.read()
+        except OSError:
+            return False
+        # NOTE: A partially written line is read on the next call
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        found = False
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                LOG.debug('Skipping invalid server event %r', line)
+                continue
+            if (isinstance(event, dict) and
+                    _get_event_server_id(event) == self.server_id):
+                found = True
+        return found
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self._read_events():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.source.interval, remaining))
+        return True
@@ -12,6 +12,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import contextvars
 import inspect
 import re
 import time
@@ -22,15 +23,42 @@ from tempest.lib import exceptions
 
 LOG = logging.getLogger(__name__)
 
+# The test fixture or test currently running, as "ClassName:method". It is
+# set by the test base class, so that find_test_caller does not need to walk
+# the stack on every API request.
+_current_test = contextvars.ContextVar('tempest_current_test', default=None)
+
+
+def set_current_test(caller_name):
+    """Set the test fixture or test currently running
+
+    :param str caller_name: The caller name, as "ClassName:method"
+    :return: A token which can be passed to `reset_current_test`
+    """
+    return _current_test.set(caller_name)
+
+
+def reset_current_test(token):
+    """Restore the current test to its value before `set_current_test`"""
+    _current_test.reset(token)
+
 
 def find_test_caller():
     """Find the caller class and test name.
 
-    Because we know that the interesting things that call us are
-    test_* methods, and various kinds of setUp / tearDown, we
-    can look through the call stack to find appropriate methods,
-    and the class we were in when those were called.
+    If the test currently running was recorded with `set_current_test`, it is
+    returned directly. Otherwise, because we know that the interesting things
+    that call us are test_* methods, and various kinds of setUp / tearDown, we
+    can look through the call stack to find appropriate methods, and the
+    class we were in when those were called.
     """
+    caller_name = _current_test.get()
+    if caller_name is not None:
+        return caller_name
+    return _find_test_caller_in_stack()
+
+
+def _find_test_caller_in_stack():
     caller_name = None
     names = []
     frame = inspect.currentframe()
@@ -258,7 +258,8 @@ class ServiceClients(object):
     @removals.removed_kwarg('client_parameters')
     def __init__(self, credentials, identity_uri, region=None, scope=None,
                  disable_ssl_certificate_validation=True, ca_certs=None,
-                 trace_requests='', client_parameters=None, proxy_url=None):
+                 trace_requests='', client_parameters=None, proxy_url=None,
+                 token_cache=None, background_token_refresh=False):
         """Service Clients provider
 
         Instantiate a `ServiceClients` object, from a set of credentials and an
@@ -320,6 +321,10 @@ class ServiceClients(object):
             going to be passed to all clients in the service client module.
         :param proxy_url: Applies to auth and to all service clients, set a
             proxy url for the clients to use.
+        :param token_cache: An `auth.FileTokenCache` shared by the processes
+            using the same credentials, or None to always request new tokens.
+        :param background_token_refresh: Whether the auth provider refreshes
+            its token in a background thread before it expires.
         """
         self._registered_services = set([])
         self.credentials = credentials
@@ -360,7 +365,8 @@ class ServiceClients(object):
             self.credentials, self.identity_uri, scope=scope,
             disable_ssl_certificate_validation=self.dscv,
             ca_certs=self.ca_certs, trace_requests=self.trace_requests,
-            proxy_url=proxy_url)
+            proxy_url=proxy_url, token_cache=token_cache,
+            background_refresh=background_token_refresh)
 
         # Setup some defaults for client parameters of registered services
         client_parameters = client_parameters or {}
@@ -42,11 +42,13 @@ from tempest.lib.api_schema.response.compute.v2_73 import servers as schemav273
 from tempest.lib.api_schema.response.compute.v2_79 import servers as schemav279
 from tempest.lib.api_schema.response.compute.v2_8 import servers as schemav28
 from tempest.lib.api_schema.response.compute.v2_9 import servers as schemav29
+from tempest.lib.common import async_rest_client
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
 
-class ServersClient(base_compute_client.BaseComputeClient):
+class ServersClient(async_rest_client.AsyncClientMixin,
+                    base_compute_client.BaseComputeClient):
     """Service client for the resource /servers"""
 
     schema_versions_info = [
@@ -18,6 +18,7 @@ from urllib import parse as urllib
 
 from oslo_serialization import jsonutils as json
 
+from tempest.lib.common import http
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions as lib_exc
 
@@ -150,6 +151,19 @@ class ImagesClient(rest_client.RestClient):
         """Returns the primary type of resource this client works with."""
         return 'image'
 
+    def _upload_image_data(self, url, data):
+        headers = {'Content-Type': 'application/octet-stream'}
+        with http.file_body(data) as body:
+            if body is not None:
+                # The size of the data is known, send it as is
+                headers['Content-Length'] = str(body.nbytes)
+                return self.request('PUT', url, headers=headers, body=body)
+        # We are going to do chunked transfer, so split the input data
+        # info fixed-sized chunks.
+        data = iter(functools.partial(data.read, CHUNKSIZE), b'')
+        return self.request('PUT', url, headers=headers,
+                            body=data, chunked=True)
+
     def store_image_file(self, image_id, data):
         """Upload binary image data.
 
@@ -158,14 +172,7 @@ class ImagesClient(rest_client.RestClient):
         https://docs.openstack.org/api-ref/image/v2/#upload-binary-image-data
         """
         url = 'images/%s/file' % image_id
-
-        # We are going to do chunked transfert, so split the input data
-        # info fixed-sized chunks.
-        headers = {'Content-Type': 'application/octet-stream'}
-        data = iter(functools.partial(data.read, CHUNKSIZE), b'')
-
-        resp, body = self.request('PUT', url, headers=headers,
-                                  body=data, chunked=True)
+        resp, body = self._upload_image_data(url, data)
         self.expected_success(204, resp.status)
         return rest_client.ResponseBody(resp, body)
 
@@ -177,14 +184,7 @@ class ImagesClient(rest_client.RestClient):
         https://docs.openstack.org/api-ref/image/v2/#interoperable-image-import
         """
         url = 'images/%s/stage' % image_id
-
-        # We are going to do chunked transfer, so split the input data
-        # info fixed-sized chunks.
-        headers = {'Content-Type': 'application/octet-stream'}
-        data = iter(functools.partial(data.read, CHUNKSIZE), b'')
-
-        resp, body = self.request('PUT', url, headers=headers,
-                                  body=data, chunked=True)
+        resp, body = self._upload_image_data(url, data)
         self.expected_success(204, resp.status)
         return rest_client.ResponseBody(resp, body)
 
@@ -246,15 +246,19 @@ class ImagesClient(rest_client.RestClient):
         self.expected_success(202, resp.status)
         return rest_client.ResponseBody(resp)
 
-    def show_image_file(self, image_id):
+    def show_image_file(self, image_id, stream=False):
         """Download binary image data.
 
         For a full list of available parameters, please refer to the official
         API reference:
         https://docs.openstack.org/api-ref/image/v2/#download-binary-image-data
+
+        :param bool stream: Set to true to get the image data as a
+                            `tempest.lib.common.http.StreamingBody`, read
+                            from the connection on demand, instead of bytes.
         """
         url = 'images/%s/file' % image_id
-        resp, body = self.get(url)
+        resp, body = self.get(url, stream=stream)
         self.expected_success([200, 204, 206], resp.status)
         return rest_client.ResponseBodyData(resp, body)
 
@@ -17,6 +17,7 @@ import ssl
 from http import client as httplib
 from urllib import parse as urlparse
 
+from tempest.lib.common import http
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions
 
@@ -35,7 +36,11 @@ class ObjectClient(rest_client.RestClient):
     def create_object(self, container, object_name, data,
                       params=None, metadata=None, headers=None,
                       chunked=False):
-        """Create storage object."""
+        """Create storage object.
+
+        When data is a regular or in-memory file and chunked is not set, its
+        content is sent without being copied, with a Content-Length header.
+        """
 
         if headers is None:
             headers = self.get_headers()
@@ -48,7 +53,14 @@ class ObjectClient(rest_client.RestClient):
         if params:
             url += '?%s' % urlparse.urlencode(params)
 
-        resp, body = self.put(url, data, headers, chunked=chunked)
+        if chunked or not hasattr(data, 'read'):
+            resp, body = self.put(url, data, headers, chunked=chunked)
+        else:
+            with http.file_body(data) as file_body:
+                if file_body is not None:
+                    headers['content-length'] = str(file_body.nbytes)
+                    data = file_body
+                resp, body = self.put(url, data, headers)
         self.expected_success(201, resp.status)
         return resp, body
 
@@ -81,8 +93,14 @@ class ObjectClient(rest_client.RestClient):
         self.expected_success(200, resp.status)
         return resp, body
 
-    def get_object(self, container, object_name, metadata=None, params=None):
-        """Retrieve object's data."""
+    def get_object(self, container, object_name, metadata=None, params=None,
+                   stream=False):
+        """Retrieve object's data.
+
+        :param bool stream: Set to true to get the object data as a
+                            `tempest.lib.common.http.StreamingBody`, read
+                            from the connection on demand, instead of bytes.
+        """
 
         headers = {}
         if metadata:
@@ -92,7 +110,7 @@ class ObjectClient(rest_client.RestClient):
         url = "{0}/{1}".format(container, object_name)
         if params:
             url += '?%s' % urlparse.urlencode(params)
-        resp, body = self.get(url, headers=headers)
+        resp, body = self.get(url, headers=headers, stream=stream)
         self.expected_success([200, 206], resp.status)
         return resp, body
 
@@ -17,13 +17,12 @@
 import os
 import subprocess
 
-import netaddr
-
 from oslo_log import log
 from oslo_serialization import jsonutils as json
 from oslo_utils import netutils
 
 from tempest.common import compute
+from tempest.common import credentials_factory
 from tempest.common import image as common_image
 from tempest.common.utils.linux import remote_client
 from tempest.common.utils import net_utils
@@ -1308,27 +1307,27 @@ class NetworkScenarioTest(ScenarioTest):
         ip_version = kwargs.pop('ip_version', 4)
 
         if not use_default_subnetpool:
-
-            if ip_version == 6:
-                tenant_cidr = netaddr.IPNetwork(
-                    CONF.network.project_network_v6_cidr)
-                num_bits = CONF.network.project_network_v6_mask_bits
-            else:
-                tenant_cidr = netaddr.IPNetwork(
-                    CONF.network.project_network_cidr)
-                num_bits = CONF.network.project_network_mask_bits
-
-        # Repeatedly attempt subnet creation with sequential cidr
-        # blocks until an unallocated block is found.
-            for subnet_cidr in tenant_cidr.subnet(num_bits):
-                str_cidr = str(subnet_cidr)
+            allocator = credentials_factory.get_project_cidr_allocator(
+                ip_version)
+
+            # Attempt subnet creation with the cidr blocks which are not
+            # allocated to the other test processes, until a block unused
+            # outside of the test run is found. The blocks in use are kept
+            # allocated, so they are not tried again.
+            for str_cidr in iter(allocator.allocate, None):
                 if cidr_in_use(str_cidr, project_id=network['project_id']):
                     continue
-                result = _make_create_subnet_request(
-                    namestart, network, ip_version, subnets_client,
-                    cidr=str_cidr, **kwargs)
+                try:
+                    result = _make_create_subnet_request(
+                        namestart, network, ip_version, subnets_client,
+                        cidr=str_cidr, **kwargs)
+                except Exception:
+                    allocator.release(str_cidr)
+                    raise
 
                 if result is not None:
+                    # Released after the deletion of the subnet
+                    self.addCleanup(allocator.release, str_cidr)
                     break
 
         else:
@@ -30,9 +30,11 @@ from tempest.lib import base as lib_base
 from tempest.lib.common import api_microversion_fixture
 from tempest.lib.common import fixed_network
 from tempest.lib.common import profiler
+from tempest.lib.common.utils import test_utils
 from tempest.lib.common import validation_resources as vr
 from tempest.lib import decorators
 from tempest.lib import exceptions as lib_exc
+from tempest.lib.services import clients as lib_clients
 
 LOG = logging.getLogger(__name__)
 
@@ -139,6 +141,10 @@ class BaseTestCase(testtools.testcase.WithAttributes,
         cls.__setupclass_called = True
         # Reset state
         cls._reset_class()
+        # Record the running fixture, so that API requests can be attributed
+        # to it without walking the stack
+        cls._current_test_token = test_utils.set_current_test(
+            cls.__name__ + ':setUpClass')
         # It should never be overridden by descendants
         if hasattr(super(BaseTestCase, cls), 'setUpClass'):
             super(BaseTestCase, cls).setUpClass()
@@ -191,6 +197,9 @@ class BaseTestCase(testtools.testcase.WithAttributes,
         if CONF.pause_teardown:
             cls.insert_pdb_breakpoint()
         at_exit_set.discard(cls)
+        token = test_utils.set_current_test(cls.__name__ + ':tearDownClass')
+        if cls.__dict__.get('_current_test_token') is None:
+            cls._current_test_token = token
         # It should never be overridden by descendants
         if hasattr(super(BaseTestCase, cls), 'tearDownClass'):
             super(BaseTestCase, cls).tearDownClass()
@@ -229,6 +238,7 @@ class BaseTestCase(testtools.testcase.WithAttributes,
                     LOG.exception("teardown of %s failed: %s", name, te)
                 if not etype:
                     etype, value, trace = sys_exec_info
+        cls._reset_current_test()
         # If exceptions were raised during teardown, and not before, re-raise
         # the first one
         if re_raise and etype is not None:
@@ -237,7 +247,18 @@ class BaseTestCase(testtools.testcase.WithAttributes,
             finally:
                 del trace  # to avoid circular refs
 
+    @classmethod
+    def _reset_current_test(cls):
+        token = cls.__dict__.get('_current_test_token')
+        if token is not None:
+            cls._current_test_token = None
+            test_utils.reset_current_test(token)
+
     def tearDown(self):
+        test_utils.set_current_test(self.__class__.__name__ + ':tearDown')
+        # Cleanups run after tearDown, the last one added runs first
+        self.addCleanup(test_utils.set_current_test,
+                        self.__class__.__name__ + ':_run_cleanups')
         super(BaseTestCase, self).tearDown()
         # insert pdb breakpoint when pause_teardown is enabled
         if CONF.pause_teardown:
@@ -380,6 +401,13 @@ class BaseTestCase(testtools.testcase.WithAttributes,
                     pass
         """
         cls.__setup_credentials_called = True
+        # The credentials of the types below may be provisioned concurrently
+        credentials_types = [credentials_type for credentials_type in
+                             cls.credentials if isinstance(credentials_type,
+                                                           str)]
+        if len(set(credentials_types)) > 1:
+            cls._get_credentials_provider().provision_credentials(
+                credentials_types)
         for credentials_type in cls.credentials:
             # This may raise an exception in case credentials are not available
             # In that case we want to let the exception through and the test
@@ -640,6 +668,11 @@ class BaseTestCase(testtools.testcase.WithAttributes,
             raise RuntimeError("setUpClass does not calls the super's "
                                "setUpClass in the " +
                                self.__class__.__name__)
+        # API requests made from here on, including the ones made by the
+        # setUp of subclasses, are attributed to the test method
+        self.addCleanup(test_utils.reset_current_test,
+                        test_utils.set_current_test('%s:%s' % (
+                            self.__class__.__name__, self._testMethodName)))
         at_exit_set.add(self.__class__)
         test_timeout = os.environ.get('OS_TEST_TIMEOUT', 0)
         try:
@@ -743,6 +776,14 @@ class BaseTestCase(testtools.testcase.WithAttributes,
     @classmethod
     def clear_credentials(cls):
         """Clears creds if set"""
+        # Stop the background token refresh of the client managers of the
+        # class, their credentials are not used anymore
+        for manager in list(vars(cls).values()):
+            if isinstance(manager, lib_clients.ServiceClients):
+                cancel_refresh = getattr(manager.auth_provider,
+                                         'cancel_refresh', None)
+                if cancel_refresh is not None:
+                    cancel_refresh()
         if hasattr(cls, '_creds_provider'):
             cls._creds_provider.clear_creds()
 
@@ -0,0 +1,151 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from oslo_serialization import jsonutils as json
+
+from tempest.api.object_storage import base as object_storage_base
+from tempest.lib.common import rest_client
+from tempest.lib import exceptions as lib_exc
+from tempest.lib.services.object_storage import bulk_middleware_client
+from tempest.lib.services.object_storage import container_client
+from tempest.lib.services.object_storage import object_client
+from tempest.tests import base
+
+
+class TestDeleteContainers(base.TestCase):
+    """Unit tests for the delete_containers cleanup function."""
+
+    def setUp(self):
+        super(TestDeleteContainers, self).setUp()
+        self.patch('time.sleep')
+        self.container_client = mock.Mock(
+            spec=container_client.ContainerClient,
+            build_timeout=10, build_interval=1)
+        self.object_client = mock.Mock(spec=object_client.ObjectClient)
+        self.object_client.map_requests.side_effect = (
+            lambda requests, **kwargs: [(None, b'') for _ in requests])
+        self.bulk_client = mock.Mock(
+            spec=bulk_middleware_client.BulkMiddlewareClient)
+
+    def _listings(self, *listings):
+        self.container_client.list_container_objects.side_effect = [
+            (None, [{'name': name} for name in listing])
+            for listing in listings]
+
+    def _bulk_report(self, errors=()):
+        self.bulk_client.delete_bulk_data.return_value = (
+            rest_client.ResponseBodyData({}, json.dumps({
+                'Number Deleted': 2, 'Errors': list(errors)})))
+
+    def test_delete_containers(self):
+        self._listings(['a', 'b'], ['b'], [])
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client)
+        self.object_client.map_requests.assert_called_once_with(
+            [('DELETE', 'cont/a'), ('DELETE', 'cont/b')],
+            return_exceptions=True)
+        # The listing is checked until the deleted objects are not listed
+        self.assertEqual(
+            3, self.container_client.list_container_objects.call_count)
+        self.object_client.wait_for_resource_deletion.assert_not_called()
+        self.container_client.delete_container.assert_called_once_with(
+            'cont')
+
+    def test_delete_containers_empty(self):
+        self._listings([])
+        object_storage_base.delete_containers(
+            ['cont'], self.container_client, self.object_client,
+            self.bulk_client)
+        self.bulk_client.delete_bulk_data.assert_not_called()
+        self.object_client.map_requests.assert_not_called()
+        self.container_client.delete_container.assert_called_once_with(
+            'cont')
+
+    def test_delete_containers_not_found(self):
+        self._listings(['a', 'b'], [])
+        self.object_client.map_requests.side_effect = None
+        self.object_client.map_requests.return_value = [
+            lib_exc.NotFound(), (None, b'')]
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client)
+        self.container_client.delete_container.assert_called_once_with(
+            'cont')
+
+    def test_delete_containers_error(self):
+        self._listings(['a'])
+        self.object_client.map_requests.side_effect = None
+        self.object_client.map_requests.return_value = [
+            lib_exc.Conflict()]
+        self.assertRaises(lib_exc.Conflict,
+                          object_storage_base.delete_containers,
+                          'cont', self.container_client, self.object_client)
+        self.container_client.delete_container.assert_not_called()
+
+    def test_delete_containers_paginated(self):
+        self.patch('tempest.api.object_storage.base.LISTING_LIMIT', 2)
+        self._listings(['a', 'b'], ['c'], [])
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client)
+        self.container_client.list_container_objects.assert_has_calls([
+            mock.call('cont', {'limit': 2, 'format': 'json'}),
+            mock.call('cont', {'limit': 2, 'format': 'json',
+                               'marker': 'b'})])
+        self.object_client.map_requests.assert_called_once_with(
+            [('DELETE', 'cont/a'), ('DELETE', 'cont/b'),
+             ('DELETE', 'cont/c')], return_exceptions=True)
+
+    def test_delete_containers_bulk(self):
+        self._listings(['a', 'b c'], [])
+        self._bulk_report()
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client,
+            self.bulk_client)
+        self.bulk_client.delete_bulk_data.assert_called_once_with(
+            data='/cont/a\n/cont/b%20c',
+            headers={'Accept': 'application/json',
+                     'Content-Type': 'text/plain'})
+        self.object_client.map_requests.assert_not_called()
+        self.container_client.delete_container.assert_called_once_with(
+            'cont')
+
+    def test_delete_containers_bulk_errors(self):
+        self._listings(['a', 'b'], [])
+        self._bulk_report([['/cont/b', '409 Conflict']])
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client,
+            self.bulk_client)
+        # The objects which failed to be deleted are deleted one by one
+        self.object_client.map_requests.assert_called_once_with(
+            [('DELETE', 'cont/b')], return_exceptions=True)
+
+    def test_delete_containers_bulk_batches(self):
+        self.patch('tempest.api.object_storage.base.BULK_DELETE_MAX_OBJECTS',
+                   2)
+        self._listings(['a', 'b', 'c'], [])
+        self._bulk_report()
+        object_storage_base.delete_containers(
+            'cont', self.container_client, self.object_client,
+            self.bulk_client)
+        self.bulk_client.delete_bulk_data.assert_has_calls([
+            mock.call(data='/cont/a\n/cont/b', headers=mock.ANY),
+            mock.call(data='/cont/c', headers=mock.ANY)])
+
+    def test_delete_containers_container_not_found(self):
+        self.container_client.list_container_objects.side_effect = (
+            lib_exc.NotFound())
+        object_storage_base.delete_containers(
+            ['cont1', 'cont2'], self.container_client, self.object_client)
+        self.assertEqual(
+            2, self.container_client.list_container_objects.call_count)
+        self.container_client.delete_container.assert_not_called()
@@ -16,9 +16,18 @@ from unittest import mock
 
 from oslotest import base
 
+from tempest.lib.common.utils import test_utils
+
 
 class TestCase(base.BaseTestCase):
 
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # Tempest test classes set up by unit tests record themselves as the
+        # current test, make sure that does not leak into other unit tests
+        self.addCleanup(test_utils.reset_current_test,
+                        test_utils.set_current_test(None))
+
     def patch(self, target, *args, **kwargs):
         """Returns a started `mock.patch` object for the supplied target.
 
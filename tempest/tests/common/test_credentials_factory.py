@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
 from unittest import mock
 
 from oslo_config import cfg
@@ -116,7 +117,31 @@ class TestCredentialsFactory(base.TestCase):
             expected_identity_version)
         mock_dynamic_credentials_provider_class.assert_called_once_with(
             name=expected_name, network_resources=expected_network_resources,
-            **expected_params)
+            credentials_pool=None, **expected_params)
+
+    @mock.patch.object(atexit, 'register')
+    @mock.patch.object(dynamic_creds, 'DynamicCredentialProvider')
+    @mock.patch.object(cf, 'get_dynamic_provider_params')
+    def test_get_credentials_provider_dynamic_pool(
+            self, mock_dynamic_provider_params,
+            mock_dynamic_credentials_provider_class, mock_register):
+        self.patchobject(cf, '_dynamic_credentials_pool', None)
+        cfg.CONF.set_default('use_dynamic_credentials', True, group='auth')
+        cfg.CONF.set_default('dynamic_credentials_pool_size', 4,
+                             group='auth')
+        mock_dynamic_provider_params.return_value = {}
+        for _ in range(2):
+            cf.get_credentials_provider('my_name')
+        pools = [kwargs['credentials_pool'] for _, kwargs in
+                 mock_dynamic_credentials_provider_class.call_args_list]
+        self.assertIsInstance(pools[0], dynamic_creds.DynamicCredentialsPool)
+        self.assertEqual(4, pools[0].max_size)
+        self.assertIs(pools[0], pools[1])
+        mock_register.assert_called_once_with(pools[0].clear)
+        # Tests forcing isolation don't use the pool
+        cf.get_credentials_provider('my_name', force_tenant_isolation=True)
+        self.assertIsNone(mock_dynamic_credentials_provider_class.call_args[
+            1]['credentials_pool'])
 
     @mock.patch.object(preprov_creds, 'PreProvisionedCredentialProvider')
     @mock.patch.object(cf, 'get_preprov_provider_params')
@@ -168,7 +193,7 @@ class TestCredentialsFactory(base.TestCase):
             expected_identity_version)
         mock_dynamic_credentials_provider_class.assert_called_once_with(
             name=expected_name, network_resources=expected_network_resources,
-            **expected_params)
+            credentials_pool=None, **expected_params)
 
     @mock.patch.object(cf, 'get_credentials')
     def test_get_configured_admin_credentials(self, mock_get_credentials):
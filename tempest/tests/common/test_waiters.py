@@ -12,17 +12,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
 import time
 from unittest import mock
 
+import fixtures
+from oslo_config import cfg
+from oslo_serialization import jsonutils as json
 from oslo_utils.fixture import uuidsentinel as uuids
 
 from tempest.common import waiters
+from tempest import config
 from tempest import exceptions
+from tempest.lib.common import request_log
+from tempest.lib.common import rest_client
+from tempest.lib.common import server_events
 from tempest.lib import exceptions as lib_exc
 from tempest.lib.services.compute import servers_client
 from tempest.lib.services.volume.v2 import volumes_client
 from tempest.tests import base
+from tempest.tests import fake_config
 import tempest.tests.utils as utils
 
 
@@ -42,7 +51,7 @@ class TestImageWaiters(base.TestCase):
         self.assertLess((end_time - start_time), 10)
 
     def test_wait_for_image_status_timeout(self):
-        time_mock = self.patch('time.time')
+        time_mock = self.patch('time.monotonic')
         time_mock.side_effect = utils.generate_timeout_series(1)
 
         self.client.show_image.return_value = ({'status': 'saving'})
@@ -67,10 +76,10 @@ class TestImageWaiters(base.TestCase):
         self.assertLess((end_time - start_time), 10)
 
     def test_wait_for_image_imported_to_stores_failure(self):
-        time_mock = self.patch('time.time')
+        time_mock = self.patch('time.monotonic')
         client = mock.MagicMock()
         client.build_timeout = 2
-        self.patch('time.time', side_effect=[0., 1., 2.])
+        self.patch('time.monotonic', side_effect=[0., 1., 2.])
         time_mock.side_effect = utils.generate_timeout_series(1)
 
         client.show_image.return_value = ({
@@ -82,10 +91,10 @@ class TestImageWaiters(base.TestCase):
                           client, 'fake_image_id', 'fake_store')
 
     def test_wait_for_image_imported_to_stores_timeout(self):
-        time_mock = self.patch('time.time')
+        time_mock = self.patch('time.monotonic')
         client = mock.MagicMock()
         client.build_timeout = 2
-        self.patch('time.time', side_effect=[0., 1., 2.])
+        self.patch('time.monotonic', side_effect=[0., 1., 2.])
         time_mock.side_effect = utils.generate_timeout_series(1)
 
         client.show_image.return_value = ({
@@ -108,8 +117,8 @@ class TestImageWaiters(base.TestCase):
         self.assertLess((end_time - start_time), 10)
 
     def test_wait_for_image_copied_to_stores_timeout(self):
-        time_mock = self.patch('time.time')
-        self.patch('time.time', side_effect=[0., 1.])
+        time_mock = self.patch('time.monotonic')
+        self.patch('time.monotonic', side_effect=[0., 1.])
         time_mock.side_effect = utils.generate_timeout_series(1)
 
         self.client.show_image.return_value = ({
@@ -131,8 +140,8 @@ class TestImageWaiters(base.TestCase):
         self.assertLess((end_time - start_time), 10)
 
     def test_wait_for_image_tasks_status_timeout(self):
-        time_mock = self.patch('time.time')
-        self.patch('time.time', side_effect=[0., 1.])
+        time_mock = self.patch('time.monotonic')
+        self.patch('time.monotonic', side_effect=[0., 1.])
         time_mock.side_effect = utils.generate_timeout_series(1)
 
         self.client.show_image_tasks.return_value = ({
@@ -161,7 +170,7 @@ class TestInterfaceWaiters(base.TestCase):
         show_interface = mock.Mock(
             side_effect=[self.port_down, self.port_active])
         client = self.mock_client(show_interface=show_interface)
-        self.patch('time.time', return_value=0.)
+        self.patch('time.monotonic', return_value=0.)
         sleep = self.patch('time.sleep')
 
         result = waiters.wait_for_interface_status(
@@ -175,7 +184,8 @@ class TestInterfaceWaiters(base.TestCase):
     def test_wait_for_interface_status_timeout(self):
         show_interface = mock.MagicMock(return_value=self.port_down)
         client = self.mock_client(show_interface=show_interface)
-        self.patch('time.time', side_effect=[0., client.build_timeout + 1.])
+        self.patch('time.monotonic',
+                   side_effect=[0., client.build_timeout + 1.])
         sleep = self.patch('time.sleep')
 
         self.assertRaises(lib_exc.TimeoutException,
@@ -224,7 +234,7 @@ class TestInterfaceWaiters(base.TestCase):
             ]
         )
         client = self.mock_client(show_instance_action=show_instance_action)
-        self.patch('time.time', return_value=0.)
+        self.patch('time.monotonic', return_value=0.)
         sleep = self.patch('time.sleep')
 
         result = waiters.wait_for_interface_detach(
@@ -258,7 +268,8 @@ class TestInterfaceWaiters(base.TestCase):
         show_instance_action = mock.MagicMock(
             return_value=one_event_without_result)
         client = self.mock_client(show_instance_action=show_instance_action)
-        self.patch('time.time', side_effect=[0., client.build_timeout + 1.])
+        self.patch('time.monotonic',
+                   side_effect=[0., client.build_timeout + 1.])
         sleep = self.patch('time.sleep')
 
         self.assertRaises(
@@ -298,7 +309,8 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=1,
                            show_volume=show_volume)
-        self.patch('time.time', side_effect=[0., client.build_timeout + 1.])
+        self.patch('time.monotonic',
+                   side_effect=[0., client.build_timeout + 1.])
         self.patch('time.sleep')
         self.assertRaises(lib_exc.TimeoutException,
                           waiters.wait_for_volume_migration,
@@ -314,7 +326,7 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=1,
                            show_volume=show_volume)
-        self.patch('time.time', return_value=0.)
+        self.patch('time.monotonic', return_value=0.)
         self.patch('time.sleep')
         self.assertRaises(lib_exc.TempestException,
                           waiters.wait_for_volume_migration,
@@ -330,7 +342,7 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=1,
                            show_volume=show_volume)
-        self.patch('time.time', return_value=0.)
+        self.patch('time.monotonic', return_value=0.)
         self.patch('time.sleep')
         waiters.wait_for_volume_migration(
             client, mock.sentinel.volume_id, 'dst_host')
@@ -347,7 +359,8 @@ class TestVolumeWaiters(base.TestCase):
         # the volume status is 'error_restoring'.
         client = mock.Mock(spec=volumes_client.VolumesClient,
                            resource_type="volume",
-                           build_interval=1)
+                           build_interval=1,
+                           build_timeout=1)
         volume1 = {'volume': {'status': 'restoring-backup'}}
         volume2 = {'volume': {'status': 'error_restoring'}}
         mock_show = mock.Mock(side_effect=(volume1, volume2))
@@ -366,7 +379,8 @@ class TestVolumeWaiters(base.TestCase):
         # the volume status is 'error_extending'.
         client = mock.Mock(spec=volumes_client.VolumesClient,
                            resource_type="volume",
-                           build_interval=1)
+                           build_interval=1,
+                           build_timeout=1)
         volume1 = {'volume': {'status': 'extending'}}
         volume2 = {'volume': {'status': 'error_extending'}}
         mock_show = mock.Mock(side_effect=(volume1, volume2))
@@ -392,7 +406,7 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=5,
                            show_volume=show_volume)
-        self.patch('time.time')
+        self.patch('time.monotonic', return_value=0.)
         self.patch('time.sleep')
         att = waiters.wait_for_volume_attachment_create(
             client, uuids.volume_id, uuids.server_id)
@@ -412,7 +426,7 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=5,
                            show_volume=show_volume)
-        self.patch('time.time')
+        self.patch('time.monotonic', return_value=0.)
         self.patch('time.sleep')
         waiters.wait_for_volume_attachment_remove(client, uuids.volume_id,
                                                   uuids.attachment_id)
@@ -429,7 +443,8 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=1,
                            show_volume=show_volume)
-        self.patch('time.time', side_effect=[0., client.build_timeout + 1.])
+        self.patch('time.monotonic',
+                   side_effect=[0., client.build_timeout + 1.])
         self.patch('time.sleep')
         # Assert that a timeout is raised if the attachment remains.
         self.assertRaises(lib_exc.TimeoutException,
@@ -443,7 +458,8 @@ class TestVolumeWaiters(base.TestCase):
                            build_interval=1,
                            build_timeout=1,
                            show_volume=show_volume)
-        self.patch('time.time', side_effect=[0., client.build_timeout + 1.])
+        self.patch('time.monotonic',
+                   side_effect=[0., client.build_timeout + 1.])
         self.patch('time.sleep')
         waiters.wait_for_volume_attachment_remove(client, uuids.volume_id,
                                                   uuids.attachment_id)
@@ -462,7 +478,7 @@ class TestVolumeWaiters(base.TestCase):
             build_timeout=1,
             list_volume_attachments=mock_list_volume_attachments)
         self.patch(
-            'time.time',
+            'time.monotonic',
             side_effect=[0., 0.5, mock_client.build_timeout + 1.])
         self.patch('time.sleep')
 
@@ -489,7 +505,7 @@ class TestVolumeWaiters(base.TestCase):
             list_volume_attachments=mock_list_volume_attachments,
             get_console_output=mock_get_console_output)
         self.patch(
-            'time.time',
+            'time.monotonic',
             side_effect=[0., 0.5, mock_client.build_timeout + 1.])
         self.patch('time.sleep')
 
@@ -524,6 +540,284 @@ class TestVolumeWaiters(base.TestCase):
             mock.sentinel.server_id)
 
 
+class TestWaitForMany(base.TestCase):
+
+    def setUp(self):
+        super(TestWaitForMany, self).setUp()
+        self.sleep = self.patch('time.sleep')
+
+    def _servers_client(self, *servers_lists):
+        return mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=10, build_interval=1,
+            list_servers=mock.Mock(side_effect=[
+                {'servers': servers} for servers in servers_lists]))
+
+    def test_wait_for_many_servers(self):
+        client = self._servers_client(
+            [{'id': 'server1', 'status': 'BUILD'},
+             {'id': 'server2', 'status': 'ACTIVE'}],
+            [{'id': 'server1', 'status': 'ACTIVE',
+              'OS-EXT-STS:task_state': 'networking'}],
+            [{'id': 'server1', 'status': 'ACTIVE'}])
+        results = waiters.wait_for_many(
+            [(client, 'server1', 'ACTIVE'), (client, 'server2', 'ACTIVE')])
+        self.assertEqual({'server1': {'id': 'server1', 'status': 'ACTIVE'},
+                          'server2': {'id': 'server2', 'status': 'ACTIVE'}},
+                         results)
+        # The servers are listed once per interval
+        self.assertEqual(3, client.list_servers.call_count)
+        client.list_servers.assert_called_with(detail=True)
+        client.show_server.assert_not_called()
+
+    def test_wait_for_many_servers_reservation_id(self):
+        client = self._servers_client([{'id': 'server1', 'status': 'ACTIVE'}])
+        waiters.wait_for_many([(client, 'server1', 'ACTIVE')],
+                              reservation_id='r-1234')
+        client.list_servers.assert_called_once_with(
+            detail=True, reservation_id='r-1234')
+
+    def test_wait_for_many_servers_not_listed(self):
+        client = self._servers_client([{'id': 'server1', 'status': 'ACTIVE'}])
+        client.show_server.return_value = {
+            'server': {'id': 'server2', 'status': 'ACTIVE'}}
+        results = waiters.wait_for_many(
+            [(client, 'server1', 'ACTIVE'), (client, 'server2', 'ACTIVE')])
+        self.assertEqual(['server1', 'server2'], sorted(results))
+        client.show_server.assert_called_once_with('server2')
+
+    def test_wait_for_many_servers_error(self):
+        client = self._servers_client(
+            [{'id': 'server1', 'status': 'BUILD'},
+             {'id': 'server2', 'status': 'ERROR'}])
+        self.assertRaises(exceptions.BuildErrorException,
+                          waiters.wait_for_many,
+                          [(client, 'server1', 'ACTIVE'),
+                           (client, 'server2', 'ACTIVE')])
+
+    def test_wait_for_many_servers_error_returned(self):
+        client = self._servers_client(
+            [{'id': 'server1', 'status': 'BUILD'},
+             {'id': 'server2', 'status': 'ERROR'}],
+            [{'id': 'server1', 'status': 'ACTIVE'}])
+        results = waiters.wait_for_many(
+            [(client, 'server1', 'ACTIVE'), (client, 'server2', 'ACTIVE')],
+            raise_on_error=False)
+        self.assertEqual({'id': 'server1', 'status': 'ACTIVE'},
+                         results['server1'])
+        self.assertIsInstance(results['server2'],
+                              exceptions.BuildErrorException)
+
+    def test_wait_for_many_timeout(self):
+        time_mock = self.patch('time.monotonic')
+        time_mock.side_effect = utils.generate_timeout_series(10)
+        client = self._servers_client()
+        client.list_servers.side_effect = None
+        client.list_servers.return_value = {
+            'servers': [{'id': 'server1', 'status': 'BUILD'}]}
+        self.assertRaises(lib_exc.TimeoutException,
+                          waiters.wait_for_many,
+                          [(client, 'server1', 'ACTIVE')])
+
+    def test_wait_for_many_volumes(self):
+        client = mock.Mock(spec=volumes_client.VolumesClient,
+                           resource_type='volume',
+                           build_timeout=10, build_interval=1)
+        client.list_volumes.side_effect = [
+            {'volumes': [{'id': 'volume1', 'status': 'creating'},
+                         {'id': 'volume2', 'status': 'available'}]},
+            {'volumes': [{'id': 'volume1', 'status': 'error'}]}]
+        results = waiters.wait_for_many(
+            [(client, 'volume1', 'available'),
+             (client, 'volume2', 'available')], raise_on_error=False)
+        self.assertIsInstance(results['volume1'],
+                              exceptions.VolumeResourceBuildErrorException)
+        self.assertEqual('available', results['volume2']['status'])
+        client.list_volumes.assert_called_with(detail=True)
+        client.show_volume.assert_not_called()
+
+
+class TestServerStatusWaiters(base.TestCase):
+
+    def setUp(self):
+        super(TestServerStatusWaiters, self).setUp()
+        self.useFixture(fake_config.ConfigFixture())
+        self.patchobject(config, 'TempestConfigPrivate',
+                         fake_config.FakePrivate)
+        self.sleep = self.patch('time.sleep')
+        self.client = mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=100, build_interval=1,
+            show_server=mock.Mock(side_effect=[
+                {'server': {'id': 'server', 'status': 'BUILD'}},
+                {'server': {'id': 'server', 'status': 'BUILD'}},
+                {'server': {'id': 'server', 'status': 'ACTIVE'}}]))
+
+    def test_wait_for_server_status(self):
+        waiters.wait_for_server_status(self.client, 'server', 'ACTIVE',
+                                       ready_wait=False)
+        self.assertEqual(3, self.client.show_server.call_count)
+        self.assertEqual(2, self.sleep.call_count)
+
+    def test_wait_for_server_status_events(self):
+        event_source = mock.Mock(spec=server_events.ServerEventSource)
+        watcher = event_source.watch.return_value
+        watcher.wait.return_value = True
+        waiters.wait_for_server_status(self.client, 'server', 'ACTIVE',
+                                       ready_wait=False,
+                                       event_source=event_source)
+        event_source.watch.assert_called_once_with('server')
+        self.assertEqual(3, self.client.show_server.call_count)
+        self.assertEqual(2, watcher.wait.call_count)
+        # The server is checked at least every server_events_timeout
+        self.assertEqual(30, watcher.wait.call_args[0][0])
+        self.sleep.assert_not_called()
+        watcher.close.assert_called_once_with()
+
+    def test_wait_for_server_status_events_file(self):
+        events_file = self.useFixture(fixtures.TempDir()).join('events')
+        cfg.CONF.set_default('server_events_file', events_file,
+                             group='compute')
+        watch = self.patch(
+            'tempest.lib.common.server_events.FileServerEventSource.watch')
+        watch.return_value.wait.return_value = True
+        waiters.wait_for_server_status(self.client, 'server', 'ACTIVE',
+                                       ready_wait=False)
+        watch.assert_called_once_with('server')
+        self.sleep.assert_not_called()
+
+    def test_wait_for_server_status_events_timeout(self):
+        self.client.show_server.side_effect = None
+        self.client.show_server.return_value = {
+            'server': {'id': 'server', 'status': 'BUILD'}}
+        self.patch('time.monotonic', side_effect=[0., 90., 100.])
+        event_source = mock.Mock(spec=server_events.ServerEventSource)
+        watcher = event_source.watch.return_value
+        watcher.wait.return_value = False
+        self.assertRaises(lib_exc.TimeoutException,
+                          waiters.wait_for_server_status,
+                          self.client, 'server', 'ACTIVE', ready_wait=False,
+                          event_source=event_source)
+        # The last wait is cut to the time left before the timeout
+        watcher.wait.assert_called_once_with(10.)
+        watcher.close.assert_called_once_with()
+
+
+class TestWaiterTimelines(base.TestCase):
+
+    def setUp(self):
+        super(TestWaiterTimelines, self).setUp()
+        self.useFixture(fake_config.ConfigFixture())
+        self.patchobject(config, 'TempestConfigPrivate',
+                         fake_config.FakePrivate)
+        self.patch('time.sleep')
+        self.path = self.useFixture(fixtures.TempDir()).join('timelines')
+        cfg.CONF.set_default('waiter_timeline_file', self.path,
+                             group='debug')
+        self.addCleanup(request_log.close_sinks)
+
+    def _read_timelines(self):
+        with open(self.path) as timelines_file:
+            return [json.loads(line) for line in timelines_file]
+
+    @staticmethod
+    def _server(status, task_state=None):
+        return rest_client.ResponseBody(
+            {'content-length': '100'},
+            {'server': {'id': 'server', 'status': status,
+                        'OS-EXT-STS:task_state': task_state}})
+
+    def test_wait_for_server_status(self):
+        client = mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=100, build_interval=1,
+            show_server=mock.Mock(side_effect=[
+                self._server('BUILD', 'scheduling'),
+                self._server('BUILD', 'spawning'),
+                self._server('BUILD', 'spawning'),
+                self._server('ACTIVE')]))
+        self.patch('time.monotonic', return_value=5.)
+        waiters.wait_for_server_status(client, 'server', 'ACTIVE',
+                                       ready_wait=False)
+        timeline, = self._read_timelines()
+        self.assertEqual('wait_for_server_status', timeline['waiter'])
+        self.assertEqual('server', timeline['resource_id'])
+        self.assertEqual('ACTIVE', timeline['target'])
+        self.assertEqual('reached', timeline['outcome'])
+        self.assertEqual(4, timeline['polls'])
+        self.assertEqual(400, timeline['bytes'])
+        self.assertEqual(
+            [{'time': 0., 'status': 'BUILD', 'task_state': 'scheduling'},
+             {'time': 0., 'status': 'BUILD', 'task_state': 'spawning'},
+             {'time': 0., 'status': 'ACTIVE', 'task_state': None}],
+            timeline['transitions'])
+
+    def test_wait_for_volume_resource_status_timeout(self):
+        self.patch('time.monotonic',
+                   side_effect=utils.generate_timeout_series(1))
+        client = mock.Mock(
+            spec=volumes_client.VolumesClient,
+            resource_type='volume', build_timeout=2, build_interval=1,
+            show_volume=mock.Mock(
+                return_value={'volume': {'status': 'creating'}}))
+        self.assertRaises(lib_exc.TimeoutException,
+                          waiters.wait_for_volume_resource_status,
+                          client, 'volume', 'available')
+        timeline, = self._read_timelines()
+        self.assertEqual('timeout', timeline['outcome'])
+        self.assertEqual('available', timeline['target'])
+        self.assertEqual(client.show_volume.call_count, timeline['polls'])
+        self.assertEqual(0, timeline['bytes'])
+        self.assertEqual(1, len(timeline['transitions']))
+
+    def test_wait_for_server_termination_error(self):
+        client = mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=100, build_interval=1,
+            show_server=mock.Mock(side_effect=[self._server('ACTIVE'),
+                                               self._server('ERROR')]))
+        self.assertRaises(lib_exc.DeleteErrorException,
+                          waiters.wait_for_server_termination,
+                          client, 'server')
+        timeline, = self._read_timelines()
+        self.assertEqual('error', timeline['outcome'])
+        self.assertIsNone(timeline['target'])
+        self.assertEqual(2, timeline['polls'])
+
+    def test_write_failure(self):
+        sink = self.patchobject(request_log, 'get_sink')
+        sink.return_value.write.side_effect = OSError('No space left')
+        client = mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=100, build_interval=1,
+            show_server=mock.Mock(return_value=self._server('ACTIVE')))
+        # The waiter succeeds even though its timeline is not recorded
+        waiters.wait_for_server_status(client, 'server', 'ACTIVE',
+                                       ready_wait=False)
+        # The error of the waiter is raised, not the one of the timeline
+        self.patch('time.monotonic',
+                   side_effect=utils.generate_timeout_series(1))
+        client = mock.Mock(
+            spec=volumes_client.VolumesClient,
+            resource_type='volume', build_timeout=2, build_interval=1,
+            show_volume=mock.Mock(
+                return_value={'volume': {'status': 'creating'}}))
+        self.assertRaises(lib_exc.TimeoutException,
+                          waiters.wait_for_volume_resource_status,
+                          client, 'volume', 'available')
+        self.assertEqual(2, sink.return_value.write.call_count)
+
+    def test_disabled(self):
+        cfg.CONF.set_default('waiter_timeline_file', None, group='debug')
+        client = mock.Mock(
+            spec=servers_client.ServersClient,
+            build_timeout=100, build_interval=1,
+            show_server=mock.Mock(return_value=self._server('ACTIVE')))
+        waiters.wait_for_server_status(client, 'server', 'ACTIVE',
+                                       ready_wait=False)
+        self.assertFalse(os.path.exists(self.path))
+
+
 class TestServerFloatingIPWaiters(base.TestCase):
 
     def test_wait_for_server_floating_ip_associate_timeout(self):
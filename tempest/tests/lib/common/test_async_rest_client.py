@@ -0,0 +1,77 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+
+import fixtures
+
+from tempest.lib.common import async_rest_client
+from tempest.lib.common import http
+from tempest.lib.common.utils import test_utils
+from tempest.lib import exceptions
+from tempest.tests import base
+from tempest.tests.lib import fake_auth_provider
+from tempest.tests.lib import fake_http
+
+
+class TestAsyncRestClient(base.TestCase):
+
+    def setUp(self):
+        super(TestAsyncRestClient, self).setUp()
+        self.fake_http = fake_http.fake_httplib2()
+        self.client = async_rest_client.AsyncRestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None)
+        self.patchobject(http.ClosingHttp, 'request', self.fake_http.request)
+        self.useFixture(fixtures.MockPatchObject(self.client,
+                                                 '_error_checker'))
+
+    def test_aget(self):
+        _, body = asyncio.run(self.client.aget('servers'))
+        self.assertEqual('GET', body['method'])
+        self.assertEqual('servers', body['uri'])
+
+    def test_apost(self):
+        _, body = asyncio.run(self.client.apost('servers', 'fake_body'))
+        self.assertEqual('POST', body['method'])
+        self.assertEqual('fake_body', body['body'])
+
+    def test_concurrent_requests(self):
+
+        async def get_all():
+            return await asyncio.gather(
+                *[self.client.aget('servers/%d' % i) for i in range(20)])
+
+        results = asyncio.run(get_all())
+        self.assertEqual(['servers/%d' % i for i in range(20)],
+                         [body['uri'] for _, body in results])
+
+    def test_errors(self):
+        self.patchobject(self.client, 'get', side_effect=exceptions.NotFound)
+        self.assertRaises(exceptions.NotFound, asyncio.run,
+                          self.client.aget('servers'))
+
+    def test_aio(self):
+        self.patchobject(self.client, 'get_headers', return_value={'a': 'b'})
+        self.assertEqual({'a': 'b'},
+                         asyncio.run(self.client.aio.get_headers()))
+        self.assertRaises(AttributeError, getattr, self.client.aio,
+                          'service')
+
+    def test_current_test(self):
+
+        def caller():
+            return test_utils.find_test_caller()
+
+        token = test_utils.set_current_test('Fake:test_fake')
+        self.addCleanup(test_utils.reset_current_test, token)
+        self.assertEqual('Fake:test_fake',
+                         asyncio.run(self.client.async_call(caller)))
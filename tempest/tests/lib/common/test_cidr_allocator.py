@@ -0,0 +1,65 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+import fixtures
+
+from tempest.lib.common import cidr_allocator
+from tempest.tests import base
+
+
+class TestCIDRAllocator(base.TestCase):
+
+    def setUp(self):
+        super(TestCIDRAllocator, self).setUp()
+        self.lock_path = self.useFixture(fixtures.TempDir()).path
+
+    def _allocator(self):
+        return cidr_allocator.CIDRAllocator(self.lock_path, '10.100.0.0/26',
+                                            28)
+
+    def test_allocate(self):
+        allocator = self._allocator()
+        self.assertEqual('10.100.0.0/28', allocator.allocate())
+        # The allocations are shared through the lock path
+        self.assertEqual('10.100.0.16/28', self._allocator().allocate())
+        self.assertEqual('10.100.0.32/28', allocator.allocate())
+
+    def test_allocate_all(self):
+        allocator = self._allocator()
+        cidrs = [allocator.allocate() for _ in range(4)]
+        self.assertEqual(['10.100.0.0/28', '10.100.0.16/28',
+                          '10.100.0.32/28', '10.100.0.48/28'], cidrs)
+        self.assertIsNone(allocator.allocate())
+
+    def test_release(self):
+        allocator = self._allocator()
+        cidr = allocator.allocate()
+        allocator.allocate()
+        self._allocator().release(cidr)
+        self.assertEqual(cidr, allocator.allocate())
+
+    def test_release_other_process(self):
+        allocator = self._allocator()
+        cidr = allocator.allocate()
+        with mock.patch('os.getpid', return_value=-1):
+            allocator.release(cidr)
+        self.assertEqual('10.100.0.16/28', allocator.allocate())
+
+    def test_reclaim_exited_process(self):
+        allocator = self._allocator()
+        with mock.patch('os.getpid', return_value=-1):
+            allocator.allocate()
+        with mock.patch('os.kill', side_effect=ProcessLookupError):
+            self.assertEqual('10.100.0.0/28', allocator.allocate())
+        self.assertEqual('10.100.0.16/28', allocator.allocate())
@@ -51,6 +51,37 @@ class TestCredClientV2(base.TestCase):
         self.assertEqual(ret.username, 'some_user')
         self.assertEqual(ret.project_name, 'some_project')
 
+    def test_role_lookup_cached(self):
+        self.roles_client.list_roles.return_value = {
+            'roles': [{'id': 'fake_id', 'name': 'Member'},
+                      {'id': 'fake_admin_id', 'name': 'admin'}]}
+        for _ in range(3):
+            self.creds_client.assign_user_role(
+                {'id': 'fake_user'}, {'id': 'fake_project'}, 'member')
+        self.creds_client.create_user_role('admin')
+        self.roles_client.list_roles.assert_called_once_with()
+        self.roles_client.create_role.assert_not_called()
+        self.roles_client.create_user_role_on_project.assert_called_with(
+            'fake_project', 'fake_user', 'fake_id')
+
+    def test_role_lookup_refreshed(self):
+        self.roles_client.list_roles.return_value = {
+            'roles': [{'id': 'fake_id', 'name': 'member'}]}
+        self.creds_client.create_user_role('member')
+        self.creds_client.create_user_role('reader')
+        self.roles_client.create_role.assert_called_once_with(name='reader')
+        # The created role is looked up again
+        self.roles_client.list_roles.return_value = {
+            'roles': [{'id': 'fake_id', 'name': 'member'},
+                      {'id': 'fake_reader_id', 'name': 'reader'}]}
+        self.creds_client.assign_user_role(
+            {'id': 'fake_user'}, {'id': 'fake_project'}, 'reader')
+        self.creds_client.assign_user_role(
+            {'id': 'fake_user'}, {'id': 'fake_project'}, 'member')
+        self.assertEqual(3, self.roles_client.list_roles.call_count)
+        self.roles_client.create_user_role_on_project.assert_called_with(
+            'fake_project', 'fake_user', 'fake_id')
+
 
 class TestCredClientV3(base.TestCase):
     def setUp(self):
@@ -129,3 +160,17 @@ class TestCredClientV3(base.TestCase):
             project_id=fake_project['id'],
             email='fake_email',
             domain_id='fake_domain_id')
+
+    def test_role_lookup_cached(self):
+        self.roles_client.list_roles.return_value = {
+            'roles': [{'id': 'fake_id', 'name': 'member'}]}
+        user = {'id': 'fake_user'}
+        self.creds_client.assign_user_role_on_domain(user, 'member')
+        self.creds_client.assign_user_role_on_system(user, 'member')
+        self.creds_client.assign_user_role(user, {'id': 'fake_project'},
+                                           'member')
+        self.roles_client.list_roles.assert_called_once_with()
+        self.roles_client.create_user_role_on_domain.assert_called_once_with(
+            'fake_domain_id', 'fake_user', 'fake_id')
+        self.roles_client.create_user_role_on_system.assert_called_once_with(
+            'fake_user', 'fake_id')
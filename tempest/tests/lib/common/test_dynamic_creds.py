@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+import time
 from unittest import mock
 
 import fixtures
@@ -44,6 +46,40 @@ from tempest.tests.lib import fake_identity
 from tempest.tests.lib.services import registry_fixture
 
 
+class TestTaskGraph(base.TestCase):
+
+    def test_run(self):
+        graph = dynamic_creds._TaskGraph()
+        graph.add('sum', lambda one, two: one + two, 'one', 'two')
+        graph.add('one', lambda: 1)
+        graph.add('two', lambda one: one + 1, 'one')
+        self.assertIn('sum', graph)
+        self.assertEqual({'one': 1, 'two': 2, 'sum': 3}, graph.run())
+
+    def test_run_failure(self):
+        graph = dynamic_creds._TaskGraph()
+        dependent = mock.Mock()
+        graph.add('one', lambda: 1)
+        graph.add('failure', mock.Mock(side_effect=ValueError('fake_error')))
+        graph.add('dependent', dependent, 'failure')
+        self.assertRaises(ValueError, graph.run)
+        dependent.assert_not_called()
+        self.assertEqual({'one': 1}, graph.results)
+
+    def test_run_after(self):
+        graph = dynamic_creds._TaskGraph()
+        graph.add('two', lambda one: one + 1, 'one', after=('first',))
+        graph.add('one', lambda: 1)
+        first = mock.Mock(return_value='first')
+        graph.add('first', first)
+        self.assertEqual({'one': 1, 'two': 2, 'first': 'first'}, graph.run())
+
+    def test_run_unknown_dependency(self):
+        graph = dynamic_creds._TaskGraph()
+        graph.add('one', lambda unknown: 1, 'unknown')
+        self.assertRaises(ValueError, graph.run)
+
+
 class TestDynamicCredentialProvider(base.TestCase):
 
     fixed_params = {'name': 'test class',
@@ -72,6 +108,9 @@ class TestDynamicCredentialProvider(base.TestCase):
         cfg.CONF.set_default('operator_role', 'FakeRole',
                              group='object-storage')
         self._mock_list_ec2_credentials('fake_user_id', 'fake_tenant_id')
+        # NOTE: The credentials are created one request at a time, so that
+        # the order of the mocked requests is deterministic
+        self.patchobject(dynamic_creds, 'PROVISIONING_MAX_WORKERS', 1)
         self.fixed_params.update(
             admin_creds=self._get_fake_admin_creds())
 
@@ -422,6 +461,269 @@ class TestDynamicCredentialProvider(base.TestCase):
         self.assertIn('12345', args)
         self.assertIn('123456', args)
 
+    def _create_pooled_creds(self, pool, **params):
+        # The credentials have no service other than identity by default
+        self.creds_clients = mock.Mock(spec=[])
+        self.patchobject(dynamic_creds.DynamicCredentialProvider,
+                         '_get_creds_clients',
+                         return_value=self.creds_clients)
+        creds = dynamic_creds.DynamicCredentialProvider(
+            credentials_pool=pool, **dict(self.fixed_params, **params))
+        self._mock_assign_user_role()
+        self._mock_list_role()
+        self._mock_tenant_create('1234', 'fake_prim_tenant')
+        self._mock_user_create('1234', 'fake_prim_user')
+        primary_creds = creds.get_primary_creds()
+        self._mock_tenant_create('12345', 'fake_alt_tenant')
+        self._mock_user_create('12345', 'fake_alt_user')
+        alt_creds = creds.get_alt_creds()
+        # The users have the roles they were created with by default
+        self.user_roles = {
+            c.user_id: c.project_roles for c in (primary_creds, alt_creds)}
+        self.patchobject(
+            self.roles_client.RolesClient, 'list_user_roles_on_project',
+            side_effect=lambda project_id, user_id: {'roles': [
+                {'name': role} for role in self.user_roles[user_id]]})
+        return creds, primary_creds, alt_creds
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(1)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(pool)
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        tenant_mock = self.patchobject(self.tenants_client_class,
+                                       self.delete_tenant)
+        creds.clear_creds()
+        # The pool is full after the first credentials
+        self.assertEqual(1, len(pool))
+        user_mock.assert_called_once_with(alt_creds.user_id)
+        tenant_mock.assert_called_once_with(alt_creds.tenant_id)
+        # Another provider reuses the pooled credentials
+        new_creds = dynamic_creds.DynamicCredentialProvider(
+            credentials_pool=pool, **self.fixed_params)
+        tenant_create = self._mock_tenant_create('123456', 'fake_tenant')
+        self.assertIs(primary_creds, new_creds.get_primary_creds())
+        self.assertIs(primary_creds, new_creds.get_primary_creds())
+        self.assertEqual(0, tenant_create.mock.call_count)
+        self.assertEqual(0, len(pool))
+        # Providers with another configuration don't
+        new_creds.clear_creds()
+        other_creds = dynamic_creds.DynamicCredentialProvider(
+            credentials_pool=pool, extra_roles=['FakeRole'],
+            **self.fixed_params)
+        self.assertIsNot(primary_creds, other_creds.get_primary_creds())
+        self.assertEqual(1, tenant_create.mock.call_count)
+        # The pooled credentials are deleted when the pool is cleared
+        pool.clear()
+        self.assertEqual(0, len(pool))
+        self.assertEqual(2, user_mock.call_count)
+        user_mock.assert_called_with(primary_creds.user_id)
+        tenant_mock.assert_called_with(primary_creds.tenant_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_by_roles(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(3)
+        creds, _, _ = self._create_pooled_creds(pool)
+        self._mock_list_2_roles()
+        self._mock_tenant_create('123456', 'fake_role_tenant')
+        self._mock_user_create('123456', 'fake_role_user')
+        role_creds = creds.get_creds_by_roles(['role1', 'role2'])
+        self.user_roles[role_creds.user_id] = role_creds.project_roles
+        self.patchobject(creds, '_clear_creds')
+        creds.clear_creds()
+        # The credentials are reused whatever the order of their roles
+        new_creds = dynamic_creds.DynamicCredentialProvider(
+            credentials_pool=pool, **self.fixed_params)
+        self.assertIs(role_creds,
+                      new_creds.get_creds_by_roles(['role2', 'role1']))
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_with_leftover_ports(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(2)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(
+            pool, neutron_available=True, create_networks=False)
+        self.patchobject(creds, 'cleanup_default_secgroup')
+        ports = {
+            primary_creds.tenant_id: [
+                {'id': 'fake_dhcp_port', 'device_owner': 'network:dhcp'}],
+            alt_creds.tenant_id: [
+                {'id': 'fake_server_port', 'device_owner': 'compute:nova'}]}
+        self.patchobject(creds.ports_admin_client, 'list_ports',
+                         side_effect=lambda project_id: {
+                             'ports': ports[project_id]})
+        for name in ('networks', 'subnets', 'routers'):
+            self.patchobject(getattr(creds, name + '_admin_client'),
+                             'list_' + name, return_value={name: []})
+        self.patchobject(creds.security_groups_admin_client,
+                         'list_security_groups', return_value={
+                             'security_groups': [{'id': 'fake_default',
+                                                  'name': 'default'}]})
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        self.patchobject(self.tenants_client_class, self.delete_tenant)
+        creds.clear_creds()
+        self.assertEqual(1, len(pool))
+        user_mock.assert_called_once_with(alt_creds.user_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_with_leftover_resources(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(2)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(pool)
+        compute = mock.Mock()
+        compute.ServersClient().list_servers.return_value = {'servers': []}
+        compute.KeyPairsClient().list_keypairs.return_value = {
+            'keypairs': []}
+        quota_sets = {primary_creds.tenant_id: {'id': 'fake', 'cores': 20},
+                      alt_creds.tenant_id: {'id': 'fake', 'cores': 40}}
+        compute.QuotasClient().show_quota_set.side_effect = (
+            lambda project_id: {'quota_set': quota_sets[project_id]})
+        compute.QuotasClient().show_default_quota_set.return_value = {
+            'quota_set': {'id': 'fake', 'cores': 20}}
+        self.creds_clients.compute = compute
+        # The volumes are not checked without a volume endpoint
+        volume = mock.Mock()
+        volume.VolumesClient().list_volumes.side_effect = (
+            lib_exc.EndpointNotFound)
+        volume.QuotasClient().show_quota_set.side_effect = (
+            lib_exc.EndpointNotFound)
+        volume.QuotasClient().show_default_quota_set.side_effect = (
+            lib_exc.EndpointNotFound)
+        self.creds_clients.volume_v3 = volume
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        self.patchobject(self.tenants_client_class, self.delete_tenant)
+        creds.clear_creds()
+        # The credentials with changed quotas are deleted
+        self.assertEqual(1, len(pool))
+        user_mock.assert_called_once_with(alt_creds.user_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_with_extra_role(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(2)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(pool)
+        # A test assigned another role to the alt user on its project
+        self.user_roles[alt_creds.user_id] = (
+            alt_creds.project_roles | {'admin'})
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        self.patchobject(self.tenants_client_class, self.delete_tenant)
+        creds.clear_creds()
+        self.assertEqual(1, len(pool))
+        user_mock.assert_called_once_with(alt_creds.user_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_with_changed_volume_quotas(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(2)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(pool)
+        volume = mock.Mock()
+        volume.VolumesClient().list_volumes.return_value = {'volumes': []}
+        quota_sets = {primary_creds.tenant_id: {'id': 'fake', 'volumes': 10},
+                      alt_creds.tenant_id: {'id': 'fake', 'volumes': 0}}
+        volume.QuotasClient().show_quota_set.side_effect = (
+            lambda project_id: {'quota_set': quota_sets[project_id]})
+        volume.QuotasClient().show_default_quota_set.return_value = {
+            'quota_set': {'id': 'fake', 'volumes': 10}}
+        self.creds_clients.volume_v3 = volume
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        self.patchobject(self.tenants_client_class, self.delete_tenant)
+        creds.clear_creds()
+        self.assertEqual(1, len(pool))
+        user_mock.assert_called_once_with(alt_creds.user_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_pooled_creds_listing_failure(self, MockRestClient):
+        pool = dynamic_creds.DynamicCredentialsPool(2)
+        creds, primary_creds, alt_creds = self._create_pooled_creds(pool)
+        image = mock.Mock()
+        image.ImagesClient().list_images.side_effect = lib_exc.ServerFault
+        self.creds_clients.image_v2 = image
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        self.patchobject(self.tenants_client_class, self.delete_tenant)
+        creds.clear_creds()
+        self.assertEqual(0, len(pool))
+        self.assertEqual(2, user_mock.call_count)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_provision_credentials(self, MockRestClient):
+        creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
+        self._mock_assign_user_role()
+        self._mock_list_roles('1234', 'admin')
+        self._mock_tenant_create('1234', 'fake_tenant')
+        user_create = self._mock_user_create('1234', 'fake_user')
+        creds.provision_credentials(['primary', 'alt', 'admin', 'primary',
+                                     'unknown'])
+        self.assertEqual(3, user_create.mock.call_count)
+        self.assertEqual({'primary', 'alt', 'admin'}, set(creds._creds))
+        # The provisioned credentials are returned
+        self.assertIs(creds._creds['alt'], creds.get_alt_creds())
+        self.assertEqual(3, user_create.mock.call_count)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_get_credentials_concurrently(self, MockRestClient):
+        creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
+        self._mock_assign_user_role()
+        self._mock_list_role()
+        self._mock_tenant_create('1234', 'fake_tenant')
+        user_create = self._mock_user_create('1234', 'fake_user')
+        created = threading.Event()
+        create_creds = creds._create_creds
+
+        def _create_creds(**kwargs):
+            # The second caller is started while the credentials are created
+            created.set()
+            time.sleep(0.1)
+            return create_creds(**kwargs)
+
+        self.patchobject(creds, '_create_creds', side_effect=_create_creds)
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(creds.get_primary_creds()))
+        thread.start()
+        created.wait(10)
+        results.append(creds.get_primary_creds())
+        thread.join()
+        # The credentials of a type are created once
+        self.assertEqual(1, user_create.mock.call_count)
+        self.assertIs(results[0], results[1])
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_network_failure_cleanup(self, MockRestClient):
+        creds = dynamic_creds.DynamicCredentialProvider(
+            neutron_available=True, create_networks=True,
+            **self.fixed_params)
+        self._mock_assign_user_role()
+        self._mock_list_role()
+        self._mock_tenant_create('1234', 'fake_prim_tenant')
+        self._mock_user_create('1234', 'fake_prim_user')
+        self.patchobject(creds, '_create_network_resources',
+                         side_effect=lib_exc.BadRequest('fake_error'))
+        self.assertRaises(lib_exc.BadRequest, creds.get_primary_creds)
+        # The user and project are deleted with the other credentials
+        self.assertEqual(['failed-1234'], list(creds._creds))
+        self.patchobject(creds, 'cleanup_default_secgroup')
+        user_mock = self.patchobject(self.users_client.UsersClient,
+                                     'delete_user')
+        tenant_mock = self.patchobject(self.tenants_client_class,
+                                       self.delete_tenant)
+        creds.clear_creds()
+        user_mock.assert_called_once_with('1234')
+        tenant_mock.assert_called_once_with('1234')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_user_failure_cleanup(self, MockRestClient):
+        creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
+        self._mock_tenant_create('1234', 'fake_prim_tenant')
+        self.patchobject(self.users_client.UsersClient, 'create_user',
+                         side_effect=lib_exc.BadRequest('fake_error'))
+        tenant_mock = self.patchobject(self.tenants_client_class,
+                                       self.delete_tenant)
+        self.assertRaises(lib_exc.BadRequest, creds.get_primary_creds)
+        self.assertEqual({}, creds._creds)
+        tenant_mock.assert_called_once_with('1234')
+
     @mock.patch('tempest.lib.common.rest_client.RestClient')
     def test_alt_creds(self, MockRestClient):
         creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
@@ -495,6 +797,43 @@ class TestDynamicCredentialProvider(base.TestCase):
         self.assertEqual(router['id'], '1234')
         self.assertEqual(router['name'], 'fake_router')
 
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_subnet_cidr_allocator(self, MockRestClient):
+        allocator = mock.Mock()
+        allocator.allocate.side_effect = ['10.100.0.0/28', '10.100.0.16/28']
+        creds = dynamic_creds.DynamicCredentialProvider(
+            neutron_available=True, cidr_allocator=allocator,
+            **self.fixed_params)
+        create_subnet = self.patchobject(
+            creds.subnets_admin_client, 'create_subnet',
+            side_effect=[lib_exc.BadRequest('overlaps with another subnet'),
+                         {'subnet': {'id': '1234', 'name': 'fake_subnet',
+                                     'cidr': '10.100.0.16/28'}}])
+        subnet = creds._create_subnet('fake_subnet', '1234', '1234')
+        self.assertEqual('10.100.0.16/28',
+                         create_subnet.call_args[1]['cidr'])
+        # The overlapping CIDR is kept allocated
+        allocator.release.assert_not_called()
+        self.patchobject(creds.subnets_admin_client, 'delete_subnet')
+        creds._clear_isolated_subnet(subnet['id'], subnet['name'],
+                                     subnet['cidr'])
+        allocator.release.assert_called_once_with('10.100.0.16/28')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_subnet_cidr_allocator_failure(self, MockRestClient):
+        allocator = mock.Mock()
+        allocator.allocate.side_effect = ['10.100.0.0/28', None]
+        creds = dynamic_creds.DynamicCredentialProvider(
+            neutron_available=True, cidr_allocator=allocator,
+            **self.fixed_params)
+        self.patchobject(creds.subnets_admin_client, 'create_subnet',
+                         side_effect=lib_exc.BadRequest('fake_error'))
+        self.assertRaises(lib_exc.BadRequest, creds._create_subnet,
+                          'fake_subnet', '1234', '1234')
+        allocator.release.assert_called_once_with('10.100.0.0/28')
+        self.assertRaises(Exception, creds._create_subnet,
+                          'fake_subnet', '1234', '1234')
+
     @mock.patch('tempest.lib.common.rest_client.RestClient')
     def test_network_cleanup(self, MockRestClient):
         def side_effect(**args):
@@ -1038,3 +1377,12 @@ class TestDynamicCredentialProviderV3(TestDynamicCredentialProvider):
                 "member role already exists, ignoring conflict.")
         creds.creds_client.assign_user_role.assert_called_once_with(
             mock.ANY, mock.ANY, 'member')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_member_role_created_once(self, rest_client_mock):
+        creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
+        creds.creds_client = mock.MagicMock()
+        creds._create_creds()
+        creds._create_creds()
+        creds.creds_client.create_user_role.assert_called_once_with('member')
+        self.assertEqual(2, creds.creds_client.assign_user_role.call_count)
@@ -12,6 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+from http import client as http_client
+import io
+import os
+
+import fixtures
 import urllib3
 
 from tempest.lib.common import http
@@ -149,6 +155,298 @@ class TestClosingHttp(base.TestCase):
              'xtra key': 'Xtra Value'},
             response)
 
+    def test_closing_http_keep_alive_pool_maxsize(self):
+        connection = self.closing_http(keep_alive=True, pool_maxsize=4)
+        self.assertTrue(connection.keep_alive)
+        self.assertEqual(4, connection.connection_pool_kw['maxsize'])
+
+    def test_closing_http_pool_maxsize_without_keep_alive(self):
+        connection = self.closing_http(pool_maxsize=4)
+        self.assertFalse(connection.keep_alive)
+        self.assertNotIn('maxsize', connection.connection_pool_kw)
+
+    def test_request_keep_alive(self):
+        # Given
+        connection = self.closing_http(keep_alive=True)
+        headers = {'Xtra Key': 'Xtra Value'}
+        http_response = urllib3.HTTPResponse()
+        request = self.patch('urllib3.PoolManager.request',
+                             return_value=http_response)
+        retry = self.patch('urllib3.util.Retry')
+
+        # When
+        connection.request(
+            method=REQUEST_METHOD,
+            url=REQUEST_URL,
+            headers=headers)
+
+        # Then
+        request.assert_called_once_with(
+            REQUEST_METHOD,
+            REQUEST_URL,
+            headers=headers,
+            retries=retry(raise_on_redirect=False, redirect=5))
+
+    def _stale_connection_error(self, error=None):
+        return urllib3.exceptions.ProtocolError(
+            'Connection aborted.',
+            error or http_client.RemoteDisconnected(
+                'Remote end closed connection'))
+
+    def test_request_keep_alive_stale_connection_retry(self):
+        # Given
+        connection = self.closing_http(keep_alive=True)
+        http_response = urllib3.HTTPResponse()
+        request = self.patch(
+            'urllib3.PoolManager.request',
+            side_effect=[self._stale_connection_error(), http_response])
+        self.patch('urllib3.util.Retry')
+
+        # When
+        response, _ = connection.request(
+            method='PUT', url=REQUEST_URL, body='{}')
+
+        # Then
+        self.assertEqual(2, request.call_count)
+        self.assertEqual(http_response.status, response.status)
+        self.assertEqual(1, connection.connection_stats.stale_retries)
+
+    def test_request_keep_alive_stale_connection_not_idempotent(self):
+        connection = self.closing_http(keep_alive=True)
+        request = self.patch(
+            'urllib3.PoolManager.request',
+            side_effect=self._stale_connection_error())
+        self.patch('urllib3.util.Retry')
+
+        # The server may have processed the request before disconnecting
+        self.assertRaises(urllib3.exceptions.ProtocolError,
+                          connection.request, method='POST',
+                          url=REQUEST_URL, body='{}')
+        self.assertEqual(1, request.call_count)
+        self.assertEqual(0, connection.connection_stats.stale_retries)
+
+    def test_request_keep_alive_stale_connection_broken_pipe(self):
+        connection = self.closing_http(keep_alive=True)
+        http_response = urllib3.HTTPResponse()
+        request = self.patch(
+            'urllib3.PoolManager.request',
+            side_effect=[self._stale_connection_error(BrokenPipeError()),
+                         http_response])
+        self.patch('urllib3.util.Retry')
+
+        # Writing the request failed, it did not reach the server
+        response, _ = connection.request(
+            method='POST', url=REQUEST_URL, body='{}')
+        self.assertEqual(2, request.call_count)
+        self.assertEqual(http_response.status, response.status)
+
+    def test_request_keep_alive_stale_connection_chunked_body(self):
+        connection = self.closing_http(keep_alive=True)
+        request = self.patch(
+            'urllib3.PoolManager.request',
+            side_effect=self._stale_connection_error())
+        self.patch('urllib3.util.Retry')
+
+        self.assertRaises(urllib3.exceptions.ProtocolError,
+                          connection.request, method='PUT',
+                          url=REQUEST_URL, body=iter([b'data']))
+        self.assertEqual(1, request.call_count)
+
+    def test_request_stale_connection_without_keep_alive(self):
+        connection = self.closing_http()
+        request = self.patch(
+            'urllib3.PoolManager.request',
+            side_effect=self._stale_connection_error())
+        self.patch('urllib3.util.Retry')
+
+        self.assertRaises(urllib3.exceptions.ProtocolError,
+                          connection.request, method=REQUEST_METHOD,
+                          url=REQUEST_URL)
+        self.assertEqual(1, request.call_count)
+
+    def _streamed_response(self, status, body=b'image data'):
+        return urllib3.HTTPResponse(body=io.BytesIO(body), status=status,
+                                    preload_content=False)
+
+    def test_request_stream(self):
+        # Given
+        connection = self.closing_http()
+        request = self.patch('urllib3.PoolManager.request',
+                             return_value=self._streamed_response(200))
+        retry = self.patch('urllib3.util.Retry')
+
+        # When
+        _, body = connection.request(
+            method=REQUEST_METHOD, url=REQUEST_URL, stream=True)
+
+        # Then
+        request.assert_called_once_with(
+            REQUEST_METHOD,
+            REQUEST_URL,
+            headers={'connection': 'close'},
+            preload_content=False,
+            retries=retry(raise_on_redirect=False, redirect=5))
+        self.assertIsInstance(body, http.StreamingBody)
+        self.assertEqual(b'image data', body.read())
+
+    def test_request_stream_error_response(self):
+        connection = self.closing_http()
+        self.patch('urllib3.PoolManager.request',
+                   return_value=self._streamed_response(404, b'not found'))
+        self.patch('urllib3.util.Retry')
+
+        _, body = connection.request(
+            method=REQUEST_METHOD, url=REQUEST_URL, stream=True)
+
+        self.assertEqual(b'not found', body)
+
+
+class TestStreamingBody(base.TestCase):
+
+    def _streaming_body(self, data, **kwargs):
+        response = urllib3.HTTPResponse(body=io.BytesIO(data), status=200,
+                                        preload_content=False)
+        self.release_conn = self.patchobject(response, 'release_conn')
+        self.close = self.patchobject(response, 'close')
+        return http.StreamingBody(response, **kwargs)
+
+    def test_iterate(self):
+        data = b'x' * 10
+        body = self._streaming_body(data, chunk_size=4)
+        self.assertEqual([b'xxxx', b'xxxx', b'xx'], list(body))
+        self.assertEqual(10, body.bytes_read)
+        self.assertEqual(hashlib.md5(data).hexdigest(), body.hexdigest())
+        self.release_conn.assert_called_once_with()
+
+    def test_read_checksums(self):
+        data = b'image data'
+        body = self._streaming_body(data, hash_algorithms=('md5', 'sha512'))
+        self.assertEqual(b'image', body.read(5))
+        self.release_conn.assert_not_called()
+        self.assertEqual(b' data', body.read())
+        self.assertEqual(hashlib.md5(data).hexdigest(), body.hexdigest())
+        self.assertEqual(hashlib.sha512(data).hexdigest(),
+                         body.hexdigest('sha512'))
+        self.release_conn.assert_called_once_with()
+        self.close.assert_not_called()
+
+    def test_context_manager_closes(self):
+        with self._streaming_body(b'image data') as body:
+            body.read(1)
+        # The connection is not reused with unread data
+        self.close.assert_called_once_with()
+        self.release_conn.assert_called_once_with()
+
+    def test_close_read_entirely(self):
+        body = self._streaming_body(b'image data')
+        body.read()
+        body.close()
+        self.close.assert_not_called()
+
+
+class TestFileBody(base.TestCase):
+
+    def test_bytes_io(self):
+        data = io.BytesIO(b'image data')
+        data.seek(6)
+        with http.file_body(data) as body:
+            self.assertEqual(b'data', body.tobytes())
+        self.assertEqual(10, data.tell())
+        # The buffer has been released, the file can be written again
+        data.write(b'!')
+
+    def test_regular_file(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, 'img')
+        with open(path, 'wb') as f:
+            f.write(b'image data')
+        with open(path, 'rb') as data:
+            with http.file_body(data) as body:
+                self.assertEqual(10, body.nbytes)
+                self.assertEqual(b'image data', body.tobytes())
+            self.assertEqual(10, data.tell())
+
+    def test_empty_file(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, 'img')
+        open(path, 'wb').close()
+        with open(path, 'rb') as data:
+            with http.file_body(data) as body:
+                self.assertIsNone(body)
+
+    def test_not_a_file(self):
+        with http.file_body(iter([b'image data'])) as body:
+            self.assertIsNone(body)
+
+
+class TestConnectionStats(base.TestCase):
+
+    def test_connection_stats(self):
+        stats = http.ConnectionStats()
+        for _ in range(3):
+            stats.increment('requests')
+        stats.increment('opened')
+        self.assertEqual(3, stats.requests)
+        self.assertEqual(1, stats.opened)
+        self.assertEqual(2, stats.reused)
+
+    def test_connection_stats_reset(self):
+        stats = http.ConnectionStats()
+        stats.increment('requests')
+        stats.increment('opened')
+        stats.reset()
+        self.assertEqual(0, stats.requests)
+        self.assertEqual(0, stats.opened)
+        self.assertEqual(0, stats.reused)
+
+    def test_pools_share_connection_stats(self):
+        connection = http.ClosingHttp(keep_alive=True)
+        pool = connection.connection_from_url(REQUEST_URL)
+        self.assertIsInstance(pool, http.CountingHTTPConnectionPool)
+        self.assertIs(connection.connection_stats, pool.connection_stats)
+        pool._new_conn()
+        self.assertEqual(1, connection.connection_stats.opened)
+
+
+class TestSharedHttpRegistry(base.TestCase):
+
+    def setUp(self):
+        super(TestSharedHttpRegistry, self).setUp()
+        self.registry = http.SharedHttpRegistry()
+        self.addCleanup(self.registry.clear)
+
+    def test_singleton(self):
+        self.assertIs(self.registry, http.SharedHttpRegistry())
+
+    def test_get_http_same_settings(self):
+        connection = self.registry.get_http(ca_certs=CERT_LOCATION,
+                                            timeout=30)
+        self.assertIsInstance(connection, http.ClosingHttp)
+        self.assertEqual(http.SHARED_NUM_POOLS,
+                         connection.pools._maxsize)
+        self.assertIs(connection,
+                      self.registry.get_http(ca_certs=CERT_LOCATION,
+                                             timeout=30))
+
+    def test_get_http_different_settings(self):
+        connection = self.registry.get_http()
+        self.assertIsNot(connection, self.registry.get_http(timeout=30))
+        self.assertIsNot(connection, self.registry.get_http(
+            disable_ssl_certificate_validation=True))
+        self.assertIsNot(connection, self.registry.get_http(
+            follow_redirects=False))
+        self.assertIsNot(connection, self.registry.get_http(keep_alive=True))
+
+    def test_get_http_proxy(self):
+        connection = self.registry.get_http(proxy_url=PROXY_URL)
+        self.assertIsInstance(connection, http.ClosingProxyHttp)
+        self.assertIs(connection,
+                      self.registry.get_http(proxy_url=PROXY_URL))
+        self.assertIsNot(connection, self.registry.get_http())
+
+    def test_clear(self):
+        connection = self.registry.get_http()
+        self.registry.clear()
+        self.assertIsNot(connection, self.registry.get_http())
+
 
 class TestClosingProxyHttp(TestClosingHttp):
 
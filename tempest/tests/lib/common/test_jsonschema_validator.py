@@ -12,7 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
+import jsonschema
+
 from tempest.lib.api_schema.response.compute.v2_1 import parameter_types
+from tempest.lib.common import jsonschema_validator
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions
 from tempest.tests import base
@@ -81,3 +85,60 @@ class TestJSONSchemaDateTimeFormat(base.TestCase):
         self.assertRaises(exceptions.InvalidHTTPResponseBody,
                           rest_client.RestClient.validate_response,
                           self.date_time_schema[0], resp, body)
+
+
+class TestJSONSchemaValidatorCache(base.TestCase):
+
+    def setUp(self):
+        super(TestJSONSchemaValidatorCache, self).setUp()
+        self.schema = {
+            'type': 'object',
+            'properties': {
+                'foo': {'type': 'integer'},
+                'bar': {'type': 'string'}
+            },
+            'required': ['foo']
+        }
+
+    def test_get_validator_cached(self):
+        validator = jsonschema_validator.get_validator(self.schema)
+        self.assertIsInstance(validator,
+                              jsonschema_validator.JSONSCHEMA_VALIDATOR)
+        self.assertIs(validator,
+                      jsonschema_validator.get_validator(self.schema))
+
+    def test_get_validator_schema_identity(self):
+        validator = jsonschema_validator.get_validator(self.schema)
+        self.assertIsNot(validator, jsonschema_validator.get_validator(
+            dict(self.schema)))
+
+    def test_get_validator_checks_schema_once(self):
+        with fixtures.MockPatchObject(
+                jsonschema_validator.JSONSCHEMA_VALIDATOR,
+                'check_schema') as check_schema:
+            jsonschema_validator.get_validator(self.schema)
+            jsonschema_validator.get_validator(self.schema)
+            check_schema.mock.assert_called_once_with(self.schema)
+
+    def test_get_validator_invalid_schema(self):
+        self.assertRaises(jsonschema.SchemaError,
+                          jsonschema_validator.get_validator,
+                          {'type': 'not-a-type'})
+
+    def test_get_validator_cache_size(self):
+        self.patchobject(jsonschema_validator, 'VALIDATOR_CACHE_SIZE', 1)
+        jsonschema_validator.get_validator(self.schema)
+        other_schema = {'type': 'object'}
+        validator = jsonschema_validator.get_validator(other_schema)
+        self.assertEqual(1, len(jsonschema_validator._validators))
+        self.assertIs(validator,
+                      jsonschema_validator.get_validator(other_schema))
+
+    def test_validate(self):
+        jsonschema_validator.validate({'foo': 1, 'bar': 'baz'}, self.schema)
+
+    def test_validate_invalid(self):
+        ex = self.assertRaises(jsonschema.ValidationError,
+                               jsonschema_validator.validate,
+                               {'foo': 'baz'}, self.schema)
+        self.assertIn("'baz' is not of type 'integer'", str(ex))
@@ -0,0 +1,83 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+from tempest.lib.common import polling
+from tempest.lib import exceptions
+from tempest.tests import base
+
+
+class TestPollingPolicy(base.TestCase):
+
+    def setUp(self):
+        super(TestPollingPolicy, self).setUp()
+        self.sleep = self.patch('time.sleep')
+
+    def _sleep(self, poller, times):
+        for _ in range(times):
+            poller.sleep()
+        return [call[1][0] for call in self.sleep.mock_calls]
+
+    def test_fixed(self):
+        poller = polling.PollingPolicy().start(10, 2)
+        self.assertEqual([2, 2, 2], self._sleep(poller, 3))
+
+    def test_backoff(self):
+        poller = polling.PollingPolicy(
+            'backoff', initial_interval=0.5, backoff_factor=3).start(10, 2)
+        self.assertEqual([0.5, 1.5, 2, 2], self._sleep(poller, 4))
+
+    def test_backoff_max_interval(self):
+        poller = polling.PollingPolicy(
+            'backoff', initial_interval=1, backoff_factor=2,
+            max_interval=5).start(60, 2)
+        self.assertEqual([1, 2, 4, 5, 5], self._sleep(poller, 5))
+
+    def test_jitter(self):
+        poller = polling.PollingPolicy(jitter=0.5).start(10, 2)
+        for interval in self._sleep(poller, 20):
+            self.assertGreaterEqual(interval, 1)
+            self.assertLessEqual(interval, 3)
+
+    def test_invalid(self):
+        self.assertRaises(exceptions.InvalidParam, polling.PollingPolicy,
+                          'unknown')
+        self.assertRaises(exceptions.InvalidParam, polling.PollingPolicy,
+                          jitter=1)
+        self.assertRaises(exceptions.InvalidParam, polling.PollingPolicy,
+                          'backoff', backoff_factor=0.5)
+        self.assertRaises(exceptions.InvalidParam, polling.PollingPolicy,
+                          'backoff', max_interval=0)
+
+    def test_expired(self):
+        self.patch('time.monotonic', side_effect=[100., 104., 110., 112.])
+        poller = polling.PollingPolicy().start(10, 1)
+        self.assertFalse(poller.expired)
+        self.assertTrue(poller.expired)
+        self.assertEqual(12., poller.elapsed)
+
+    def test_start_polling(self):
+        policy = polling.PollingPolicy('backoff')
+        client = mock.Mock(build_timeout=10, build_interval=1,
+                           polling_policy=policy)
+        poller = polling.start_polling(client)
+        self.assertIs(policy, poller.policy)
+        self.assertEqual(10, poller.timeout)
+        self.assertEqual(0.25, poller.interval)
+
+    def test_start_polling_no_policy(self):
+        client = mock.Mock(build_timeout=10, build_interval=1)
+        poller = polling.start_polling(client, timeout=20)
+        self.assertEqual(polling.POLL_FIXED, poller.policy.policy)
+        self.assertEqual(20, poller.timeout)
+        self.assertEqual(1, poller.interval)
@@ -130,6 +130,17 @@ class TestPreProvisionedCredentials(base.TestCase):
             self.assertEqual(hash_list[hash_index], results)
             hash_index += 1
 
+    def test_get_hash_partial_credentials(self):
+        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
+            **self.fixed_params)
+        hash_list = self._get_hash_list(self.test_accounts)
+        # Credentials without the project of their account
+        test_creds = auth.get_credentials(
+            fake_identity.FAKE_AUTH_URL, fill_in=False,
+            identity_version=self.fixed_params['identity_version'],
+            username='test_user4', password='p')
+        self.assertEqual(hash_list[3], test_account_class.get_hash(test_creds))
+
     def test_get_hash_dict(self):
         test_account_class = preprov_creds.PreProvisionedCredentialProvider(
             **self.fixed_params)
@@ -140,124 +151,95 @@ class TestPreProvisionedCredentials(base.TestCase):
             self.assertIn(hash, hash_dict['creds'].keys())
             self.assertIn(hash_dict['creds'][hash], self.test_accounts)
 
+    def _get_account_class(self, lock_dir=None):
+        params = dict(self.fixed_params)
+        if lock_dir is None:
+            lock_dir = self.useFixture(fixtures.TempDir()).path
+        params['accounts_lock_dir'] = lock_dir
+        return preprov_creds.PreProvisionedCredentialProvider(**params)
+
     def test_create_hash_file_previous_file(self):
+        test_account_class = self._get_account_class()
         # Emulate the lock existing on the filesystem
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isfile', return_value=True))
-        with mock.patch('builtins.open', mock.mock_open(), create=True):
-            test_account_class = (
-                preprov_creds.PreProvisionedCredentialProvider(
-                    **self.fixed_params))
-            res = test_account_class._create_hash_file('12345')
+        with open(os.path.join(test_account_class.accounts_dir, '12345'),
+                  'w') as fd:
+            fd.write('other class')
+        res = test_account_class._create_hash_file('12345')
         self.assertFalse(res, "_create_hash_file should return False if the "
                          "pseudo-lock file already exists")
 
     def test_create_hash_file_no_previous_file(self):
-        # Emulate the lock not existing on the filesystem
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isfile', return_value=False))
-        with mock.patch('builtins.open', mock.mock_open(), create=True):
-            test_account_class = (
-                preprov_creds.PreProvisionedCredentialProvider(
-                    **self.fixed_params))
-            res = test_account_class._create_hash_file('12345')
+        test_account_class = self._get_account_class()
+        res = test_account_class._create_hash_file('12345')
         self.assertTrue(res, "_create_hash_file should return True if the "
                         "pseudo-lock doesn't already exist")
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_no_previous_accounts(self, lock_mock):
-        # Emulate no pre-existing lock
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isdir', return_value=False))
+        with open(os.path.join(test_account_class.accounts_dir,
+                               '12345')) as fd:
+            self.assertEqual(self.fixed_params['name'], fd.read())
+
+    def test_get_free_hash_no_previous_accounts(self):
+        # Emulate no pre-existing lock dir
+        lock_dir = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                'test_accounts')
         hash_list = self._get_hash_list(self.test_accounts)
-        mkdir_mock = self.useFixture(fixtures.MockPatch('os.mkdir'))
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isfile', return_value=False))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        with mock.patch('builtins.open', mock.mock_open(),
-                        create=True) as open_mock:
-            test_account_class._get_free_hash(hash_list)
-            lock_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                     hash_list[0])
-            open_mock.assert_called_once_with(lock_path, 'w')
-        mkdir_path = os.path.join(self.fixed_params['accounts_lock_dir'])
-        mkdir_mock.mock.assert_called_once_with(mkdir_path)
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_no_free_accounts(self, lock_mock):
+        test_account_class = self._get_account_class(lock_dir)
+        free_hash = test_account_class._get_free_hash(hash_list)
+        self.assertIn(free_hash, hash_list)
+        self.assertEqual([free_hash], os.listdir(lock_dir))
+
+    def test_get_free_hash_no_free_accounts(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Emulate pre-existing lock dir
-        self.useFixture(fixtures.MockPatch('os.path.isdir', return_value=True))
+        test_account_class = self._get_account_class()
         # Emulate all locks in list are in use
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isfile', return_value=True))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        with mock.patch('builtins.open', mock.mock_open(), create=True):
-            self.assertRaises(lib_exc.InvalidCredentials,
-                              test_account_class._get_free_hash, hash_list)
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_some_in_use_accounts(self, lock_mock):
-        # Emulate no pre-existing lock
-        self.useFixture(fixtures.MockPatch('os.path.isdir', return_value=True))
-        hash_list = self._get_hash_list(self.test_accounts)
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
+        for _hash in hash_list:
+            self.assertTrue(test_account_class._create_hash_file(_hash))
+        self.assertRaises(lib_exc.InvalidCredentials,
+                          test_account_class._get_free_hash, hash_list)
 
-        def _fake_is_file(path):
-            # Fake isfile() to return that the path exists unless a specific
-            # hash is in the path
-            if hash_list[3] in path:
-                return False
-            return True
-
-        self.patchobject(os.path, 'isfile', _fake_is_file)
-        with mock.patch('builtins.open', mock.mock_open(),
-                        create=True) as open_mock:
-            test_account_class._get_free_hash(hash_list)
-            lock_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                     hash_list[3])
-            open_mock.assert_has_calls([mock.call(lock_path, 'w')])
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_remove_hash_last_account(self, lock_mock):
+    def test_get_free_hash_some_in_use_accounts(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Pretend the pseudo-lock is there
-        self.useFixture(
-            fixtures.MockPatch('os.path.isfile', return_value=True))
-        # Pretend the lock dir is empty
-        self.useFixture(fixtures.MockPatch('os.listdir', return_value=[]))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        remove_mock = self.useFixture(fixtures.MockPatch('os.remove'))
-        rmdir_mock = self.useFixture(fixtures.MockPatch('os.rmdir'))
+        test_account_class = self._get_account_class()
+        # Emulate all locks in list are in use, but a specific hash
+        for _hash in hash_list:
+            if _hash != hash_list[3]:
+                test_account_class._create_hash_file(_hash)
+        self.assertEqual(hash_list[3],
+                         test_account_class._get_free_hash(hash_list))
+
+    def test_get_free_hash_start_offset(self):
+        hash_list = self._get_hash_list(self.test_accounts)
+        test_account_class = self._get_account_class()
+        with mock.patch('random.randrange', return_value=5):
+            self.assertEqual(hash_list[5],
+                             test_account_class._get_free_hash(hash_list))
+            # The accounts are tried in order from the start offset
+            self.assertEqual(hash_list[6],
+                             test_account_class._get_free_hash(hash_list))
+
+    def test_remove_hash_last_account(self):
+        hash_list = self._get_hash_list(self.test_accounts)
+        test_account_class = self._get_account_class()
+        test_account_class._create_hash_file(hash_list[2])
         test_account_class.remove_hash(hash_list[2])
-        hash_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                 hash_list[2])
-        lock_path = self.fixed_params['accounts_lock_dir']
-        remove_mock.mock.assert_called_once_with(hash_path)
-        rmdir_mock.mock.assert_called_once_with(lock_path)
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_remove_hash_not_last_account(self, lock_mock):
+        self.assertFalse(os.path.exists(test_account_class.accounts_dir))
+
+    def test_remove_hash_not_last_account(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Pretend the pseudo-lock is there
-        self.useFixture(fixtures.MockPatch(
-            'os.path.isfile', return_value=True))
-        # Pretend the lock dir is empty
-        self.useFixture(fixtures.MockPatch('os.listdir', return_value=[
-            hash_list[1], hash_list[4]]))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        remove_mock = self.useFixture(fixtures.MockPatch('os.remove'))
-        rmdir_mock = self.useFixture(fixtures.MockPatch('os.rmdir'))
+        test_account_class = self._get_account_class()
+        for _hash in hash_list[1:5]:
+            test_account_class._create_hash_file(_hash)
         test_account_class.remove_hash(hash_list[2])
-        hash_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                 hash_list[2])
-        remove_mock.mock.assert_called_once_with(hash_path)
-        rmdir_mock.mock.assert_not_called()
+        self.assertEqual(sorted([hash_list[1], hash_list[3], hash_list[4]]),
+                         sorted(os.listdir(test_account_class.accounts_dir)))
+
+    def test_get_match_hash_list_cached(self):
+        test_accounts_class = preprov_creds.PreProvisionedCredentialProvider(
+            **self.fixed_params)
+        hashes = test_accounts_class._get_match_hash_list(['role2', 'role4'])
+        hash_list = self._get_hash_list(self.test_accounts)
+        self.assertEqual([hash_list[8], hash_list[9]], hashes)
+        self.assertIs(hashes, test_accounts_class._get_match_hash_list(
+            ['role4', 'role2']))
 
     def test_is_multi_user(self):
         test_accounts_class = preprov_creds.PreProvisionedCredentialProvider(
@@ -62,3 +62,21 @@ class TestProfiler(testtools.TestCase):
 
         profiler.disable()
         self.assertEqual({}, profiler._profiler)
+
+    def test_serialize_once_per_trace(self):
+        self.addCleanup(profiler.disable)
+        profiler.enable('SECRET_KEY', 'ID')
+        with mock.patch.object(profiler, '_sign',
+                               wraps=profiler._sign) as sign:
+            headers = profiler.serialize_as_http_headers()
+            headers['X-Fake'] = 'fake'
+            self.assertEqual(headers['X-Trace-HMAC'],
+                             profiler.serialize_as_http_headers()[
+                                 'X-Trace-HMAC'])
+            self.assertNotIn('X-Fake', profiler.serialize_as_http_headers())
+            self.assertEqual(1, sign.call_count)
+            profiler.enable('SECRET_KEY', 'OTHER_ID')
+            self.assertNotEqual(headers['X-Trace-HMAC'],
+                                profiler.serialize_as_http_headers()[
+                                    'X-Trace-HMAC'])
+            self.assertEqual(2, sign.call_count)
@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+from unittest import mock
+
+import fixtures
+from oslo_serialization import jsonutils as json
+
+from tempest.lib.common import request_log
+from tempest.tests import base
+
+
+class TestDeferredStr(base.TestCase):
+
+    def test_rendered_on_str_only(self):
+        func = mock.Mock(return_value='rendered')
+        deferred = request_log.DeferredStr(func, 'a', 'b')
+        func.assert_not_called()
+        self.assertEqual('rendered', str(deferred))
+        func.assert_called_once_with('a', 'b')
+
+
+class TestNDJSONRequestSink(base.TestCase):
+
+    def setUp(self):
+        super(TestNDJSONRequestSink, self).setUp()
+        self.addCleanup(request_log.close_sinks)
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'requests.json')
+
+    def test_write(self):
+        sink = request_log.get_sink(self.path)
+        sink.write({'method': 'GET', 'status': '200'})
+        sink.write({'method': 'POST', 'status': '201'})
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([{'method': 'GET', 'status': '200'},
+                          {'method': 'POST', 'status': '201'}], records)
+
+    def test_get_sink_shared(self):
+        sink = request_log.get_sink(self.path)
+        self.assertIs(sink, request_log.get_sink(self.path))
+        request_log.close_sinks()
+        self.assertIsNot(sink, request_log.get_sink(self.path))
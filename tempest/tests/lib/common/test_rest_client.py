@@ -13,13 +13,21 @@
 #    under the License.
 
 import copy
+import logging
+import os
+from unittest import mock
 
 import fixtures
 import jsonschema
 from oslo_serialization import jsonutils as json
+import testtools
 
 from tempest.lib.common import http
+from tempest.lib.common import polling
+from tempest.lib.common import profiler
+from tempest.lib.common import request_log
 from tempest.lib.common import rest_client
+from tempest.lib.common.utils import test_utils
 from tempest.lib import exceptions
 from tempest.tests import base
 from tempest.tests.lib import fake_auth_provider
@@ -79,6 +87,68 @@ class TestRestClientHTTPMethods(BaseRestClientTestClass):
         self.assertEqual('COPY', return_dict['method'])
 
 
+class TestRestClientMapRequests(BaseRestClientTestClass):
+    def setUp(self):
+        self.fake_http = fake_http.fake_httplib2()
+        super(TestRestClientMapRequests, self).setUp()
+        self.useFixture(fixtures.MockPatchObject(self.rest_client,
+                                                 '_error_checker'))
+
+    def test_map_requests(self):
+        results = self.rest_client.map_requests(
+            [('GET', 'servers/%d' % i) for i in range(20)] +
+            [('PUT', 'servers/0', {'body': 'fake_body'})], max_workers=4)
+        self.assertEqual(21, len(results))
+        for i, (_, body) in enumerate(results[:20]):
+            self.assertEqual('GET', body['method'])
+            self.assertEqual('servers/%d' % i, body['uri'])
+        self.assertEqual('PUT', results[20][1]['method'])
+        self.assertEqual('fake_body', results[20][1]['body'])
+
+    def test_map_requests_empty(self):
+        self.assertEqual([], self.rest_client.map_requests([]))
+
+    def _request(self, method, url, **kwargs):
+        if url.endswith('missing'):
+            raise exceptions.NotFound()
+        return self.fake_http.request(url, method)
+
+    def test_map_requests_errors(self):
+        request = self.patchobject(self.rest_client, 'request',
+                                   side_effect=self._request)
+        requests = [('DELETE', 'missing'), ('DELETE', 'found'),
+                    ('DELETE', 'missing')]
+        exc = self.assertRaises(testtools.MultipleExceptions,
+                                self.rest_client.map_requests, requests)
+        self.assertEqual(2, len(exc.args))
+        for exc_info in exc.args:
+            self.assertIsInstance(exc_info[1], exceptions.NotFound)
+        # All the requests are sent
+        self.assertEqual(3, request.call_count)
+
+    def test_map_requests_return_exceptions(self):
+        self.patchobject(self.rest_client, 'request',
+                         side_effect=self._request)
+        results = self.rest_client.map_requests(
+            [('DELETE', 'missing'), ('DELETE', 'found')],
+            return_exceptions=True)
+        self.assertIsInstance(results[0], exceptions.NotFound)
+        self.assertEqual('found', results[1][1]['uri'])
+
+    def test_map_requests_current_test(self):
+        callers = []
+
+        def request(method, url, **kwargs):
+            callers.append(test_utils.find_test_caller())
+            return self.fake_http.request(url, method)
+
+        self.patchobject(self.rest_client, 'request', side_effect=request)
+        token = test_utils.set_current_test('Fake:test_fake')
+        self.addCleanup(test_utils.reset_current_test, token)
+        self.rest_client.map_requests([('GET', 'a'), ('GET', 'b')])
+        self.assertEqual(['Fake:test_fake'] * 2, callers)
+
+
 class TestRestClientNotFoundHandling(BaseRestClientTestClass):
     def setUp(self):
         self.fake_http = fake_http.fake_httplib2(404)
@@ -131,6 +201,44 @@ class TestRestClientHeadersJSON(TestRestClientHTTPMethods):
         self._verify_headers(resp)
 
 
+class TestRestClientGetHeaders(BaseRestClientTestClass):
+
+    def setUp(self):
+        self.fake_http = fake_http.fake_httplib2()
+        super(TestRestClientGetHeaders, self).setUp()
+        self.addCleanup(profiler.disable)
+
+    def test_get_headers_copies(self):
+        headers = self.rest_client.get_headers()
+        self.assertEqual({'Content-Type': 'application/json',
+                          'Accept': 'application/json'}, headers)
+        headers['X-Fake'] = 'fake'
+        self.assertEqual({'Content-Type': 'application/json',
+                          'Accept': 'application/json'},
+                         self.rest_client.get_headers())
+        self.assertEqual({'Content-Type': 'application/xml',
+                          'Accept': 'application/json'},
+                         self.rest_client.get_headers(send_type='xml'))
+
+    def test_get_headers_profiler(self):
+        serialize = self.patchobject(
+            profiler, 'serialize_as_http_headers',
+            wraps=profiler.serialize_as_http_headers)
+        self.assertNotIn('X-Trace-Info', self.rest_client.get_headers())
+        profiler.enable('fake_key', 'fake_trace')
+        for _ in range(3):
+            headers = self.rest_client.get_headers()
+        self.assertIn('X-Trace-Info', headers)
+        self.assertIn('X-Trace-HMAC', headers)
+        # The headers are serialized once per trace
+        self.assertEqual(2, serialize.call_count)
+        profiler.enable('fake_key', 'other_trace')
+        self.assertNotEqual(headers['X-Trace-Info'],
+                            self.rest_client.get_headers()['X-Trace-Info'])
+        profiler.disable()
+        self.assertNotIn('X-Trace-Info', self.rest_client.get_headers())
+
+
 class TestRestClientUpdateHeaders(BaseRestClientTestClass):
     def setUp(self):
         self.fake_http = fake_http.fake_httplib2()
@@ -518,18 +626,29 @@ class TestRestClientUtils(BaseRestClientTestClass):
         timeout = 1
         self.rest_client.build_timeout = timeout
 
-        time_mock = self.patch('time.time')
+        time_mock = self.patch('time.monotonic')
         time_mock.side_effect = utils.generate_timeout_series(timeout)
 
         self.assertRaises(exceptions.TimeoutException,
                           self.rest_client.wait_for_resource_deletion,
                           '1234')
 
-        # time.time() should be called 4 times,
+        # time.monotonic() should be called 3 times,
         # 1. Start timer
         # 2. End timer
-        # 3 & 4. To generate timeout exception message
-        self.assertEqual(4, time_mock.call_count)
+        # 3. To generate timeout exception message
+        self.assertEqual(3, time_mock.call_count)
+
+    def test_wait_for_resource_deletion_backoff(self):
+        self.retry_pass = 4
+        self.rest_client.build_timeout = 500
+        self.rest_client.polling_policy = polling.PollingPolicy(
+            'backoff', initial_interval=0.25, backoff_factor=2)
+        sleep_mock = self.patch('time.sleep')
+        self.rest_client.wait_for_resource_deletion('1234')
+        # The intervals are capped by the build interval
+        sleep_mock.assert_has_calls([mock.call(0.25), mock.call(0.5),
+                                     mock.call(1), mock.call(1)])
 
     def test_wait_for_deletion_with_unimplemented_deleted_method(self):
         self.rest_client.is_resource_deleted = self.original_deleted_method
@@ -651,6 +770,101 @@ class TestProperties(BaseRestClientTestClass):
                     'service': None}
         self.assertEqual(expected, self.rest_client.filters)
 
+    def test_connection_stats(self):
+        self.assertIs(self.rest_client.http_obj.connection_stats,
+                      self.rest_client.connection_stats)
+        self.assertFalse(self.rest_client.http_obj.keep_alive)
+
+    def test_keep_alive(self):
+        client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None,
+            keep_alive=True, pool_maxsize=5)
+        self.assertTrue(client.http_obj.keep_alive)
+        self.assertEqual(5, client.http_obj.connection_pool_kw['maxsize'])
+
+    def test_raw_request_stream(self):
+        http_request = self.patchobject(
+            self.rest_client.http_obj, 'request',
+            return_value=(fake_http.fake_http_response({}), b''))
+        self.rest_client.raw_request('fake_url', 'GET', headers={},
+                                     stream=True)
+        http_request.assert_called_once_with(
+            'fake_url', 'GET', headers={}, body=None, chunked=False,
+            stream=True)
+
+    def test_shared_http_pool(self):
+        self.addCleanup(http.SharedHttpRegistry().clear)
+        clients = [rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None,
+            shared_http_pool=True) for _ in range(2)]
+        self.assertIs(clients[0].http_obj, clients[1].http_obj)
+        self.assertIsNot(self.rest_client.http_obj, clients[0].http_obj)
+
+
+class TestRestClientRequestLog(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientRequestLog, self).setUp()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), 'compute', None)
+        self.log = self.useFixture(fixtures.MockPatchObject(
+            self.rest_client, 'LOG')).mock
+        self.resp = fake_http.fake_http_response(
+            {'x-openstack-request-id': 'req-1',
+             'x-subject-token': 'secret'}, status=200)
+
+    def _set_level(self, level):
+        self.log.isEnabledFor.side_effect = lambda lvl: lvl >= level
+
+    def test_log_request_filtered_out(self):
+        self._set_level(logging.WARNING)
+        self.rest_client._log_request('GET', 'fake_url', self.resp, secs=1)
+        self.log.debug.assert_not_called()
+        self.log.info.assert_not_called()
+
+    def test_log_request_info(self):
+        self._set_level(logging.INFO)
+        self.rest_client._log_request('GET', 'fake_url', self.resp, secs=1)
+        self.log.info.assert_called_once_with(
+            'Request (%s): %s %s %s %.3fs', mock.ANY, '200', 'GET',
+            'fake_url', 1, extra={'request_id': 'req-1'})
+        self.log.debug.assert_not_called()
+
+    def test_log_request_debug_hides_tokens(self):
+        self._set_level(logging.DEBUG)
+        req_headers = {'X-Auth-Token': 'secret'}
+        self.rest_client._log_request('GET', 'fake_url', self.resp,
+                                      req_headers=req_headers,
+                                      req_body='req', resp_body='resp')
+        args = self.log.debug.call_args[0]
+        rendered = args[0] % tuple(str(arg) for arg in args[1:])
+        self.assertNotIn('secret', rendered)
+        self.assertIn("{'X-Auth-Token': '<omitted>'}", rendered)
+        self.assertIn('Body: req', rendered)
+        self.assertIn('Body: resp', rendered)
+        # The headers of the request are not modified
+        self.assertEqual({'X-Auth-Token': 'secret'}, req_headers)
+        self.assertEqual('secret', self.resp['x-subject-token'])
+
+    def test_request_log_file(self):
+        self.addCleanup(request_log.close_sinks)
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'requests.json')
+        client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), 'compute', None,
+            request_log_file=path)
+        self.useFixture(fixtures.MockPatchObject(client, 'LOG')).mock.\
+            isEnabledFor.return_value = False
+        client._log_request('GET', 'fake_url', self.resp, secs=0.5)
+        with open(path) as f:
+            record = json.loads(f.read())
+        self.assertEqual({'service': 'compute', 'method': 'GET',
+                          'url': 'fake_url', 'status': '200', 'secs': 0.5,
+                          'request_id': 'req-1'},
+                         dict((key, record[key]) for key in
+                              ('service', 'method', 'url', 'status',
+                               'secs', 'request_id')))
+
 
 class TestExpectedSuccess(BaseRestClientTestClass):
 
@@ -941,6 +1155,77 @@ class TestRestClientJSONSchemaValidation(TestJSONSchemaValidationBase):
         self._test_validate_pass(schema, body)
 
 
+class TestRestClientValidationPolicy(TestJSONSchemaValidationBase):
+
+    schema = {
+        'status_code': [200],
+        'response_body': {
+            'type': 'object',
+            'properties': {
+                'foo': {'type': 'integer'}
+            }
+        }
+    }
+    invalid_body = {'foo': 'bar'}
+
+    def _get_client(self, policy):
+        return rest_client.RestClient(self.fake_auth_provider, None, None,
+                                      validation_policy=policy)
+
+    def _validate(self, client, body=None, status=200):
+        resp = self.Response()
+        resp.status = status
+        client.validate_response(self.schema, resp, body or self.invalid_body)
+
+    def test_default_policy(self):
+        self.assertEqual(rest_client.VALIDATE_ALWAYS,
+                         self.rest_client.validation_policy.policy)
+        self.assertNotIn('validate_response', vars(self.rest_client))
+        self._test_validate_fail(self.schema, self.invalid_body)
+
+    def test_off(self):
+        client = self._get_client('off')
+        self._validate(client)
+        # The status code is checked in any case
+        self.assertRaises(exceptions.InvalidHttpSuccessCode,
+                          self._validate, client, status=201)
+
+    def test_class_method_is_strict(self):
+        self._get_client('off')
+        resp = self.Response()
+        resp.status = 200
+        self.assertRaises(exceptions.InvalidHTTPResponseBody,
+                          rest_client.RestClient.validate_response,
+                          self.schema, resp, self.invalid_body)
+
+    def test_first_per_test(self):
+        client = self._get_client('first-per-test')
+        caller = self.patch(
+            'tempest.lib.common.utils.test_utils.find_test_caller',
+            return_value='TestClass:test_one')
+        self.assertRaises(exceptions.InvalidHTTPResponseBody,
+                          self._validate, client)
+        self._validate(client)
+        caller.return_value = 'TestClass:test_two'
+        self.assertRaises(exceptions.InvalidHTTPResponseBody,
+                          self._validate, client)
+        self._validate(client)
+
+    def test_sampled(self):
+        client = self._get_client('sampled:25')
+        self.assertEqual(25, client.validation_policy.rate)
+        uniform = self.patch('random.uniform', return_value=50)
+        self._validate(client)
+        uniform.return_value = 10
+        self.assertRaises(exceptions.InvalidHTTPResponseBody,
+                          self._validate, client)
+
+    def test_invalid_policy(self):
+        for policy in ('sometimes', 'sampled', 'sampled:foo', 'sampled:101'):
+            self.assertRaises(exceptions.InvalidParam, self._get_client,
+                              policy)
+
+
 class TestRestClientJSONHeaderSchemaValidation(TestJSONSchemaValidationBase):
 
     schema = {
@@ -0,0 +1,75 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import fixtures
+from oslo_serialization import jsonutils as json
+
+from tempest.lib.common import server_events
+from tempest.tests import base
+
+
+def _notification(server_id, state='active'):
+    return {'event_type': 'instance.update',
+            'payload': {'nova_object.name': 'InstanceUpdatePayload',
+                        'nova_object.data': {'uuid': server_id,
+                                             'state': state}}}
+
+
+class TestFileServerEventSource(base.TestCase):
+
+    def setUp(self):
+        super(TestFileServerEventSource, self).setUp()
+        self.sleep = self.patch('time.sleep')
+        self.path = self.useFixture(fixtures.TempDir()).join('events')
+        self.source = server_events.FileServerEventSource(self.path)
+
+    def _append(self, *lines):
+        with open(self.path, 'a') as events_file:
+            for line in lines:
+                if not isinstance(line, str):
+                    line = json.dumps(line) + '\n'
+                events_file.write(line)
+
+    def test_wait(self):
+        watcher = self.source.watch('server')
+        self._append(_notification('other'), 'not json\n',
+                     _notification('server'))
+        self.assertTrue(watcher.wait(10))
+        self.sleep.assert_not_called()
+
+    def test_wait_events_before_watch(self):
+        self._append(_notification('server'))
+        watcher = self.source.watch('server')
+        self.patch('time.monotonic', side_effect=[0., 0.05, 1.])
+        self.assertFalse(watcher.wait(1))
+        self.sleep.assert_called_once_with(0.1)
+
+    def test_wait_no_file(self):
+        watcher = self.source.watch('server')
+        self.patch('time.monotonic', side_effect=[0., 1.])
+        self.assertFalse(watcher.wait(1))
+
+    def test_wait_partial_line(self):
+        watcher = self.source.watch('server')
+        line = json.dumps(_notification('server'))
+        self._append(line[:10])
+        self.patch('time.monotonic', side_effect=[0., 1., 2.])
+        self.assertFalse(watcher.wait(1))
+        self._append(line[10:] + '\n')
+        self.assertTrue(watcher.wait(1))
+
+    def test_wait_truncated_file(self):
+        self._append(_notification('other'), _notification('other'))
+        watcher = self.source.watch('server')
+        open(self.path, 'w').close()
+        self._append(_notification('server'))
+        self.assertTrue(watcher.wait(1))
@@ -30,6 +30,18 @@ class TestTestUtils(base.TestCase):
         self.assertEqual('TestTestUtils:test_find_test_caller_test_case',
                          test_utils.find_test_caller())
 
+    def test_find_test_caller_current_test(self):
+        token = test_utils.set_current_test('TestClass:test_method')
+        self.addCleanup(test_utils.reset_current_test, token)
+        self.assertEqual('TestClass:test_method',
+                         test_utils.find_test_caller())
+
+    def test_reset_current_test(self):
+        token = test_utils.set_current_test('TestClass:test_method')
+        test_utils.reset_current_test(token)
+        self.assertEqual('TestTestUtils:test_reset_current_test',
+                         test_utils.find_test_caller())
+
     def test_find_test_caller_setup_self(self):
         def setUp(self):
             return test_utils.find_test_caller()
@@ -13,9 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import asyncio
 import copy
 from unittest import mock
 
+import fixtures
 
 from tempest.lib.services.compute import base_compute_client
 from tempest.lib.services.compute import servers_client
@@ -235,6 +237,13 @@ class TestServersClient(base.BaseServiceTest):
             server_id=self.server_id
             )
 
+    def test_show_server_async(self):
+        self.useFixture(fixtures.MockPatch(
+            'tempest.lib.common.rest_client.RestClient.get',
+            return_value=self.create_response(self.FAKE_SERVER_GET)))
+        resp = asyncio.run(self.client.aio.show_server(self.server_id))
+        self.assertEqual(self.FAKE_SERVER_GET, resp)
+
     def test_delete_server(self):
         self.check_service_client_function(
             self.client.delete_server,
@@ -13,10 +13,14 @@
 #    under the License.
 
 import io
+from unittest import mock
+
+import fixtures
 
 from tempest.lib.common.utils import data_utils
 from tempest.lib.services.image.v2 import images_client
 from tempest.tests.lib import fake_auth_provider
+from tempest.tests.lib import fake_http
 from tempest.tests.lib.services import base
 
 
@@ -226,6 +230,34 @@ class TestImagesClient(base.BaseServiceTest):
             status=204,
             data=data)
 
+    def test_store_image_file_known_size(self):
+        request = self.useFixture(fixtures.MockPatch(
+            'tempest.lib.common.rest_client.RestClient.request',
+            return_value=(fake_http.fake_http_response({}, status=204),
+                          b''))).mock
+        data = io.BytesIO(b'image data')
+        self.client.store_image_file(
+            self.FAKE_CREATE_UPDATE_SHOW_IMAGE["id"], data)
+        request.assert_called_once_with(
+            'PUT', 'images/%s/file' % self.FAKE_CREATE_UPDATE_SHOW_IMAGE["id"],
+            headers={'Content-Type': 'application/octet-stream',
+                     'Content-Length': '10'},
+            body=mock.ANY)
+        self.assertIsInstance(request.call_args[1]['body'], memoryview)
+
+    def test_stage_image_file_chunked(self):
+        request = self.useFixture(fixtures.MockPatch(
+            'tempest.lib.common.rest_client.RestClient.request',
+            return_value=(fake_http.fake_http_response({}, status=204),
+                          b''))).mock
+        data = mock.Mock(spec=['read'])
+        data.read.side_effect = [b'image data', b'']
+        self.client.stage_image_file(
+            self.FAKE_CREATE_UPDATE_SHOW_IMAGE["id"], data)
+        kwargs = request.call_args[1]
+        self.assertTrue(kwargs['chunked'])
+        self.assertEqual([b'image data'], list(kwargs['body']))
+
     def test_show_image_file(self):
         # NOTE: The response for this API returns raw binary data, but an error
         # is thrown if random bytes are used for the resp body since
@@ -239,6 +271,18 @@ class TestImagesClient(base.BaseServiceTest):
             headers={'Content-Type': 'application/octet-stream'},
             status=200)
 
+    def test_show_image_file_stream(self):
+        body = mock.Mock()
+        get = self.useFixture(fixtures.MockPatch(
+            'tempest.lib.common.rest_client.RestClient.get',
+            return_value=(fake_http.fake_http_response({}), body))).mock
+        resp = self.client.show_image_file(
+            self.FAKE_CREATE_UPDATE_SHOW_IMAGE["id"], stream=True)
+        self.assertIs(body, resp.data)
+        get.assert_called_once_with(
+            'images/%s/file' % self.FAKE_CREATE_UPDATE_SHOW_IMAGE["id"],
+            stream=True)
+
     def test_add_image_tag(self):
         self.check_service_client_function(
             self.client.add_image_tag,
@@ -13,13 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-
+import io
 from unittest import mock
 
 from tempest.lib import exceptions
 from tempest.lib.services.object_storage import object_client
 from tempest.tests import base
 from tempest.tests.lib import fake_auth_provider
+from tempest.tests.lib import fake_http
 
 
 class TestObjectClient(base.TestCase):
@@ -31,6 +32,25 @@ class TestObjectClient(base.TestCase):
         self.object_client = object_client.ObjectClient(self.fake_auth,
                                                         'swift', 'region1')
 
+    @mock.patch('tempest.lib.common.rest_client.RestClient.put')
+    def test_create_object_file(self, mock_put):
+        mock_put.return_value = (
+            fake_http.fake_http_response({}, status=201), b'')
+        self.object_client.create_object('c1', 'o1', io.BytesIO(b'data'),
+                                         headers={})
+        mock_put.assert_called_once_with(
+            'c1/o1', mock.ANY, {'content-length': '4'})
+        self.assertIsInstance(mock_put.call_args[0][1], memoryview)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient.get')
+    def test_get_object_stream(self, mock_get):
+        body = mock.Mock()
+        mock_get.return_value = (fake_http.fake_http_response({}), body)
+        _, resp_body = self.object_client.get_object('c1', 'o1',
+                                                     stream=True)
+        self.assertIs(body, resp_body)
+        mock_get.assert_called_once_with('c1/o1', headers={}, stream=True)
+
     @mock.patch('tempest.lib.services.object_storage.object_client.'
                 'ObjectClient._create_connection')
     def test_create_object_continue_no_data(self, mock_poc):
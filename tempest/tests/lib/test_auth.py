@@ -15,6 +15,11 @@
 
 import copy
 import datetime
+import os
+import re
+import stat
+import time
+from urllib import parse as urlparse
 
 import fixtures
 import testtools
@@ -176,6 +181,64 @@ class TestKeystoneV2AuthProvider(BaseAuthTestsSetUp):
         }
         self._test_request_helper(filters, expected)
 
+    def test_request_endpoint_cache(self):
+        filters = {
+            'service': 'compute',
+            'endpoint_type': 'publicURL',
+            'region': 'FakeRegion'
+        }
+        # The fake tokens are expired, keep using the first one
+        self.patchobject(self.auth_provider, 'is_expired', return_value=False)
+        base_url = self.patchobject(self.auth_provider, 'base_url',
+                                    return_value='http://fake/v2.1')
+        for _ in range(2):
+            url, _, _ = self.auth_provider.auth_request(
+                'GET', self.target_url, filters=filters)
+            self.assertEqual('http://fake/v2.1/' + self.target_url, url)
+        self.assertEqual(1, base_url.call_count)
+        # Other filters are looked up in the catalog
+        self.auth_provider.auth_request(
+            'GET', self.target_url, filters=dict(filters, api_version='v3'))
+        self.assertEqual(2, base_url.call_count)
+        # A new token invalidates the cache
+        self.auth_provider.set_auth()
+        self.auth_provider.auth_request('GET', self.target_url,
+                                        filters=filters)
+        self.assertEqual(3, base_url.call_count)
+        self.auth_provider.clear_auth()
+        self.auth_provider.auth_request('GET', self.target_url,
+                                        filters=filters)
+        self.assertEqual(4, base_url.call_count)
+
+    def test_request_url_join(self):
+        filters = {'service': 'compute'}
+        self.auth_provider.set_auth()
+        for base_url in ('http://fake:5000/v2.1', 'http://fake/v2.1/',
+                         'http://fake//v2//', 'http://fake',
+                         'http://fake/v2?a=b'):
+            self.patchobject(self.auth_provider, 'base_url',
+                             return_value=base_url)
+            self.auth_provider._clear_endpoints()
+            for rel_url in ('servers', 'servers/detail?a=b&c=//d',
+                            'servers/', 'a//b', '/servers', 'a?', 'a#b',
+                            'a;b', 'a?b;c'):
+                url, _, _ = self.auth_provider.auth_request(
+                    'GET', rel_url, filters=filters)
+                # Same as the generic join of the base and relative URLs
+                parts = list(urlparse.urlparse(base_url + '/' + rel_url))
+                parts[2] = re.sub("/{2,}", "/", parts[2])
+                self.assertEqual(urlparse.urlunparse(parts), url)
+
+    def test_request_headers_not_modified(self):
+        headers = {'Accept': 'application/json'}
+        filters = {'service': 'compute', 'endpoint_type': 'publicURL'}
+        _, auth_headers, _ = self.auth_provider.auth_request(
+            'GET', self.target_url, headers=headers, filters=filters)
+        self.assertEqual({'Accept': 'application/json'}, headers)
+        token = self._get_token_from_fake_identity()
+        self.assertEqual({'Accept': 'application/json',
+                          'X-Auth-Token': token}, auth_headers)
+
     def test_request_with_alt_auth_cleans_alt(self):
         """Test alternate auth data for headers
 
@@ -521,6 +584,169 @@ class TestKeystoneV2AuthProvider(BaseAuthTestsSetUp):
                        self.auth_provider.token_expiry_threshold / 2)
         self._verify_expiry(expiry_data=expiry_data, should_be_expired=True)
 
+    def test_expiry_parsed_once(self):
+        expiry_data = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        expiry_string = expiry_data.strftime(
+            self.auth_provider.EXPIRY_DATE_FORMATS[1])
+        auth_data = self._auth_data_with_expiry(expiry_string)
+        parse = self.patchobject(
+            self.auth_provider, '_parse_expiry_time',
+            wraps=self.auth_provider._parse_expiry_time)
+        for _ in range(3):
+            self.assertFalse(self.auth_provider.is_expired(auth_data))
+        parse.assert_called_once_with(expiry_string)
+        self.assertEqual(
+            (expiry_data.replace(microsecond=0) -
+             datetime.datetime(1970, 1, 1)).total_seconds(),
+            self.auth_provider._expiry_timestamp(expiry_string))
+        # A new expiry time is parsed again
+        auth_data = self._auth_data_with_expiry('2020-01-01T00:00:10Z')
+        self.assertTrue(self.auth_provider.is_expired(auth_data))
+        self.assertEqual(2, parse.call_count)
+
+    def test_shared_token_cache(self):
+        token_cache = auth.FileTokenCache(
+            self.useFixture(fixtures.TempDir()).path)
+        self.patchobject(self._auth_provider_class, 'is_expired',
+                         return_value=False)
+        get_token = self.patchobject(
+            self.auth_provider.auth_client, 'get_token',
+            return_value=(fake_identity.TOKEN, self._get_fake_identity()))
+        # Each provider fills its own copy of the credentials, as in
+        # different processes
+        providers = [self._auth(copy.deepcopy(self.credentials),
+                                fake_identity.FAKE_AUTH_URL,
+                                token_cache=token_cache) for _ in range(2)]
+        for provider in providers:
+            provider.auth_client = self.auth_provider.auth_client
+            self.assertEqual(fake_identity.TOKEN, provider.get_token())
+        self.assertEqual(1, get_token.call_count)
+        # An expired token is replaced
+        self._auth_provider_class.is_expired.return_value = True
+        providers[1].set_auth()
+        self.assertEqual(2, get_token.call_count)
+
+    def _fake_token_with_lifetime(self, token, seconds):
+        expiry_data = (datetime.datetime.utcnow() +
+                       datetime.timedelta(seconds=seconds))
+        _, auth_data = self._auth_data_with_expiry(
+            expiry_data.strftime(self.auth_provider.EXPIRY_DATE_FORMATS[1]))
+        return token, copy.deepcopy(auth_data)
+
+    def test_background_refresh(self):
+        timer = self.patchobject(auth.threading, 'Timer')
+        first = self._fake_token_with_lifetime('first_token', 3600)
+        second = self._fake_token_with_lifetime('second_token', 3600)
+        get_token = self.patchobject(self.auth_provider.auth_client,
+                                     'get_token',
+                                     side_effect=[first, second])
+        self.auth_provider.background_refresh = True
+        self.auth_provider.clear_auth()
+        refreshes = self.auth_provider.token_refreshes
+        self.assertEqual('first_token', self.auth_provider.get_token())
+        self.assertEqual(refreshes + 1, self.auth_provider.token_refreshes)
+        # The refresh is scheduled a lead time before the threshold
+        delay = timer.call_args[0][0]
+        self.assertAlmostEqual(3600 - 120, delay, delta=5)
+        refresh = timer.call_args[0][1]
+        refresh(*timer.call_args[1]['args'])
+        self.assertEqual('second_token', self.auth_provider.get_token())
+        self.assertEqual(2, get_token.call_count)
+        self.assertEqual(1, self.auth_provider.background_token_refreshes)
+        self.assertEqual(refreshes + 2, self.auth_provider.token_refreshes)
+        self.assertEqual(2, timer.call_count)
+        timer.return_value.cancel.assert_called_once_with()
+        # A refresh of a token which was replaced does nothing
+        refresh(first)
+        self.assertEqual(2, get_token.call_count)
+        self.auth_provider.clear_auth()
+        self.assertEqual(2, timer.return_value.cancel.call_count)
+
+    def test_background_refresh_short_lived_token(self):
+        timer = self.patchobject(auth.threading, 'Timer')
+        self.patchobject(self.auth_provider.auth_client, 'get_token',
+                         return_value=self._fake_token_with_lifetime(
+                             'fake_token', 100))
+        self.auth_provider.background_refresh = True
+        self.auth_provider.set_auth()
+        # Halfway to the expiry threshold
+        self.assertAlmostEqual(20, timer.call_args[0][0], delta=5)
+
+    def test_background_refresh_failure(self):
+        timer = self.patchobject(auth.threading, 'Timer')
+        get_token = self.patchobject(
+            self.auth_provider.auth_client, 'get_token',
+            side_effect=[self._fake_token_with_lifetime('fake_token', 3600),
+                         exceptions.IdentityError()])
+        self.auth_provider.background_refresh = True
+        self.auth_provider.set_auth()
+        auth_data = self.auth_provider.get_auth()
+        timer.call_args[0][1](*timer.call_args[1]['args'])
+        self.assertEqual(2, get_token.call_count)
+        # The token is kept until it expires, and not refreshed again
+        self.assertIs(auth_data, self.auth_provider.get_auth())
+        self.assertEqual(0, self.auth_provider.background_token_refreshes)
+        self.assertEqual(1, timer.call_count)
+
+    def test_background_refresh_unused(self):
+        timer = self.patchobject(auth.threading, 'Timer')
+        get_token = self.patchobject(
+            self.auth_provider.auth_client, 'get_token',
+            return_value=self._fake_token_with_lifetime('fake_token', 3600))
+        self.auth_provider.background_refresh = True
+        self.auth_provider.set_auth()
+        # The token was not used since it was obtained, the refresh stops
+        timer.call_args[0][1](*timer.call_args[1]['args'])
+        self.assertEqual(1, get_token.call_count)
+        self.assertEqual(1, timer.call_count)
+        self.assertEqual('fake_token', self.auth_provider.get_token())
+        self.assertEqual(1, get_token.call_count)
+
+    def test_background_refresh_unknown_expiry(self):
+        # Subclasses don't need to know the expiry of their tokens
+        self.assertNotIn('_token_expiry',
+                         auth.KeystoneAuthProvider.__abstractmethods__)
+        timer = self.patchobject(auth.threading, 'Timer')
+        self.patchobject(
+            self.auth_provider.auth_client, 'get_token',
+            return_value=self._fake_token_with_lifetime('fake_token', 3600))
+        self.patchobject(self._auth_provider_class, '_token_expiry',
+                         return_value=None)
+        self.auth_provider.background_refresh = True
+        self.auth_provider.set_auth()
+        timer.assert_not_called()
+
+    def test_cancel_refresh(self):
+        timer = self.patchobject(auth.threading, 'Timer')
+        self.patchobject(
+            self.auth_provider.auth_client, 'get_token',
+            return_value=self._fake_token_with_lifetime('fake_token', 3600))
+        self.auth_provider.background_refresh = True
+        self.auth_provider.set_auth()
+        self.auth_provider.cancel_refresh()
+        timer.return_value.cancel.assert_called_once_with()
+        # The token is kept
+        self.assertEqual('fake_token', self.auth_provider.get_token())
+
+    def test_auth_blocked_time(self):
+        auth_data = self._fake_token_with_lifetime('fake_token', 3600)
+
+        def get_token(**kwargs):
+            time.sleep(0.01)
+            return auth_data
+
+        self.patchobject(self.auth_provider.auth_client, 'get_token',
+                         side_effect=get_token)
+        self.auth_provider.clear_auth()
+        blocked_time = self.auth_provider.auth_blocked_time
+        self.auth_provider.get_auth()
+        self.assertGreaterEqual(self.auth_provider.auth_blocked_time,
+                                blocked_time + 0.01)
+        # Cached tokens don't block
+        blocked_time = self.auth_provider.auth_blocked_time
+        self.auth_provider.get_auth()
+        self.assertEqual(blocked_time, self.auth_provider.auth_blocked_time)
+
     def _verify_expiry(self, expiry_data, should_be_expired):
         for expiry_format in self.auth_provider.EXPIRY_DATE_FORMATS:
             auth_data = self._auth_data_with_expiry(
@@ -800,6 +1026,44 @@ class TestKeystoneV3AuthProvider(TestKeystoneV2AuthProvider):
                 self.assertEqual(getattr(all_creds, attr), auth_params[attr])
 
 
+class TestFileTokenCache(base.TestCase):
+
+    def setUp(self):
+        super(TestFileTokenCache, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'tokens')
+        self.token_cache = auth.FileTokenCache(self.path)
+        self.params = {'username': 'fake_user', 'password': 'fake_password',
+                       'project_name': 'fake_project'}
+
+    def test_key(self):
+        key = self.token_cache.key('http://fake/v3', self.params)
+        self.assertEqual(key, self.token_cache.key('http://fake/v3',
+                                                   dict(self.params)))
+        self.assertNotIn('fake_password', key)
+        for auth_url, params in (
+                ('http://other/v3', self.params),
+                ('http://fake/v3', dict(self.params, password='other')),
+                ('http://fake/v3', dict(self.params, system='all'))):
+            self.assertNotEqual(key, self.token_cache.key(auth_url, params))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.token_cache.get('missing'))
+
+    def test_set_get(self):
+        auth_data = {'expires_at': '2020-01-01T00:00:10Z'}
+        self.token_cache.set('fake_key', ('fake_token', auth_data))
+        self.assertEqual(('fake_token', auth_data),
+                         self.token_cache.get('fake_key'))
+        self.assertEqual(['fake_key'], os.listdir(self.path))
+        mode = os.stat(os.path.join(self.path, 'fake_key')).st_mode
+        self.assertEqual(0o600, stat.S_IMODE(mode))
+
+    def test_lock(self):
+        with self.token_cache.lock('fake_key'):
+            self.assertIn('token-fake_key', os.listdir(self.path))
+
+
 class TestKeystoneV3Credentials(base.TestCase):
     def testSetAttrUserDomain(self):
         creds = auth.KeystoneV3Credentials()
@@ -25,7 +25,10 @@ class TestServiceClientConfig(base.TestCase):
     expected_common_params = set(['disable_ssl_certificate_validation',
                                   'ca_certs', 'trace_requests'])
     expected_extra_params = set(['service', 'endpoint_type', 'region',
-                                 'build_timeout', 'build_interval'])
+                                 'build_timeout', 'build_interval',
+                                 'keep_alive', 'pool_maxsize',
+                                 'shared_http_pool', 'validation_policy',
+                                 'request_log_file', 'polling_policy'])
 
     def setUp(self):
         super(TestServiceClientConfig, self).setUp()
@@ -22,6 +22,7 @@ import testtools
 
 from tempest import clients
 from tempest import config
+from tempest.lib.common.utils import test_utils
 from tempest.lib.common import validation_resources as vr
 from tempest.lib import exceptions as lib_exc
 from tempest.lib.services.compute import base_compute_client
@@ -247,6 +248,15 @@ class TestTempestBaseTestClass(base.TestCase):
 
         self.parent_test = ParentTest
 
+    def test_clear_credentials_cancels_token_refresh(self):
+        manager = mock.Mock(spec=clients.Manager, auth_provider=mock.Mock())
+        creds_provider = mock.Mock()
+        self.parent_test.os_primary = manager
+        self.parent_test._creds_provider = creds_provider
+        self.parent_test.clear_credentials()
+        manager.auth_provider.cancel_refresh.assert_called_once_with()
+        creds_provider.clear_creds.assert_called_once_with()
+
     def test_resource_cleanup(self):
         cfg.CONF.set_default('neutron', False, 'service_available')
         exp_args = (1, 2,)
@@ -316,6 +326,42 @@ class TestTempestBaseTestClass(base.TestCase):
         # Cleanup stack is empty
         self.assertEqual(0, len(test_cleanups._class_cleanups))
 
+    def test_current_test(self):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        callers = []
+
+        def record_caller():
+            callers.append(test_utils.find_test_caller())
+
+        class TestCurrentTest(self.parent_test):
+
+            @classmethod
+            def resource_setup(cls):
+                record_caller()
+                cls.addClassResourceCleanup(record_caller)
+
+            def setUp(self):
+                super(TestCurrentTest, self).setUp()
+                record_caller()
+                self.addCleanup(record_caller)
+
+            def runTest(self):
+                record_caller()
+
+        self.patch('tempest.lib.common.utils.test_utils.'
+                   '_find_test_caller_in_stack', return_value='stack')
+        suite = unittest.TestSuite((TestCurrentTest(),))
+        log = []
+        suite.run(LoggingTestResult(log))
+        self.assertFalse(log)
+        self.assertEqual(['TestCurrentTest:setUpClass',
+                          'TestCurrentTest:runTest',
+                          'TestCurrentTest:runTest',
+                          'TestCurrentTest:_run_cleanups',
+                          'TestCurrentTest:tearDownClass'], callers)
+        # Once the class is done, the caller is found in the stack again
+        self.assertEqual('stack', test_utils.find_test_caller())
+
     def test_super_resource_cleanup_not_invoked(self):
 
         class BadResourceCleanup(self.parent_test):
@@ -456,6 +502,18 @@ class TestTempestBaseTestClass(base.TestCase):
             expected_creds[1][1:],
             mock_get_client_manager.mock_calls[1][2]['roles'])
 
+    def test_setup_credentials_provisioned_together(self):
+        class ManyCredentials(self.parent_test):
+            credentials = ['primary', 'alt', ['list', 'role1']]
+
+        with mock.patch.object(
+                ManyCredentials, 'get_client_manager'), mock.patch.object(
+                ManyCredentials,
+                '_get_credentials_provider') as mock_provider:
+            ManyCredentials().setup_credentials()
+        mock_provider.return_value.provision_credentials.\
+            assert_called_once_with(['primary', 'alt'])
+
     def test_setup_credentials_with_role_and_system_scope(self):
         expected_creds = [['system_my_role', 'role1', 'role2']]
 
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Micro-benchmark of the client side overhead of a RestClient request
+
+Requests are sent with RestClient.raw_request to an HTTP object which
+returns a canned response, from a call stack of the given depth, so that the
+time measured is the time spent by the client itself (logging, caller
+attribution). The overhead is reported when the caller is found by walking
+the stack, and when the current test is recorded as done by the Tempest
+test base class.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+import prettytable
+
+from tempest.lib.common import rest_client
+from tempest.lib.common.utils import test_utils
+
+
+class FakeResponse(dict):
+    status = 200
+    reason = 'OK'
+    version = 11
+
+
+class FakeHttp(object):
+
+    def request(self, url, method, headers=None, body=None, chunked=False):
+        resp = FakeResponse({'status': '200',
+                             'content-type': 'application/json',
+                             'x-openstack-request-id': 'req-fake'})
+        return resp, b'{"server": {"id": "fake"}}'
+
+
+def call_at_depth(depth, func, *args):
+    if depth <= 0:
+        return func(*args)
+    return call_at_depth(depth - 1, func, *args)
+
+
+def send_requests(client, count):
+    for _ in range(count):
+        client.raw_request('http://localhost/v2.1/servers/fake', 'GET',
+                           headers={})
+
+
+def microseconds_per_request(client, count, depth):
+    start = time.perf_counter()
+    call_at_depth(depth, send_requests, client, count)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Number of requests to send')
+    parser.add_argument('--depth', type=int, nargs='+',
+                        default=[10, 50, 100],
+                        help='Depth of the call stack of the requests')
+    parser.add_argument('--debug', action='store_true',
+                        help='Log the requests at DEBUG level')
+    args = parser.parse_args(argv)
+
+    logger = logging.getLogger(rest_client.__name__)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+
+    client = rest_client.RestClient(None, 'compute', 'RegionOne')
+    client.http_obj = FakeHttp()
+    table = prettytable.PrettyTable(['Stack depth', 'Stack walk (us)',
+                                     'Current test (us)', 'Saved (us)'])
+    table.align = 'r'
+    for depth in args.depth:
+        stack_walk = microseconds_per_request(client, args.requests, depth)
+        token = test_utils.set_current_test('Benchmark:test_requests')
+        try:
+            current_test = microseconds_per_request(client, args.requests,
+                                                    depth)
+        finally:
+            test_utils.reset_current_test(token)
+        table.add_row([depth, '%.1f' % stack_walk, '%.1f' % current_test,
+                       '%.1f' % (stack_walk - current_test)])
+    print(table)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Micro-benchmark of the response schema validation
+
+For each schema module under tempest.lib.api_schema.response, a sample
+response body is built for every response schema, and validated with
+jsonschema.validate (as RestClient.validate_response used to do) and with
+the pre-compiled validators of tempest.lib.common.jsonschema_validator.
+The number of validations per second of both is reported per module.
+"""
+
+import argparse
+import importlib
+import pkgutil
+import sys
+import time
+
+import jsonschema
+import prettytable
+
+from tempest.lib.api_schema import response as response_schemas
+from tempest.lib.common import jsonschema_validator
+
+FORMAT_SAMPLES = {
+    'date-time': '2016-10-02T15:00:00Z',
+    'iso8601-date-time': '2016-10-02T15:00:00Z',
+    'uuid': '8a6d7c3c-1b2d-4a7f-9b1d-4c2a3f5e6d7c',
+    'ipv4': '10.0.0.1',
+    'ipv6': 'fe80::1',
+    'uri': 'http://localhost/',
+    'email': 'tempest@example.com',
+    'base64': 'dGVtcGVzdA==',
+}
+
+
+def sample_instance(schema):
+    """Build a sample instance which is likely to be valid for a schema"""
+    if not isinstance(schema, dict):
+        return None
+    if 'enum' in schema:
+        return schema['enum'][0]
+    for keyword in ('oneOf', 'anyOf', 'allOf'):
+        if keyword in schema:
+            return sample_instance(schema[keyword][0])
+    schema_type = schema.get('type')
+    if isinstance(schema_type, list):
+        types = [t for t in schema_type if t != 'null'] or ['null']
+        schema_type = types[0]
+    if schema_type is None and 'properties' in schema:
+        schema_type = 'object'
+    if schema_type == 'object':
+        return dict((name, sample_instance(sub_schema)) for name, sub_schema
+                    in schema.get('properties', {}).items())
+    if schema_type == 'array':
+        items = schema.get('items', {})
+        if isinstance(items, list):
+            return [sample_instance(item) for item in items]
+        if schema.get('maxItems') == 0:
+            return []
+        return [sample_instance(items)
+                for _ in range(max(1, schema.get('minItems', 1)))]
+    if schema_type == 'string':
+        if schema.get('format') in FORMAT_SAMPLES:
+            return FORMAT_SAMPLES[schema['format']]
+        return 'a' * max(1, schema.get('minLength', 1))
+    if schema_type == 'integer':
+        return schema.get('minimum', 0)
+    if schema_type == 'number':
+        return float(schema.get('minimum', 0))
+    if schema_type == 'boolean':
+        return True
+    return None
+
+
+def response_schemas_by_module():
+    """Yield the module name and the response schemas of each module"""
+    for module_info in pkgutil.walk_packages(response_schemas.__path__,
+                                             response_schemas.__name__ + '.'):
+        module = importlib.import_module(module_info.name)
+        schemas = {}
+        for value in vars(module).values():
+            if (isinstance(value, dict) and 'status_code' in value and
+                    value.get('response_body')):
+                schemas[id(value)] = value['response_body']
+        if schemas:
+            yield module_info.name, list(schemas.values())
+
+
+def validate_uncached(instance, schema):
+    jsonschema.validate(instance, schema,
+                        cls=jsonschema_validator.JSONSCHEMA_VALIDATOR,
+                        format_checker=jsonschema_validator.FORMAT_CHECKER)
+
+
+def validations_per_second(validate, samples, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for schema, instance in samples:
+            validate(instance, schema)
+    elapsed = time.perf_counter() - start
+    return iterations * len(samples) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='Number of validations of each schema')
+    parser.add_argument('--filter', default='',
+                        help='Only benchmark the modules whose name '
+                             'contains this string')
+    args = parser.parse_args(argv)
+
+    table = prettytable.PrettyTable(['Module', 'Schemas', 'Skipped',
+                                     'Uncached (/s)', 'Compiled (/s)',
+                                     'Speedup'])
+    table.align = 'r'
+    table.align['Module'] = 'l'
+    for module_name, schemas in response_schemas_by_module():
+        if args.filter not in module_name:
+            continue
+        samples = []
+        for schema in schemas:
+            instance = sample_instance(schema)
+            try:
+                jsonschema_validator.validate(instance, schema)
+            except (jsonschema.ValidationError, jsonschema.SchemaError):
+                continue
+            samples.append((schema, instance))
+        if not samples:
+            continue
+        uncached = validations_per_second(validate_uncached, samples,
+                                          args.iterations)
+        compiled = validations_per_second(jsonschema_validator.validate,
+                                          samples, args.iterations)
+        short_name = module_name[len(response_schemas.__name__) + 1:]
+        table.add_row([short_name, len(samples),
+                       len(schemas) - len(samples), '%.0f' % uncached,
+                       '%.0f' % compiled, '%.1fx' % (compiled / uncached)])
+    print(table)
+
+
+if __name__ == '__main__':
+    sys.exit(main())